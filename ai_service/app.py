@@ -1,72 +1,354 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import asyncio
+import json
 import uuid
 import os
+import sys
+import time
 import cv2
+import numpy as np
 from datetime import datetime
 
-from utils.mole_detection import detect_moles
-from utils.golden_ratio_analysis import analyze_golden_ratio
+from symmetry_analysis import SYMMETRY_VERSION
+from utils.analysis_context import AnalysisContext
+from utils.analyzers import run_analyzers
+from utils.dynaface_analysis import warm_up
+from utils.metrics import IMAGES, REQUEST_ERRORS, StageTimer, track_request
+from utils.upload_store import UploadStore
+from utils.upload_stream import (
+    UploadRejected,
+    iter_multipart_images,
+    iter_ndjson_images,
+    read_image_upload,
+)
 
 app = FastAPI()
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-@app.post("/analyze-face")
-async def analyze_face(image: UploadFile = File(...)):
-    try:
-        if not image.filename:
-            return JSONResponse(content={"error": "Empty filename"}, status_code=400)
+# Cuvanje uploadova je opciono i ide u pozadini, sa ogranicenjem velicine i starosti
+upload_store = UploadStore(
+    UPLOAD_FOLDER,
+    enabled=os.environ.get("PERSIST_UPLOADS", "1") == "1",
+    queue_size=int(os.environ.get("UPLOAD_QUEUE_SIZE", 64)),
+    max_files=int(os.environ.get("UPLOAD_MAX_FILES", 1000)),
+    max_bytes=int(os.environ.get("UPLOAD_MAX_MB", 1024)) * 1024 * 1024,
+    max_age=int(os.environ.get("UPLOAD_MAX_AGE_HOURS", 72)) * 3600,
+)
+
+# Server-Timing header sa trajanjem stage-ova: uvijek, ili kad klijent posalje X-Timings: 1
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# Broj paralelnih analiza (dekodiranje + modeli), zajednicki za sve endpointe
+ANALYZE_WORKERS = int(os.environ.get("ANALYZE_WORKERS", os.cpu_count() or 4))
+executor = ThreadPoolExecutor(max_workers=ANALYZE_WORKERS, thread_name_prefix="analyze")
 
-        filename = f"{uuid.uuid4().hex}.jpg"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        with open(filepath, "wb") as f:
-            f.write(await image.read())
 
-        image_cv = cv2.imread(filepath)
-        if image_cv is None:
-            raise ValueError("Unable to read image with OpenCV")
+# Pod je spreman tek kad su modeli ucitani i zagrijani
+service_state = {"ready": False, "failed": False, "error": None}
 
-        height, width, channels = image_cv.shape
-        file_size = os.path.getsize(filepath)
+# Neuspjelo zagrijavanje se ponavlja sa sve duzom pauzom; kad se pokusaji
+# potrose /healthz pada, pa Kubernetes restartuje pod
+WARMUP_ATTEMPTS = int(os.environ.get("WARMUP_ATTEMPTS", 5))
+WARMUP_BACKOFF = float(os.environ.get("WARMUP_BACKOFF_SECONDS", 2))
+WARMUP_BACKOFF_MAX = 60.0
 
-        mole_count = detect_moles(image_cv)
 
+def warm_up_service():
+    for attempt in range(1, WARMUP_ATTEMPTS + 1):
         try:
-            golden_ratio_data = analyze_golden_ratio(filepath)
+            # Modeli (MTCNN + SPIGA) i jedan sinteticki prolaz kroz sve analize
+            warm_up()
+            image = np.full((256, 256, 3), 128, dtype=np.uint8)
+            _, encoded = cv2.imencode(".jpg", image)
+            run_analyzers(AnalysisContext(encoded.tobytes()))
+            service_state["ready"] = True
+            service_state["error"] = None
+            print("[INFO] Models loaded, service ready")
+            return
         except Exception as e:
-            golden_ratio_data = {
-                "geometric_ratio": None,
-                "similarity_ratio": None
-            }
-            print(f"[WARNING] Golden ratio analysis failed: {e}")
-
-        acne_detected = mole_count > 10
-        botox_recommended = (
-            golden_ratio_data.get("geometric_ratio") is not None and
-            golden_ratio_data.get("geometric_ratio") < 0.9
+            service_state["error"] = str(e)
+            print(f"[ERROR] Warm-up attempt {attempt}/{WARMUP_ATTEMPTS} failed: {e}")
+            if attempt < WARMUP_ATTEMPTS:
+                time.sleep(min(WARMUP_BACKOFF * 2 ** (attempt - 1), WARMUP_BACKOFF_MAX))
+    service_state["failed"] = True
+
+
+@app.on_event("startup")
+async def load_models():
+    # U pozadini, da /healthz odgovara dok se modeli ucitavaju
+    asyncio.get_running_loop().run_in_executor(None, warm_up_service)
+
+
+@app.get("/healthz")
+async def healthz():
+    if service_state["failed"]:
+        return JSONResponse(
+            content={"status": "failed", "error": service_state["error"]},
+            status_code=503,
         )
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readyz():
+    if service_state["ready"]:
+        return {"status": "ready"}
+    return JSONResponse(
+        content={"status": "starting", "error": service_state["error"]},
+        status_code=503,
+    )
+
+
+@app.on_event("startup")
+async def start_upload_store():
+    await run_in_threadpool(upload_store.start)
+
+
+@app.on_event("shutdown")
+async def stop_upload_store():
+    await run_in_threadpool(upload_store.close)
+
+
+def analyze_image_bytes(data, timer=None):
+    """Decode one uploaded image, run all analyzers and build the result dict."""
+    filename = f"{uuid.uuid4().hex}.jpg"
+
+    # Jedno dekodiranje i jedna detekcija lica za sve analize, iz memorije
+    context = AnalysisContext(data, timer=timer)
+    upload_store.save(filename, data)
+
+    # Landmarki kao poseban stage, a ne unutar prve analize koja ih trazi
+    try:
+        context.face
+    except Exception as e:
+        print(f"[WARNING] Landmark detection failed: {e}")
+
+    height, width, channels = context.height, context.width, context.image.shape[2]
+    file_size = len(data)
+
+    results = run_analyzers(context)
+
+    moles = results["moles"]
+    if moles is None:
+        raise ValueError("Mole detection failed")
+    mole_count = moles["count"]
+
+    golden_ratio_data = results["golden_ratio"] or {
+        "geometric_ratio": None,
+        "similarity_ratio": None
+    }
+    dynaface_data = results["dynaface"] or {}
+
+    acne_detected = mole_count > 10
+    botox_recommended = (
+        golden_ratio_data.get("geometric_ratio") is not None and
+        golden_ratio_data.get("geometric_ratio") < 0.9
+    )
+
+    return {
+        "filename": filename,
+        "image_width": width,
+        "image_height": height,
+        "channels": channels,
+        "file_size_bytes": file_size,
+        "timestamp": datetime.now().isoformat(),
+        "mole_count": mole_count,
+        "moles": [
+            {"x": round(float(x), 1), "y": round(float(y), 1), "area": int(area)}
+            for (x, y), area in zip(moles["centroids"], moles["areas"])
+        ],
+        "golden_ratio": golden_ratio_data.get("geometric_ratio"),
+        "golden_similarity": golden_ratio_data.get("similarity_ratio"),
+        "symmetry": results["symmetry"],
+        "symmetry_version": SYMMETRY_VERSION,
+        "fai": dynaface_data.get("fai"),
+        "oce_left": dynaface_data.get("oce.l"),
+        "oce_right": dynaface_data.get("oce.r"),
+        "acne_detected": acne_detected,
+        "botox_recommended": botox_recommended,
+    }
+
+
+def _wants_timing(request):
+    return SERVER_TIMING or request.headers.get("x-timings") == "1"
+
 
-        result = {
-            "filename": filename,
-            "image_width": width,
-            "image_height": height,
-            "channels": channels,
-            "file_size_bytes": file_size,
-            "timestamp": datetime.now().isoformat(),
-            "mole_count": mole_count,
-            "golden_ratio": golden_ratio_data.get("geometric_ratio"),
-            "golden_similarity": golden_ratio_data.get("similarity_ratio"),
-            "acne_detected": acne_detected,
-            "botox_recommended": botox_recommended,
-        }
-
-        return JSONResponse(content=result, status_code=200)
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
+
+@app.post("/analyze-face")
+async def analyze_face(request: Request):
+    with track_request("analyze-face"):
+        try:
+            # Upload se cita u dijelovima i odbija cim predje limit ili nije slika
+            timer = StageTimer()
+            with timer.stage("upload_read"):
+                filename, data = await read_image_upload(request, field="image")
+            if not filename:
+                REQUEST_ERRORS.labels("analyze-face").inc()
+                return JSONResponse(content={"error": "Empty filename"}, status_code=400)
+
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, analyze_image_bytes, data, timer)
+            IMAGES.labels("analyze-face").inc()
+
+            headers = {"Server-Timing": timer.server_timing()} if _wants_timing(request) else None
+            return JSONResponse(content=result, status_code=200, headers=headers)
+
+        except UploadRejected as e:
+            REQUEST_ERRORS.labels("analyze-face").inc()
+            print(f"[WARNING] analyze_face rejected upload: {str(e)}")
+            return JSONResponse(
+                content={"error": str(e)},
+                status_code=e.status_code,
+                headers={"Connection": "close"},
+            )
+
+        except Exception as e:
+            REQUEST_ERRORS.labels("analyze-face").inc()
+            print(f"[ERROR] analyze_face: {str(e)}")
+            return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+def _analyze_batch_item(index, name, data, timing=False):
+    timer = StageTimer()
+    try:
+        result = analyze_image_bytes(data, timer)
+        IMAGES.labels("analyze-faces").inc()
     except Exception as e:
-        print(f"[ERROR] analyze_face: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
+        print(f"[ERROR] analyze_faces[{index}]: {str(e)}")
+        result = {"error": str(e)}
+    if timing:
+        # Header ide prije rezultata, pa se trajanja salju u svakoj liniji
+        result["timings_ms"] = {k: round(v * 1000, 1) for k, v in timer.timings.items()}
+    return {"index": index, "name": name, **result}
+
+
+def _rejected_item(index, name, error):
+    return {"index": index, "name": name, "error": str(error), "status": error.status_code}
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request body is
+    still being read. StreamingResponse listens for the disconnect message
+    on receive(), which would swallow request body chunks; here a disconnect
+    surfaces from request.stream() inside the generator instead."""
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+async def _batch_results(first, items, timing, tracking):
+    # Slike idu u pool cim stignu, rezultati se salju cim su gotovi,
+    # dok se ostatak zahtjeva jos cita
+    loop = asyncio.get_running_loop()
+    pending = set()
+    index = 0
+    next_item = None
+    failed = False
+
+    def submit(item):
+        nonlocal index
+        name, data = item
+        index += 1
+        if isinstance(data, UploadRejected):
+            return json.dumps(_rejected_item(index - 1, name, data)) + "\n"
+        pending.add(loop.run_in_executor(executor, _analyze_batch_item, index - 1, name, data, timing))
+        return None
+
+    # In-flight traje dok se ne posalje i zadnji rezultat
+    with tracking:
+        try:
+            line = submit(first)
+            if line:
+                yield line
+            next_item = asyncio.ensure_future(anext(items))
+            while next_item is not None or pending:
+                waiting = pending | ({next_item} if next_item is not None else set())
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future is not next_item:
+                        pending.discard(future)
+                        yield json.dumps(future.result()) + "\n"
+                        continue
+                    next_item = None
+                    try:
+                        item = future.result()
+                    except StopAsyncIteration:
+                        continue
+                    except UploadRejected as e:
+                        # Ostatak zahtjeva se ne cita, vec poslani rezultati ostaju
+                        failed = True
+                        print(f"[WARNING] analyze_faces rejected batch: {str(e)}")
+                        yield json.dumps({"error": str(e), "status": e.status_code}) + "\n"
+                        continue
+                    line = submit(item)
+                    if line:
+                        yield line
+                    next_item = asyncio.ensure_future(anext(items))
+        except Exception as e:
+            failed = True
+            print(f"[ERROR] analyze_faces: {str(e)}")
+        except BaseException:
+            # Klijent je prekinuo vezu ili je zahtjev otkazan
+            failed = True
+            raise
+        finally:
+            if next_item is not None:
+                next_item.cancel()
+            if failed:
+                REQUEST_ERRORS.labels("analyze-faces").inc()
+
+
+@app.post("/analyze-faces")
+async def analyze_faces(request: Request):
+    """Analyze a batch of images, streaming one NDJSON result line per image
+    in completion order. Accepts multipart/form-data with any number of file
+    fields, or application/x-ndjson with one base64 encoded image per line.
+
+    Every image gets the size and format checks of /analyze-face; a rejected
+    image yields an error line with its status. Results are streamed while
+    the rest of the request is still being received."""
+    tracking = ExitStack()
+    tracking.enter_context(track_request("analyze-faces"))
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            items = iter_multipart_images(request)
+        elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+            items = iter_ndjson_images(request)
+        else:
+            raise UploadRejected("Expected multipart/form-data or application/x-ndjson", 415)
+
+        # Prva slika se ceka ovdje, da prazan ili odbijen zahtjev dobije pravi status
+        first = await anext(items, None)
+        if first is None:
+            raise UploadRejected("No images in request", 400)
+    except UploadRejected as e:
+        REQUEST_ERRORS.labels("analyze-faces").inc()
+        tracking.close()
+        print(f"[WARNING] analyze_faces rejected upload: {str(e)}")
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=e.status_code,
+            headers={"Connection": "close"},
+        )
+    except BaseException:
+        # Kroz track_request, da se greska broji kao i unutar with bloka
+        if not tracking.__exit__(*sys.exc_info()):
+            raise
+
+    return _DuplexStreamingResponse(
+        _batch_results(first, items, _wants_timing(request), tracking),
+        media_type="application/x-ndjson",
+    )
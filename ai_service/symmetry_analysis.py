@@ -1,73 +1,95 @@
 import cv2
 import numpy as np
-import dlib
 
-class FaceSymmetryTester:
-    def __init__(self):
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+from utils.analysis_context import AnalysisContext
 
-    def detect_landmarks(self, image):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.detector(gray)
+# Parovi lijeva/desna strana (68-point iBUG), u istom redoslijedu
+JAW_LEFT, JAW_RIGHT = list(range(0, 8)), list(range(16, 8, -1))
+BROW_LEFT, BROW_RIGHT = list(range(17, 22)), list(range(26, 21, -1))
+# Tacke na sredini lica: korijen i vrh nosa, usne, brada
+MIDLINE = [27, 28, 29, 30, 33, 51, 57, 8]
+# Krajevi vilice uz uho, uglovi usana, spoljni uglovi ociju
+EAR_LEFT, EAR_RIGHT = 0, 16
+LIP_LEFT, LIP_RIGHT = 48, 54
+EYE_LEFT, EYE_RIGHT = 36, 45
+NOSE_TIP = 30
 
-        if len(faces) == 0:
-            return None
+# Verzija 1 je poredila lice s ogledalom pod imenima chin_to_ear,
+# lip_corner_to_eye_and_ear, nose_to_ear i forehead. Verzija 2 poredi lijevu i
+# desnu polovinu, pa polja imaju nova imena da ih klijent ne pomijesa.
+SYMMETRY_VERSION = 2
+SYMMETRY_FIELDS = (
+    "jaw_to_midline",
+    "lip_corner_to_eye_and_ear_sides",
+    "nose_to_ear_sides",
+    "brow_to_midline",
+)
 
-        landmarks = []
-        for face in faces:
-            shape = self.predictor(gray, face)
-            for i in range(0, 68):
-                landmarks.append((shape.part(i).x, shape.part(i).y))
-        return landmarks
 
-    def calculate_distance(self, landmarks, indices):
-        if landmarks is None:
-            return None
+def midline(landmarks):
+    """Point and unit direction of the facial midline, fitted through the
+    nose, lips and chin."""
+    points = np.asarray(landmarks, dtype=np.float32)[MIDLINE]
+    vx, vy, x, y = cv2.fitLine(points, cv2.DIST_L2, 0, 0.01, 0.01).ravel()
+    return np.array([x, y], dtype=np.float64), np.array([vx, vy], dtype=np.float64)
+
+
+def midline_distances(landmarks, indices):
+    """Perpendicular distances of the given points to the facial midline."""
+    point, direction = midline(landmarks)
+    offsets = np.asarray(landmarks, dtype=np.float64)[indices] - point
+    return np.abs(offsets[:, 0] * direction[1] - offsets[:, 1] * direction[0])
+
+
+def side_ratio(left, right):
+    """Smaller over larger of two left/right measurements: 1.0 is symmetric."""
+    larger = max(left, right)
+    return min(left, right) / larger if larger > 0 else None
 
-        points = np.array([landmarks[i] for i in indices])
-        distance = np.mean(np.linalg.norm(points - np.flip(points, axis=0), axis=1))
-        return distance
 
-    def calculate_symmetry_ratios(self, original_landmarks, mirrored_landmarks):
-        if original_landmarks is None or mirrored_landmarks is None:
+class FaceSymmetryTester:
+    """Symmetry ratios from the shared landmarks of an AnalysisContext, in the
+    68-point layout.
+
+    Each ratio compares a measurement of the left half of the face with the
+    same measurement of the right half, as smaller / larger, so a perfectly
+    symmetric face scores 1.0 and any asymmetry scores below it. The ratios
+    are returned in the order of SYMMETRY_FIELDS."""
+
+    def detect_landmarks(self, context):
+        if context.landmarks68 is None:
             return None
+        return np.asarray(context.landmarks68, dtype=np.float64)
 
-        left_indices = [i for i in range(0, 17)]
-        right_indices = [i for i in range(16, 0, -1)]
-        forehead_indices = list(range(17, 27)) + list(range(17, 26))
-        chin_to_ear_indices = left_indices + right_indices
-        lip_corner_to_eye_and_ear_indices = left_indices + right_indices
-        nose_to_ear_indices = left_indices + right_indices
+    def calculate_symmetry_ratios(self, landmarks):
+        if landmarks is None:
+            return None
 
-        chin_to_ear_distance_original = self.calculate_distance(original_landmarks, chin_to_ear_indices)
-        chin_to_ear_distance_mirrored = self.calculate_distance(mirrored_landmarks, chin_to_ear_indices)
+        pts = np.asarray(landmarks, dtype=np.float64)
 
-        lip_corner_to_eye_and_ear_distance_original = self.calculate_distance(original_landmarks, lip_corner_to_eye_and_ear_indices)
-        lip_corner_to_eye_and_ear_distance_mirrored = self.calculate_distance(mirrored_landmarks, lip_corner_to_eye_and_ear_indices)
+        def dist(a, b):
+            return float(np.linalg.norm(pts[a] - pts[b]))
 
-        nose_to_ear_distance_original = self.calculate_distance(original_landmarks, nose_to_ear_indices)
-        nose_to_ear_distance_mirrored = self.calculate_distance(mirrored_landmarks, nose_to_ear_indices)
+        # Udaljenosti od sredine lica, lijeva i desna tacka svakog para
+        jaw = midline_distances(pts, JAW_LEFT + JAW_RIGHT).reshape(2, -1).sum(axis=1)
+        brows = midline_distances(pts, BROW_LEFT + BROW_RIGHT).reshape(2, -1).sum(axis=1)
 
-        forehead_distance_original = self.calculate_distance(original_landmarks, forehead_indices)
-        forehead_distance_mirrored = self.calculate_distance(mirrored_landmarks, forehead_indices)
+        chin_to_ear = side_ratio(*jaw)
+        lip_corner_to_eye_and_ear = side_ratio(
+            dist(LIP_LEFT, EYE_LEFT) + dist(LIP_LEFT, EAR_LEFT),
+            dist(LIP_RIGHT, EYE_RIGHT) + dist(LIP_RIGHT, EAR_RIGHT),
+        )
+        nose_to_ear = side_ratio(dist(NOSE_TIP, EAR_LEFT), dist(NOSE_TIP, EAR_RIGHT))
+        forehead = side_ratio(*brows)
 
-        chin_to_ear_symmetry_ratio = chin_to_ear_distance_original / chin_to_ear_distance_mirrored
-        lip_corner_to_eye_and_ear_symmetry_ratio = lip_corner_to_eye_and_ear_distance_original / lip_corner_to_eye_and_ear_distance_mirrored
-        nose_to_ear_symmetry_ratio = nose_to_ear_distance_original / nose_to_ear_distance_mirrored
-        forehead_symmetry_ratio = forehead_distance_original / forehead_distance_mirrored
+        return chin_to_ear, lip_corner_to_eye_and_ear, nose_to_ear, forehead
 
-        return chin_to_ear_symmetry_ratio, lip_corner_to_eye_and_ear_symmetry_ratio, nose_to_ear_symmetry_ratio, forehead_symmetry_ratio
+    def test_symmetry(self, context):
+        return self.calculate_symmetry_ratios(self.detect_landmarks(context))
 
     def test_symmetry_from_path(self, image_path):
         original_image = cv2.imread(image_path)
         if original_image is None:
             return None
 
-        mirrored_image = cv2.flip(original_image, 1)
-
-        original_landmarks = self.detect_landmarks(original_image)
-        mirrored_landmarks = self.detect_landmarks(mirrored_image)
-
-        symmetry_ratios = self.calculate_symmetry_ratios(original_landmarks, mirrored_landmarks)
-        return symmetry_ratios
\ No newline at end of file
+        return self.test_symmetry(AnalysisContext(image=original_image))
@@ -0,0 +1,136 @@
+import asyncio
+import base64
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("PERSIST_UPLOADS", "0")
+
+from fastapi.testclient import TestClient
+
+import app as service
+
+
+def _png(value=0):
+    image = np.full((8, 8, 3), value, dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def _fake_analysis(data, timer=None):
+    return {"file_size_bytes": len(data)}
+
+
+def _ndjson(items):
+    return b"".join(json.dumps(item).encode() + b"\n" for item in items)
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(service, "analyze_image_bytes", _fake_analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(service.app)
+
+    def test_multipart(self):
+        png = _png()
+        response = self.client.post(
+            "/analyze-faces",
+            files=[
+                ("a", ("a.png", png, "image/png")),
+                ("b", ("b.txt", b"plain text, not an image", "text/plain")),
+                ("c", ("c.png", png, "image/png")),
+            ],
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = sorted(_lines(response), key=lambda line: line["index"])
+        self.assertEqual([line["name"] for line in lines], ["a.png", "b.txt", "c.png"])
+        self.assertEqual(lines[0]["file_size_bytes"], len(png))
+        self.assertEqual(lines[1]["status"], 415)
+        self.assertEqual(lines[2]["file_size_bytes"], len(png))
+
+    def test_ndjson(self):
+        png = _png()
+        body = _ndjson(
+            [
+                {"name": "x", "image": base64.b64encode(png).decode()},
+                {"name": "y", "image": "not base64!"},
+            ]
+        )
+        body += b"not json\n"
+        response = self.client.post(
+            "/analyze-faces", content=body, headers={"content-type": "application/x-ndjson"}
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = sorted(_lines(response), key=lambda line: line["index"])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["file_size_bytes"], len(png))
+        self.assertEqual(lines[1]["name"], "y")
+        self.assertEqual(lines[1]["status"], 400)
+        self.assertEqual(lines[2]["status"], 400)
+
+    def test_rejects_request(self):
+        response = self.client.post(
+            "/analyze-faces", content=b"", headers={"content-type": "application/x-ndjson"}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/analyze-faces", content=b"x", headers={"content-type": "text/plain"}
+        )
+        self.assertEqual(response.status_code, 415)
+
+    def test_streams_while_reading(self):
+        # The second line is only sent once the first result has arrived
+        first = _ndjson([{"name": "a", "image": base64.b64encode(_png()).decode()}])
+        second = _ndjson([{"name": "b", "image": base64.b64encode(_png()).decode()}])
+
+        async def run():
+            sent = []
+            got_result = asyncio.Event()
+            body = [first, second]
+
+            async def receive():
+                if len(body) == 1:
+                    await got_result.wait()
+                chunk = body.pop(0) if body else b""
+                return {"type": "http.request", "body": chunk, "more_body": bool(body)}
+
+            async def send(message):
+                sent.append(message)
+                if message["type"] == "http.response.body" and message.get("body"):
+                    got_result.set()
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": "/analyze-faces",
+                "raw_path": b"/analyze-faces",
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"content-type", b"application/x-ndjson")],
+                "client": ("test", 1),
+                "server": ("test", 80),
+            }
+            await asyncio.wait_for(service.app(scope, receive, send), timeout=10)
+            return sent
+
+        sent = asyncio.run(run())
+        chunks = [m["body"] for m in sent if m["type"] == "http.response.body"]
+        names = [json.loads(line)["name"] for line in b"".join(chunks).splitlines()]
+        self.assertEqual(names, ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.analysis_context import AnalysisContext
+from utils.analyzers import run_analyzers
+from utils.dynaface_analysis import FrontalFace, analyze_dynaface
+
+from dynaface.measures import AnalyzeFAI, AnalyzeOralCommissureExcursion
+
+TESTS_DATA = os.path.join(
+    os.path.dirname(__file__), "..", "..", "dynaface-main", "dynaface-lib", "tests_data"
+)
+
+
+def _landmarks(seed=0):
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(300, 700, (98, 2)).astype(np.float32)
+    landmarks[96], landmarks[97] = (420.0, 450.0), (580.0, 450.0)
+    return landmarks
+
+
+def _context(path, pad=0):
+    image = cv2.imread(path)
+    if pad:
+        image = cv2.copyMakeBorder(image, pad, 0, pad, 0, cv2.BORDER_REPLICATE)
+    return AnalysisContext(cv2.imencode(".jpg", image)[1].tobytes())
+
+
+class TestDynafaceAnalysis(unittest.TestCase):
+    def test_lateral_stays_in_image_coordinates(self):
+        # A yaw this large would send AnalyzeFace down the lateral crop path
+        landmarks = _landmarks()
+        face = FrontalFace([AnalyzeFAI(), AnalyzeOralCommissureExcursion()])
+        img = np.full((1000, 1000, 3), 90, dtype=np.uint8)
+        face.load_image(img, crop=False, landmarks=landmarks, headpose=[45, 0, 0])
+        self.assertFalse(face.lateral)
+        np.testing.assert_allclose(face.landmarks, landmarks)
+
+    def test_measures_without_render(self):
+        face = FrontalFace([AnalyzeFAI(), AnalyzeOralCommissureExcursion()])
+        img = np.full((1000, 1000, 3), 90, dtype=np.uint8)
+        face.load_image(img, crop=False, landmarks=_landmarks(), headpose=[0, 0, 0])
+        before = face.render_img.copy()
+
+        context = AnalysisContext(image=img)
+        context.face = face
+        result = analyze_dynaface(context)
+        for key in ("fai", "oce.l", "oce.r"):
+            self.assertIsNotNone(result[key])
+        np.testing.assert_array_equal(face.render_img, before)
+
+    def test_no_face(self):
+        context = AnalysisContext(image=np.zeros((64, 64, 3), dtype=np.uint8))
+        context.face = None
+        self.assertEqual(analyze_dynaface(context), {"fai": None, "oce.l": None, "oce.r": None})
+
+    def test_real_face(self):
+        results = run_analyzers(_context(os.path.join(TESTS_DATA, "img1-512.jpg")))
+        dynaface = results["dynaface"]
+        self.assertIsNotNone(dynaface)
+        self.assertIsNotNone(dynaface["fai"])
+        self.assertIsNotNone(dynaface["oce.l"])
+        self.assertIsNotNone(dynaface["oce.r"])
+        self.assertIsNotNone(results["symmetry"])
+
+    def test_real_lateral_face(self):
+        # Landmarks follow the face when the image is padded, not a crop of it
+        path = os.path.join(TESTS_DATA, "img2-1024-right-lateral.jpg")
+        plain = _context(path).landmarks
+        padded = _context(path, pad=128).landmarks
+        self.assertIsNotNone(plain)
+        shift = np.median(padded - plain, axis=0)
+        np.testing.assert_allclose(shift, (128, 128), atol=8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import GoldenFace
+import numpy as np
+from GoldenFace import landmark
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import golden_ratio_analysis
+from utils.golden_ratio_analysis import (
+    GOLDENFACE_VERSION,
+    GoldenFaceAdapter,
+    analyze_golden_ratio,
+    installed_goldenface_version,
+)
+
+
+def face68(asymmetry=3.0):
+    """A rough 68-point face; GoldenFace needs the eyes to differ in width."""
+    p = np.zeros((68, 2))
+    t = np.linspace(np.pi, 0, 17)
+    p[0:17] = np.column_stack([200 - 100 * np.cos(t), 200 + 120 * np.sin(t)])
+    p[17:22] = np.linspace([120, 150], [185, 140], 5)
+    p[22:27] = np.linspace([215, 140], [280, 150], 5)
+    p[27:31] = np.column_stack([np.full(4, 200), np.linspace(160, 230, 4)])
+    p[31:36] = np.column_stack([np.linspace(180, 220, 5), np.full(5, 245)])
+    a = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+    p[36:42] = np.column_stack([155 - 20 * np.cos(a), 175 + 8 * np.sin(a)])
+    p[42:48] = np.column_stack([245 - 20 * np.cos(a), 175 + 8 * np.sin(a)])
+    p[42, 0] -= asymmetry
+    a = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+    p[48:60] = np.column_stack([200 - 35 * np.cos(a), 285 + 12 * np.sin(a)])
+    a = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+    p[60:68] = np.column_stack([200 - 25 * np.cos(a), 285 + 5 * np.sin(a)])
+    return p.astype(np.float32)
+
+
+class TestGoldenRatio(unittest.TestCase):
+    def setUp(self):
+        self.landmarks = face68()
+        self.border = np.array([100, 140, 200, 180])
+
+    def test_pinned_version(self):
+        self.assertEqual(installed_goldenface_version(), GOLDENFACE_VERSION)
+
+    def test_matches_goldenface(self):
+        geometric, similarity = GoldenFaceAdapter().ratios(self.landmarks, self.border)
+
+        # The same calculation through GoldenFace's own face object
+        face = GoldenFace.goldenFace.__new__(GoldenFace.goldenFace)
+        face.faceBorders = self.border
+        face.landmarks = [self.landmarks[np.newaxis]]
+        face.facePoints = landmark.detectLandmark(face.landmarks)
+        self.assertAlmostEqual(geometric, face.geometricRatio())
+        self.assertTrue(-1 <= similarity <= 1)
+
+    def test_analyze(self):
+        context = SimpleNamespace(
+            face=object(), landmarks68=self.landmarks, face_border=self.border
+        )
+        result = analyze_golden_ratio(context)
+        self.assertNotIn("error", result)
+        self.assertIsNotNone(result["geometric_ratio"])
+        self.assertIsNotNone(result["similarity_ratio"])
+
+    def test_other_version_refused(self):
+        with self.assertRaises(RuntimeError):
+            GoldenFaceAdapter(version="1.2")
+        context = SimpleNamespace(
+            face=object(), landmarks68=self.landmarks, face_border=self.border
+        )
+        with mock.patch.object(golden_ratio_analysis, "_adapter", None), mock.patch.object(
+            golden_ratio_analysis, "installed_goldenface_version", return_value="2.0"
+        ):
+            result = analyze_golden_ratio(context)
+        self.assertIsNone(result["geometric_ratio"])
+        self.assertIn("2.0", result["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
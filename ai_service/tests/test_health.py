@@ -0,0 +1,57 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("PERSIST_UPLOADS", "0")
+
+from fastapi.testclient import TestClient
+
+import app as service
+
+
+class TestHealth(unittest.TestCase):
+    def setUp(self):
+        state = {"ready": False, "failed": False, "error": None}
+        patcher = mock.patch.dict(service.service_state, state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(service.app)
+
+    def test_ready_after_warm_up(self):
+        self.assertEqual(self.client.get("/readyz").status_code, 503)
+        self.assertEqual(self.client.get("/healthz").status_code, 200)
+        with mock.patch.object(service, "warm_up"), mock.patch.object(service, "run_analyzers"):
+            service.warm_up_service()
+        self.assertEqual(self.client.get("/readyz").status_code, 200)
+        self.assertEqual(self.client.get("/healthz").status_code, 200)
+
+    def test_warm_up_retries(self):
+        warm_up = mock.Mock(side_effect=[RuntimeError("no models"), None])
+        with mock.patch.object(service, "warm_up", warm_up), mock.patch.object(
+            service, "run_analyzers"
+        ), mock.patch.object(service.time, "sleep") as sleep:
+            service.warm_up_service()
+        self.assertEqual(warm_up.call_count, 2)
+        sleep.assert_called_once()
+        self.assertEqual(self.client.get("/readyz").status_code, 200)
+
+    def test_warm_up_gives_up(self):
+        warm_up = mock.Mock(side_effect=RuntimeError("no models"))
+        with mock.patch.object(service, "warm_up", warm_up), mock.patch.object(
+            service.time, "sleep"
+        ) as sleep:
+            service.warm_up_service()
+        self.assertEqual(warm_up.call_count, service.WARMUP_ATTEMPTS)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(delays, sorted(delays))
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["error"], "no models")
+        # Liveness pada, pa se pod restartuje umjesto da zauvijek ceka
+        self.assertEqual(self.client.get("/healthz").status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("PERSIST_UPLOADS", "0")
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import app as service
+from utils.metrics import StageTimer
+
+
+def _errors(endpoint):
+    value = REGISTRY.get_sample_value(
+        "ai_service_request_errors_total", {"endpoint": endpoint}
+    )
+    return value or 0.0
+
+
+class TestMetrics(unittest.TestCase):
+    def test_nested_stages_are_exclusive(self):
+        timer = StageTimer()
+        start = time.perf_counter()
+        with timer.stage("moles"):
+            time.sleep(0.02)
+            with timer.stage("decode"):
+                time.sleep(0.05)
+        total = time.perf_counter() - start
+
+        self.assertGreaterEqual(timer.timings["decode"], 0.05)
+        self.assertLess(timer.timings["moles"], 0.05)
+        self.assertLessEqual(sum(timer.timings.values()), total)
+        self.assertIn("decode;dur=", timer.server_timing())
+
+    def test_batch_error_counted(self):
+        async def broken(request):
+            raise RuntimeError("broken parser")
+            yield
+
+        before = _errors("analyze-faces")
+        client = TestClient(service.app, raise_server_exceptions=False)
+        with mock.patch.object(service, "iter_ndjson_images", broken):
+            response = client.post(
+                "/analyze-faces", content=b"{}\n", headers={"content-type": "application/x-ndjson"}
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(_errors("analyze-faces"), before + 1)
+
+    def test_rejected_batch_counted(self):
+        before = _errors("analyze-faces")
+        client = TestClient(service.app)
+        response = client.post("/analyze-faces", content=b"x", headers={"content-type": "text/plain"})
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(_errors("analyze-faces"), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from symmetry_analysis import (
+    BROW_LEFT,
+    BROW_RIGHT,
+    JAW_LEFT,
+    JAW_RIGHT,
+    MIDLINE,
+    SYMMETRY_FIELDS,
+    FaceSymmetryTester,
+)
+from utils.analyzers import ANALYZERS
+
+PAIRS = list(zip(JAW_LEFT + BROW_LEFT + [36, 48], JAW_RIGHT + BROW_RIGHT + [45, 54]))
+
+
+def symmetric_face(seed=0, center=200.0):
+    rng = np.random.default_rng(seed)
+    landmarks = np.zeros((68, 2))
+    landmarks[MIDLINE, 0] = center
+    landmarks[MIDLINE, 1] = np.linspace(100, 300, len(MIDLINE))
+    for left, right in PAIRS:
+        x, y = center - rng.uniform(20, 120), rng.uniform(80, 320)
+        landmarks[left] = (x, y)
+        landmarks[right] = (2 * center - x, y)
+    return landmarks
+
+
+def rotate(landmarks, degrees, center=(200.0, 200.0)):
+    t = np.radians(degrees)
+    r = np.array([[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]])
+    return (landmarks - center) @ r.T + center
+
+
+class TestSymmetry(unittest.TestCase):
+    def test_symmetric_face(self):
+        tester = FaceSymmetryTester()
+        for seed in range(5):
+            face = symmetric_face(seed)
+            for landmarks in (face, rotate(face, 15)):
+                ratios = tester.calculate_symmetry_ratios(landmarks)
+                np.testing.assert_allclose(ratios, 1.0, atol=1e-4)
+
+    def test_asymmetric_face(self):
+        tester = FaceSymmetryTester()
+        face = symmetric_face()
+        # Desna strana vilice, obrva i ugao usana pomjereni prema van
+        face[JAW_RIGHT + BROW_RIGHT, 0] += 15
+        face[54, 0] += 15
+        ratios = tester.calculate_symmetry_ratios(face)
+        self.assertEqual(len(ratios), 4)
+        for ratio in ratios:
+            self.assertLess(ratio, 0.99)
+            self.assertGreater(ratio, 0.0)
+        self.assertEqual(len(set(np.round(ratios, 6))), 4)
+
+    def test_response_fields(self):
+        # The fields of the mirror comparison are not reused for these ratios
+        context = SimpleNamespace(landmarks68=symmetric_face())
+        result = ANALYZERS["symmetry"](context)
+        self.assertEqual(tuple(result), SYMMETRY_FIELDS)
+        for old in ("chin_to_ear", "lip_corner_to_eye_and_ear", "nose_to_ear", "forehead"):
+            self.assertNotIn(old, result)
+        np.testing.assert_allclose(list(result.values()), 1.0, atol=1e-4)
+
+    def test_no_face(self):
+        self.assertIsNone(FaceSymmetryTester().calculate_symmetry_ratios(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.upload_store import UploadStore
+
+
+class TestUploadStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def _files(self):
+        return sorted(os.listdir(self.folder))
+
+    def test_evicts_oldest_files(self):
+        store = UploadStore(self.folder, max_files=3)
+        store.start()
+        for i in range(5):
+            store.save(f"{i}.jpg", b"x" * 10)
+        store.close()
+        self.assertEqual(self._files(), ["2.jpg", "3.jpg", "4.jpg"])
+
+    def test_evicts_by_size(self):
+        store = UploadStore(self.folder, max_bytes=25)
+        store.start()
+        for i in range(4):
+            store.save(f"{i}.jpg", b"x" * 10)
+        store.close()
+        self.assertEqual(self._files(), ["2.jpg", "3.jpg"])
+
+    def test_evicts_old_files_on_start(self):
+        old = os.path.join(self.folder, "old.jpg")
+        with open(old, "wb") as f:
+            f.write(b"x")
+        day_ago = time.time() - 24 * 3600
+        os.utime(old, (day_ago, day_ago))
+        with open(os.path.join(self.folder, "new.jpg"), "wb") as f:
+            f.write(b"x")
+
+        store = UploadStore(self.folder, max_age=3600)
+        store.start()
+        store.close()
+        self.assertEqual(self._files(), ["new.jpg"])
+
+    def test_disabled(self):
+        store = UploadStore(self.folder, enabled=False)
+        store.start()
+        self.assertFalse(store.save("a.jpg", b"x"))
+        store.close()
+        self.assertEqual(self._files(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
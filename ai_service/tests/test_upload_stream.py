@@ -0,0 +1,162 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("PERSIST_UPLOADS", "0")
+
+from fastapi.testclient import TestClient
+
+import app as service
+from utils.upload_stream import (
+    UploadRejected,
+    iter_multipart_images,
+    iter_ndjson_images,
+    read_image_upload,
+)
+
+BOUNDARY = "testboundary"
+
+
+class FakeRequest:
+    """Just the parts of a Starlette request the upload readers use."""
+
+    def __init__(self, body, content_type, chunk=1024):
+        self.headers = {"content-type": content_type}
+        self.chunks = [body[i : i + chunk] for i in range(0, len(body), chunk)]
+        self.consumed = 0
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+def _png(width=8, height=8):
+    return cv2.imencode(".png", np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+def _multipart(*parts):
+    body = b""
+    for name, filename, data in parts:
+        body += (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    body += f"--{BOUNDARY}--\r\n".encode()
+    return FakeRequest(body, f"multipart/form-data; boundary={BOUNDARY}")
+
+
+def _read(request, **kwargs):
+    return asyncio.run(read_image_upload(request, **kwargs))
+
+
+def _collect(items):
+    async def run():
+        return [item async for item in items]
+
+    return asyncio.run(run())
+
+
+class TestReadImageUpload(unittest.TestCase):
+    def test_valid(self):
+        png = _png()
+        filename, data = _read(_multipart(("image", "a.png", png)))
+        self.assertEqual(filename, "a.png")
+        self.assertEqual(bytes(data), png)
+
+    def test_oversized_rejected_early(self):
+        # A PNG header followed by far more data than allowed
+        request = _multipart(("image", "a.png", _png() + b"\0" * 100_000))
+        with self.assertRaises(UploadRejected) as ctx:
+            _read(request, max_bytes=4096)
+        self.assertEqual(ctx.exception.status_code, 413)
+        self.assertLess(request.consumed, len(request.chunks))
+
+    def test_unsupported_format(self):
+        with self.assertRaises(UploadRejected) as ctx:
+            _read(_multipart(("image", "a.txt", b"this is plain text, not an image")))
+        self.assertEqual(ctx.exception.status_code, 415)
+
+    def test_too_many_pixels(self):
+        # Only the header is needed to know the dimensions
+        png = bytearray(_png())
+        png[16:24] = struct.pack(">II", 20000, 20000)
+        with self.assertRaises(UploadRejected) as ctx:
+            _read(_multipart(("image", "a.png", bytes(png))))
+        self.assertEqual(ctx.exception.status_code, 413)
+
+    def test_missing_field(self):
+        with self.assertRaises(UploadRejected) as ctx:
+            _read(_multipart(("other", "a.png", _png())))
+        self.assertEqual(ctx.exception.status_code, 400)
+
+    def test_not_multipart(self):
+        with self.assertRaises(UploadRejected) as ctx:
+            _read(FakeRequest(b"{}", "application/json"))
+        self.assertEqual(ctx.exception.status_code, 415)
+
+
+class TestBatchUploads(unittest.TestCase):
+    def test_multipart_rejects_single_images(self):
+        png = _png()
+        request = _multipart(
+            ("a", "a.png", png),
+            ("b", "b.png", png + b"\0" * 10_000),
+            ("c", "c.txt", b"plain text, not an image"),
+        )
+        items = _collect(iter_multipart_images(request, max_bytes=4096))
+        self.assertEqual([name for name, _ in items], ["a.png", "b.png", "c.txt"])
+        self.assertEqual(bytes(items[0][1]), png)
+        self.assertEqual(items[1][1].status_code, 413)
+        self.assertEqual(items[2][1].status_code, 415)
+
+    def test_multipart_batch_size(self):
+        png = _png()
+        request = _multipart(*[(f"f{i}", f"{i}.png", png) for i in range(3)])
+        with self.assertRaises(UploadRejected) as ctx:
+            _collect(iter_multipart_images(request, max_images=2))
+        self.assertEqual(ctx.exception.status_code, 413)
+
+    def test_ndjson_line_length(self):
+        png = _png()
+        lines = [
+            {"name": "big", "image": base64.b64encode(b"\0" * 20_000).decode()},
+            {"name": "ok", "image": base64.b64encode(png).decode()},
+        ]
+        body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+        items = _collect(iter_ndjson_images(FakeRequest(body, "application/x-ndjson"), max_bytes=4096))
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0][1].status_code, 413)
+        self.assertEqual(items[1][0], "ok")
+        self.assertEqual(bytes(items[1][1]), png)
+
+    def test_ndjson_batch_size(self):
+        line = json.dumps({"name": "a", "image": base64.b64encode(_png()).decode()})
+        body = (line + "\n").encode() * 3
+        with self.assertRaises(UploadRejected) as ctx:
+            _collect(iter_ndjson_images(FakeRequest(body, "application/x-ndjson"), max_images=2))
+        self.assertEqual(ctx.exception.status_code, 413)
+
+
+class TestAnalyzeFaceUpload(unittest.TestCase):
+    def test_rejected_before_analysis(self):
+        client = TestClient(service.app)
+        response = client.post(
+            "/analyze-face", files={"image": ("a.txt", b"plain text, not an image", "text/plain")}
+        )
+        self.assertEqual(response.status_code, 415)
+        response = client.post("/analyze-face", files={"other": ("a.png", _png(), "image/png")})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+from utils.dynaface_analysis import WFLW_TO_68, analyze_landmarks
+from utils.image_header import sniff_image
+from utils.metrics import StageTimer
+
+# Detekcija i landmarki rade na smanjenoj slici, duza strana najmanje ovoliko
+DETECT_MIN_SIDE = 1024
+# Lice za trazenje mladeza treba najmanje ovoliko piksela sirine
+MOLE_MIN_FACE_SIDE = 512
+
+_REDUCED_COLOR = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def reduction_factor(size, min_size):
+    """Largest JPEG reduction (1, 2, 4 or 8) keeping size / factor >= min_size."""
+    factor = 1
+    for f in (2, 4, 8):
+        if size / f >= min_size:
+            factor = f
+    return factor
+
+
+class AnalysisContext:
+    """Per-request state shared by all analyzers.
+
+    The upload is decoded once and the grayscale/HSV planes and the face
+    detection are computed on first use, so no analyzer repeats that work.
+
+    Large uploads are decoded at a reduced resolution (JPEG DCT scaling) for
+    detection and landmarking; `scale` maps those coordinates back to the
+    original image. Full resolution is only decoded for regions that need
+    detail, see face_region()."""
+
+    def __init__(self, data=None, image=None, timer=None):
+        self.data = data
+        self.timer = timer or StageTimer()
+        self._decoded = {}
+        if image is not None:
+            self._decoded[1] = image
+            self.scale = 1
+            self.width, self.height = image.shape[1], image.shape[0]
+            return
+
+        header = sniff_image(data)
+        if header is not None and header[1]:
+            _, width, height = header
+            self.scale = reduction_factor(max(width, height), DETECT_MIN_SIDE)
+        else:
+            width = height = None
+            self.scale = 1
+
+        # imdecode primjenjuje EXIF rotaciju, header dimenzije su prije nje
+        reduced = self.image
+        if width is None:
+            width, height = reduced.shape[1] * self.scale, reduced.shape[0] * self.scale
+        elif (reduced.shape[1] > reduced.shape[0]) != (width > height):
+            width, height = height, width
+        self.width, self.height = width, height
+
+    def decode(self, factor):
+        """The whole image decoded at 1/factor resolution, cached per factor."""
+        image = self._decoded.get(factor)
+        if image is None:
+            with self.timer.stage("decode"):
+                buf = np.frombuffer(self.data, dtype=np.uint8)
+                image = cv2.imdecode(buf, _REDUCED_COLOR[factor])
+                if image is None:
+                    raise ValueError("Unable to read image with OpenCV")
+            self._decoded[factor] = image
+        return image
+
+    @property
+    def image(self):
+        """The detection image, at 1/scale of the original resolution."""
+        return self.decode(self.scale)
+
+    @cached_property
+    def gray(self):
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def hsv(self):
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV)
+
+    @cached_property
+    def face(self):
+        """The dynaface AnalyzeFace of the detection image, or None."""
+        image = self.image
+        with self.timer.stage("landmarks"):
+            return analyze_landmarks(image)
+
+    @cached_property
+    def landmarks(self):
+        """The 98 SPIGA (WFLW) landmarks as a float32 array, or None."""
+        if self.face is None:
+            return None
+        return np.asarray(self.face.landmarks, dtype=np.float32)
+
+    @cached_property
+    def landmarks68(self):
+        """The same landmarks in the 68-point iBUG layout, or None."""
+        return None if self.landmarks is None else self.landmarks[WFLW_TO_68]
+
+    @cached_property
+    def face_border(self):
+        """(x, y, w, h) bounding box of the 68-point face outline, or None."""
+        if self.landmarks68 is None:
+            return None
+        return np.array(cv2.boundingRect(self.landmarks68))
+
+    def face_region(self, min_side=MOLE_MIN_FACE_SIDE, margin=0.25):
+        """Crop around the face at the lowest resolution that keeps the face
+        at least min_side pixels wide (full resolution at most).
+
+        Returns (crop, landmarks, offset, factor): landmarks are in crop
+        coordinates and a crop point p maps to the original image as
+        (p + offset) * factor. Returns None when no face was found."""
+        if self.face is None:
+            return None
+
+        x, y, w, h = (int(v) * self.scale for v in self.face_border)
+        factor = reduction_factor(w, min_side) if self.data is not None else 1
+        factor = min(factor, self.scale)
+        image = self.decode(factor)
+
+        # Granice u koordinatama dekodirane slike
+        mx, my = int(w * margin), int(h * margin)
+        x0 = max(0, (x - mx) // factor)
+        y0 = max(0, (y - 2 * my) // factor)
+        x1 = min(image.shape[1], (x + w + mx) // factor)
+        y1 = min(image.shape[0], (y + h + my) // factor)
+
+        landmarks = self.landmarks68 * (self.scale / factor) - np.array([x0, y0], dtype=np.float32)
+        return image[y0:y1, x0:x1], landmarks, np.array([x0, y0]), factor
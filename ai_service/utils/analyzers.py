@@ -0,0 +1,58 @@
+from symmetry_analysis import SYMMETRY_FIELDS, FaceSymmetryTester
+from utils.dynaface_analysis import analyze_dynaface
+from utils.golden_ratio_analysis import analyze_golden_ratio
+from utils.mole_detection import detect_moles_in_context
+
+# Ime -> funkcija(context); sve analize citaju isti AnalysisContext
+ANALYZERS = {}
+
+
+def register_analyzer(name):
+    """Decorator adding fn(context) -> result to the analyzer registry."""
+    def wrap(fn):
+        ANALYZERS[name] = fn
+        return fn
+    return wrap
+
+
+def run_analyzers(context, names=None):
+    """Run the named analyzers (all by default) on one context. A failing
+    analyzer yields None for its entry instead of failing the request."""
+    results = {}
+    for name in names or list(ANALYZERS):
+        try:
+            with context.timer.stage(name):
+                results[name] = ANALYZERS[name](context)
+        except Exception as e:
+            print(f"[WARNING] {name} analysis failed: {e}")
+            results[name] = None
+    return results
+
+
+_symmetry = FaceSymmetryTester()
+
+
+@register_analyzer("moles")
+def _moles(context):
+    return detect_moles_in_context(context)
+
+
+@register_analyzer("golden_ratio")
+def _golden_ratio(context):
+    return analyze_golden_ratio(context)
+
+
+@register_analyzer("symmetry")
+def _symmetry_ratios(context):
+    ratios = _symmetry.test_symmetry(context)
+    if ratios is None:
+        return None
+    return {
+        key: None if value is None else float(value)
+        for key, value in zip(SYMMETRY_FIELDS, ratios)
+    }
+
+
+@register_analyzer("dynaface")
+def _dynaface(context):
+    return analyze_dynaface(context)
@@ -1,31 +1,86 @@
-# #from dynaface.analysis import AnalyzeFace
-# import dynaface.models as models
-# import cv2
-
-# def analyze_face_asymmetry(image_path):
-#     try:
-#         if not models.are_models_init():
-#             models.init_models()
-
-#         img = cv2.imread(image_path)
-#         if img is None:
-#             raise ValueError("Image could not be loaded.")
-
-#         face = AnalyzeFace()
-#         face.load_image(img)
-#         result = face.analyze()
-
-#         fai = result.get("FAI")
-#         oce = result.get("OCE")
-#         landmarks = face.landmarks
-
-#         return {
-#             "fai": round(fai, 2) if fai else None,
-#             "oce": round(oce, 2) if oce else None,
-#             "landmarks_detected": len(landmarks) if landmarks else 0
-#         }
-
-#     except Exception as e:
-#         return {
-#             "error": f"Failed to analyze with Dynaface: {str(e)}"
-#         }
\ No newline at end of file
+import os
+import threading
+
+import cv2
+import numpy as np
+import dynaface.models as models
+from dynaface.facial import AnalyzeFace
+from dynaface.measures import AnalyzeFAI, AnalyzeOralCommissureExcursion
+
+# Direktorij za dynaface modele, preuzimaju se ako ne postoje
+MODEL_PATH = os.environ.get("DYNAFACE_MODEL_PATH")
+MODEL_DEVICE = os.environ.get("DYNAFACE_DEVICE")
+
+# WFLW 98 tacaka (SPIGA) -> iBUG 68 tacaka (GoldenFace, simetrija, mladezi)
+WFLW_TO_68 = np.array(
+    list(range(0, 33, 2))                                   # vilica
+    + [33, 34, 35, 36, 37, 42, 43, 44, 45, 46]              # obrve
+    + [51, 52, 53, 54, 55, 56, 57, 58, 59]                  # nos
+    + [60, 61, 63, 64, 65, 67, 68, 69, 71, 72, 73, 75]      # oci
+    + list(range(76, 96))                                   # usta
+)
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def init_dynaface():
+    """Download (if needed) and load the MTCNN/SPIGA models, once per process."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        path = models.download_models(MODEL_PATH)
+        models.init_models(model_path=path, device=MODEL_DEVICE or models.detect_device())
+        _initialized = True
+
+
+class FrontalFace(AnalyzeFace):
+    """AnalyzeFace that keeps every face on the frontal path.
+
+    For a lateral face dynaface flips and crops the image and runs the
+    sagittal analysis, leaving the landmarks in crop coordinates. The service
+    needs them in image coordinates for every upload and does not use the
+    sagittal profile, so faces are never treated as lateral."""
+
+    def is_lateral(self):
+        return False, False
+
+
+def analyze_landmarks(image_bgr):
+    """Run face detection and SPIGA once on a BGR image.
+
+    Returns the AnalyzeFace holding the 98 landmarks in image coordinates,
+    set up with the FAI and OCE measures, or None when no face is found."""
+    init_dynaface()
+    face = FrontalFace([AnalyzeFAI(), AnalyzeOralCommissureExcursion()])
+    face.load_image(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB), crop=False)
+    if face.is_no_face():
+        return None
+    return face
+
+
+def analyze_dynaface(context):
+    """FAI and OCE from the shared dynaface landmarks.
+
+    The measures are computed directly with render=False, which every
+    dynaface release supports; AnalyzeFace.analyze() draws them as well."""
+    result = {"fai": None, "oce.l": None, "oce.r": None}
+    face = context.face
+    if face is None:
+        return result
+    for measure in face.measures:
+        if measure.enabled:
+            result.update(measure.calc(face, render=False))
+    return result
+
+
+def warm_up():
+    """Load the models and run MTCNN and SPIGA once on a synthetic image, so
+    the first real request does not pay for lazy initialization."""
+    init_dynaface()
+    image = np.full((512, 512, 3), 160, dtype=np.uint8)
+    cv2.ellipse(image, (256, 256), (140, 190), 0, 0, 360, (200, 170, 150), -1)
+    models.mtcnn_model.detect(image)
+    # SPIGA se pokrece direktno, sinteticko lice MTCNN ne mora prepoznati
+    models.spiga_model.inference(image, [[116, 66, 280, 380]])
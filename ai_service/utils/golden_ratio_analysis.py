@@ -1,16 +1,86 @@
+import importlib.metadata
+import json
+import os
+import threading
+
 import GoldenFace
+import numpy as np
+from GoldenFace import goldenMath, landmark
+
+# Adapter koristi interne dijelove GoldenFace-a, provjeren je samo za ovu verziju
+GOLDENFACE_VERSION = "1.1"
+GOLDEN_VECTOR_PATH = os.path.join(os.path.dirname(GoldenFace.__file__), "goldenFace.json")
 
+# goldenMath drzi unitSize kao globalnu varijablu modula
+_golden_lock = threading.Lock()
+_adapter = None
 
-def analyze_golden_ratio(image_path):
+
+def installed_goldenface_version():
     try:
-        face = GoldenFace.goldenFace(image_path)
+        return importlib.metadata.version("GoldenFace")
+    except importlib.metadata.PackageNotFoundError:
+        return None
 
-        golden_data = {
-            "geometric_ratio": face.geometricRatio(),
-            "similarity_ratio": face.similarityRatio(),
-        }
 
-        return golden_data
+class GoldenFaceAdapter:
+    """GoldenFace ratios computed from landmarks we already have.
+
+    GoldenFace only analyzes an image it detects and landmarks itself, so its
+    calculations are called directly. They depend on its internals: the
+    facePoints layout of landmark.detectLandmark(), the goldenMath functions
+    and their module-global unitSize, and the bundled goldenFace.json
+    reference vector. All of that is kept in this class, which refuses any
+    version other than GOLDENFACE_VERSION instead of giving wrong numbers."""
+
+    def __init__(self, version=None):
+        version = installed_goldenface_version() if version is None else version
+        if version != GOLDENFACE_VERSION:
+            raise RuntimeError(
+                f"GoldenFace {version} is not supported, expected {GOLDENFACE_VERSION}"
+            )
+        # goldenFace.similarityRatio() u 1.1 cita landmark.yaml umjesto ovog fajla
+        with open(GOLDEN_VECTOR_PATH) as f:
+            self.golden_vector = json.load(f)
+
+    def ratios(self, landmarks68, face_border):
+        """Return (geometric_ratio, similarity_ratio) for 68-point landmarks
+        and the (x, y, w, h) face border."""
+        face_points = landmark.detectLandmark([np.asarray(landmarks68)[np.newaxis]])
+        with _golden_lock:
+            goldenMath.unitSize = goldenMath.calculateUnit(face_points)
+            tzm = goldenMath.calculateTZM(face_border, face_points)
+            tgsm = goldenMath.calculateTGSM(face_border, face_points)
+            vfm = goldenMath.calculateVFM(face_border, face_points)
+            tsm = goldenMath.calculateTSM(face_border, face_points)
+            lc = goldenMath.calculateLC(face_border, face_points)
+            vector = goldenMath.face2Vec(face_border, face_points)
+
+        # Isto kao goldenFace.geometricRatio(), koji TZM racuna dvaput
+        geometric_ratio = 100 - (tzm + tgsm + vfm + tzm + tsm + lc) / 6
+        similarity_ratio = goldenMath.vectorFaceSimilarity(vector, self.golden_vector)
+        return float(geometric_ratio), float(similarity_ratio)
+
+
+def golden_face_adapter():
+    global _adapter
+    if _adapter is None:
+        _adapter = GoldenFaceAdapter()
+    return _adapter
+
+
+def analyze_golden_ratio(context):
+    try:
+        if context.face is None:
+            raise ValueError("No face detected")
+
+        geometric_ratio, similarity_ratio = golden_face_adapter().ratios(
+            context.landmarks68, context.face_border
+        )
+        return {
+            "geometric_ratio": geometric_ratio,
+            "similarity_ratio": similarity_ratio,
+        }
 
     except Exception as e:
         return {
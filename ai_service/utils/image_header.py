@@ -0,0 +1,68 @@
+import struct
+
+# JPEG SOFn markeri koji nose dimenzije (bez DHT/JPG/DAC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def sniff_image(data):
+    """Read the format and stored dimensions from the first bytes of an image.
+
+    Returns (format, width, height), (format, None, None) when the header is
+    recognized but the dimensions are not in the given bytes yet, or None for
+    an unknown format. JPEG dimensions are before any EXIF rotation."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        if len(data) < 24:
+            return "png", None, None
+        width, height = struct.unpack(">II", data[16:24])
+        return "png", width, height
+
+    if data[:3] == b"\xff\xd8\xff":
+        return ("jpeg", *_jpeg_dimensions(data))
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ("webp", *_webp_dimensions(data))
+
+    if data[:2] in (b"BM",):
+        if len(data) < 26:
+            return "bmp", None, None
+        width, height = struct.unpack("<ii", data[18:26])
+        return "bmp", width, abs(height)
+
+    return None
+
+
+def _jpeg_dimensions(data):
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None, None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", data[pos + 2 : pos + 4])
+        if marker in _JPEG_SOF:
+            if pos + 9 > len(data):
+                return None, None
+            height, width = struct.unpack(">HH", data[pos + 5 : pos + 9])
+            return width, height
+        pos += 2 + length
+    return None, None
+
+
+def _webp_dimensions(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None, None
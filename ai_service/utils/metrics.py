@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Od 5 ms do 30 s, stage-ovi su od dekodiranja do SPIGA inferencije
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "ai_service_stage_seconds", "Time spent in each analysis stage.", ["stage"], buckets=BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "ai_service_stage_errors_total", "Analysis stages that raised an error.", ["stage"]
+)
+REQUEST_SECONDS = Histogram(
+    "ai_service_request_seconds", "End-to-end request latency.", ["endpoint"], buckets=BUCKETS
+)
+REQUEST_ERRORS = Counter(
+    "ai_service_request_errors_total", "Requests that returned an error.", ["endpoint"]
+)
+IN_FLIGHT = Gauge(
+    "ai_service_requests_in_flight", "Requests currently being processed.", ["endpoint"]
+)
+IMAGES = Counter("ai_service_images_total", "Images analyzed.", ["endpoint"])
+
+
+class StageTimer:
+    """Collects the stage timings of one image; every stage is also recorded
+    in the process-wide histograms and error counters.
+
+    Stages are exclusive: a stage entered inside another one (e.g. a lazy
+    decode triggered by an analyzer) is recorded on its own and its time is
+    left out of the enclosing stage, so the timings add up to the total."""
+
+    def __init__(self):
+        self.timings = {}
+        self._nested = []  # vrijeme ugnijezdenih stage-ova, po nivou
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.labels(name).inc()
+            raise
+        finally:
+            total = time.perf_counter() - start
+            elapsed = total - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += total
+            STAGE_SECONDS.labels(name).observe(elapsed)
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def server_timing(self):
+        """Timings formatted as a Server-Timing header value (milliseconds)."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
+
+
+@contextmanager
+def track_request(endpoint):
+    """In-flight gauge and latency histogram for a request; errors that the
+    endpoint turns into a response are counted with REQUEST_ERRORS."""
+    IN_FLIGHT.labels(endpoint).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REQUEST_ERRORS.labels(endpoint).inc()
+        raise
+    finally:
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        IN_FLIGHT.labels(endpoint).dec()
@@ -1,28 +1,94 @@
 import cv2
 import numpy as np
 
-def detect_moles(image):
-    # Pretvaranje u HSV da bi se bolje razdvojile tamnije regije
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    
-    # Maskiram tamno smedje do crne nijanse (u granicama mladeza)
-    lower_brown = np.array([0, 20, 30])
-    upper_brown = np.array([50, 255, 100])
-    mask = cv2.inRange(hsv, lower_brown, upper_brown)
-
-    #Uklanjanje suma
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+# Pragovi su podeseni za povrsinu lica od REFERENCE_AREA piksela i skaliraju
+# se prema stvarnoj povrsini regije koja se analizira
+REFERENCE_AREA = 512 * 512
+MIN_MOLE_AREA = 10
+MAX_MOLE_AREA = 300
+
+# Tamno smedje do crne nijanse (u granicama mladeza)
+LOWER_BROWN = np.array([0, 20, 30])
+UPPER_BROWN = np.array([50, 255, 100])
+
+# 68-point indeksi regija koje su tamne, a nisu mladezi
+JAW = list(range(0, 17))
+BROWS = [list(range(17, 22)), list(range(22, 27))]
+EYES = [list(range(36, 42)), list(range(42, 48))]
+MOUTH = list(range(48, 60))
+NOSTRILS = list(range(31, 36))
+
+
+def face_skin_mask(shape, landmarks):
+    """Mask of facial skin from 68 landmarks: the face outline extended up
+    over the forehead, without eyes, brows, nostrils and mouth."""
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    pts = np.asarray(landmarks, dtype=np.float32)
+
+    # Celo: konturu obrva podizemo za polovinu visine lica
+    brows = pts[17:27]
+    face_height = pts[8, 1] - brows[:, 1].min()
+    forehead = brows - np.array([0, face_height * 0.5], dtype=np.float32)
+    outline = np.concatenate([pts[JAW], forehead[::-1]])
+    cv2.fillConvexPoly(mask, cv2.convexHull(outline).astype(np.int32), 255)
+
+    margin = max(1, int(face_height * 0.03))
+    holes = np.zeros_like(mask)
+    for idx in EYES + BROWS + [MOUTH, NOSTRILS]:
+        cv2.fillConvexPoly(holes, cv2.convexHull(pts[idx]).astype(np.int32), 255)
+    holes = cv2.dilate(holes, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1,) * 2))
+    mask[holes > 0] = 0
+    return mask
+
+
+def detect_moles(image, hsv=None, landmarks=None):
+    """Find mole-like dark spots.
+
+    When 68-point landmarks are given only the facial skin is searched and
+    the area limits are scaled by the size of that region, otherwise the
+    whole image is used. Returns {"count", "centroids", "areas"} where
+    centroids are (x, y) pixel positions and areas are in pixels."""
+    if hsv is None:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+    mask = cv2.inRange(hsv, LOWER_BROWN, UPPER_BROWN)
+
+    if landmarks is not None:
+        region = face_skin_mask(mask.shape, landmarks)
+        mask &= region
+        region_area = max(int(np.count_nonzero(region)), 1)
+    else:
+        region_area = mask.shape[0] * mask.shape[1]
+    scale = region_area / REFERENCE_AREA
+
+    # Uklanjanje suma, kernel raste sa rezolucijom
+    k = max(3, int(round(3 * np.sqrt(scale))) | 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
     cleaned_mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
 
-    # Detekcija kontura
-    contours, _ = cv2.findContours(cleaned_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Sve komponente odjednom, bez petlje po konturama
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(cleaned_mask, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = (areas > MIN_MOLE_AREA * scale) & (areas < MAX_MOLE_AREA * scale)
+
+    return {
+        "count": int(np.count_nonzero(keep)),
+        "centroids": centroids[1:][keep],
+        "areas": areas[keep],
+    }
+
 
-    # Filtriranje na osnovu veličine - ne racunam sad ovdje
-    # previse male tačke
-    mole_count = 0
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if 10 < area < 300:  # Podesavam prema rezoluciji slike
-            mole_count += 1
+def detect_moles_in_context(context):
+    """detect_moles on an AnalysisContext, using a face crop at the resolution
+    it needs. Centroids and areas are returned in original image pixels."""
+    region = context.face_region()
+    if region is None:
+        moles = detect_moles(context.image, context.hsv)
+        offset, factor = np.zeros(2), context.scale
+    else:
+        crop, landmarks, offset, factor = region
+        moles = detect_moles(crop, landmarks=landmarks)
 
-    return mole_count
+    moles["centroids"] = (moles["centroids"] + offset) * factor
+    moles["areas"] = moles["areas"] * factor * factor
+    return moles
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class UploadStore:
+    """Optional, asynchronous persistence of uploaded images.
+
+    save() only queues the bytes; a background thread writes them and then
+    applies the retention policy, evicting the oldest files first until the
+    folder is within max_files / max_bytes and nothing is older than
+    max_age seconds. A limit of 0 disables it. When the queue is full the
+    upload is not persisted, so disk I/O never blocks a request."""
+
+    def __init__(self, folder, enabled=True, queue_size=64, max_files=0, max_bytes=0, max_age=0):
+        self.folder = folder
+        self.enabled = enabled
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = OrderedDict()  # ime -> (velicina, vrijeme), najstariji prvi
+        self._total_bytes = 0
+        self._thread = None
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        self._scan()
+        self._thread = threading.Thread(target=self._run, name="upload-store", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=10):
+        """Write what is still queued and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def save(self, filename, data):
+        """Queue an upload for writing. Returns False if it was not queued."""
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait((filename, data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"[WARNING] Upload queue full, {filename} not saved")
+            return False
+
+    def _scan(self):
+        # Postojeci fajlovi, sortirani po vremenu izmjene
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, name, size in sorted(entries):
+            self._files[name] = (size, mtime)
+            self._total_bytes += size
+        self._evict()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            filename, data = item
+            try:
+                self._write(filename, data)
+                self._evict()
+            except OSError as e:
+                print(f"[WARNING] Saving upload {filename} failed: {e}")
+
+    def _write(self, filename, data):
+        path = os.path.join(self.folder, filename)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        if filename in self._files:
+            self._total_bytes -= self._files.pop(filename)[0]
+        self._files[filename] = (len(data), time.time())
+        self._total_bytes += len(data)
+
+    def _evict(self):
+        oldest_allowed = time.time() - self.max_age if self.max_age else None
+        while self._files:
+            name, (size, mtime) = next(iter(self._files.items()))
+            over = (
+                (self.max_files and len(self._files) > self.max_files)
+                or (self.max_bytes and self._total_bytes > self.max_bytes)
+                or (oldest_allowed is not None and mtime < oldest_allowed)
+            )
+            if not over:
+                return
+            self._files.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,303 @@
+import base64
+import binascii
+import json
+import os
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from utils.image_header import sniff_image
+
+# Ogranicenja za jedan upload
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", 25)) * 1024 * 1024
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_MEGAPIXELS", 100)) * 1000 * 1000
+# Najvise slika u jednom /analyze-faces zahtjevu
+MAX_BATCH_IMAGES = int(os.environ.get("MAX_BATCH_IMAGES", 32))
+# Koliko bajtova citamo prije nego odustanemo od trazenja dimenzija u headeru
+SNIFF_LIMIT = 256 * 1024
+# Multipart granice i headeri dijelova
+MULTIPART_OVERHEAD = 64 * 1024
+# NDJSON linija: ime i JSON oko base64 slike
+NDJSON_OVERHEAD = 4 * 1024
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _ImageSink:
+    """Collects one image part, checking size and header as bytes arrive."""
+
+    def __init__(self, max_bytes, max_pixels):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.buffer = bytearray()
+        self.checked = False
+        self.format = None
+
+    def write(self, data):
+        if len(self.buffer) + len(data) > self.max_bytes:
+            raise UploadRejected(f"Image exceeds {self.max_bytes} bytes", 413)
+        self.buffer += data
+        if not self.checked:
+            self._sniff()
+
+    def _sniff(self):
+        header = sniff_image(self.buffer)
+        if header is None:
+            if len(self.buffer) >= 16:
+                raise UploadRejected("Unsupported image format", 415)
+            return
+        self.format, width, height = header
+        if width is None:
+            # Dimenzije jos nisu stigle (npr. veliki EXIF prije SOF markera)
+            self.checked = len(self.buffer) >= SNIFF_LIMIT
+            return
+        if width <= 0 or height <= 0 or width * height > self.max_pixels:
+            raise UploadRejected(f"Image dimensions {width}x{height} not allowed", 413)
+        self.checked = True
+
+    def finish(self):
+        if not self.buffer:
+            raise UploadRejected("Empty image", 400)
+        if self.format is None:
+            raise UploadRejected("Unsupported image format", 415)
+        return self.buffer
+
+
+class _MultipartImages:
+    """Incremental multipart parser that collects file parts as images.
+
+    Bytes are fed with feed() as they are received; it returns the file
+    parts completed so far as (field, filename, buffer or UploadRejected).
+    Only the named fields are collected (all file fields when None). With
+    strict, a rejected image raises at once instead of being returned."""
+
+    def __init__(self, boundary, max_bytes, max_pixels, fields=None, strict=False):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.fields = fields
+        self.strict = strict
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._part = None  # (field, filename, sink ili greska) trenutnog dijela
+        self._done = []
+        self._parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def feed(self, chunk):
+        self._parser.write(chunk)
+        done, self._done = self._done, []
+        return done
+
+    def finish(self):
+        self._parser.finalize()
+        done, self._done = self._done, []
+        return done
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in options and (self.fields is None or name in self.fields):
+            filename = options[b"filename"].decode("utf-8", "replace")
+            self._part = [name, filename, _ImageSink(self.max_bytes, self.max_pixels)]
+        else:
+            self._part = None
+
+    def _on_part_data(self, data, start, end):
+        if self._part is None or isinstance(self._part[2], UploadRejected):
+            return
+        try:
+            self._part[2].write(data[start:end])
+        except UploadRejected as e:
+            if self.strict:
+                raise
+            # Ostatak dijela se preskace, bez cuvanja u memoriji
+            self._part[2] = e
+
+    def _on_part_end(self):
+        if self._part is None:
+            return
+        name, filename, sink = self._part
+        self._part = None
+        if not isinstance(sink, UploadRejected):
+            try:
+                sink = sink.finish()
+            except UploadRejected as e:
+                if self.strict:
+                    raise
+                sink = e
+        self._done.append((name, filename, sink))
+
+
+def _multipart_boundary(request):
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected("Expected multipart/form-data", 415)
+    return params[b"boundary"]
+
+
+def _check_content_length(request, limit):
+    content_length = request.headers.get("content-length")
+    if content_length and int(content_length) > limit:
+        raise UploadRejected(f"Request exceeds {limit} bytes", 413)
+
+
+async def _limited_stream(request, limit):
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise UploadRejected(f"Request exceeds {limit} bytes", 413)
+        yield chunk
+
+
+async def read_image_upload(request, field="image", max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS):
+    """Stream a multipart request and return the bytes of the `field` file.
+
+    The body is parsed chunk by chunk as it is received: an oversized,
+    non-image or too large (in pixels) upload raises UploadRejected as soon
+    as it is detected, without reading the rest. Returns (filename, buffer);
+    the buffer is a bytearray that can be decoded in place."""
+    parts = _MultipartImages(
+        _multipart_boundary(request), max_bytes, max_pixels, fields={field}, strict=True
+    )
+    limit = max_bytes + MULTIPART_OVERHEAD
+    _check_content_length(request, limit)
+
+    found = None
+    async for chunk in _limited_stream(request, limit):
+        done = parts.feed(chunk)
+        if found is None and done:
+            found = done[0]
+    done = parts.finish()
+    if found is None and done:
+        found = done[0]
+
+    if found is None:
+        raise UploadRejected(f"Missing file field '{field}'", 400)
+    return found[1], found[2]
+
+
+async def iter_multipart_images(
+    request, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS, max_images=MAX_BATCH_IMAGES
+):
+    """Yield (filename, buffer) for each file part of a multipart request as
+    soon as the part has been received.
+
+    Every image gets the checks of read_image_upload; a rejected image is
+    yielded as (filename, UploadRejected) and its remaining bytes are skipped.
+    More than max_images files raises UploadRejected."""
+    parts = _MultipartImages(_multipart_boundary(request), max_bytes, max_pixels)
+    limit = max_images * (max_bytes + MULTIPART_OVERHEAD)
+    _check_content_length(request, limit)
+
+    count = 0
+    async for chunk in _limited_stream(request, limit):
+        for _, filename, data in parts.feed(chunk):
+            count += 1
+            if count > max_images:
+                raise UploadRejected(f"Batch exceeds {max_images} images", 413)
+            yield filename, data
+    for _, filename, data in parts.finish():
+        count += 1
+        if count > max_images:
+            raise UploadRejected(f"Batch exceeds {max_images} images", 413)
+        yield filename, data
+
+
+def check_image(data, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS):
+    """Apply the upload size, format and dimension checks to complete bytes."""
+    sink = _ImageSink(max_bytes, max_pixels)
+    sink.write(data)
+    return sink.finish()
+
+
+def _parse_ndjson_line(line, max_bytes, max_pixels):
+    name = None
+    try:
+        item = json.loads(line)
+        name = item.get("name")
+        data = base64.b64decode(item["image"], validate=True)
+    except (ValueError, KeyError, TypeError, AttributeError, binascii.Error) as e:
+        return name, UploadRejected(f"Invalid item: {e}", 400)
+    try:
+        return name, check_image(data, max_bytes, max_pixels)
+    except UploadRejected as e:
+        return name, e
+
+
+async def iter_ndjson_images(
+    request, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS, max_images=MAX_BATCH_IMAGES
+):
+    """Yield (name, buffer) for each line of an NDJSON request, one
+    {"name": "...", "image": "<base64>"} object per line, as soon as the line
+    has been received.
+
+    A line longer than a max_bytes image needs is rejected and skipped
+    without being buffered. Rejected or invalid lines are yielded as
+    (name, UploadRejected). More than max_images lines raises UploadRejected."""
+    max_line = 4 * -(-max_bytes // 3) + NDJSON_OVERHEAD
+    buffer = bytearray()
+    skipping = False
+    count = 0
+
+    def parsed(line):
+        nonlocal count
+        count += 1
+        if count > max_images:
+            raise UploadRejected(f"Batch exceeds {max_images} images", 413)
+        if line is None:
+            return None, UploadRejected(f"Line exceeds {max_line} bytes", 413)
+        return _parse_ndjson_line(line, max_bytes, max_pixels)
+
+    async for chunk in request.stream():
+        start = 0
+        while start < len(chunk):
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end < 0 else chunk[start:end]
+            start = len(chunk) if end < 0 else end + 1
+            if not skipping:
+                if len(buffer) + len(piece) > max_line:
+                    # Predugacka linija, preskace se do sljedeceg \n
+                    skipping = True
+                    buffer.clear()
+                else:
+                    buffer += piece
+            if end < 0:
+                continue
+            if skipping:
+                skipping = False
+                yield parsed(None)
+            elif buffer.strip():
+                yield parsed(bytes(buffer))
+            buffer.clear()
+    if skipping:
+        yield parsed(None)
+    elif buffer.strip():
+        yield parsed(bytes(buffer))
@@ -119,8 +119,8 @@ class VideoExportDialog(QDialog):
         self.thread.start()
 
     def update_export_progress(self, status):
-        if status == "*":
-            self._update_status.setText("Export complete")
+        if status.startswith("*"):
+            self._update_status.setText(status[1:] or "Export complete")
             self._cancel_button.setText("Ok")
         else:
             self._update_status.setText(status)
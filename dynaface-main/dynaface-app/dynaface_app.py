@@ -19,6 +19,7 @@ import jth_ui.utl_settings as utl_settings
 import torch
 import version
 from dynaface.facial import DEFAULT_TILT_THRESHOLD, STD_PUPIL_DIST
+from dynaface.smoothing import SMOOTH_AVERAGE, SMOOTHING_METHODS
 from dynaface_window import DynafaceWindow
 from jth_ui.app_jth import AppJTH, get_library_version
 from pillow_heif import register_heif_opener
@@ -34,9 +35,13 @@ SETTING_ACC = "accelerator"
 SETTING_TILT_THRESHOLD = "tilt"
 SETTING_DYNAMIC_ADJUST = "dynamic"
 SETTING_SMOOTH = "smooth"
+SETTING_SMOOTH_METHOD = "smooth_method"
+SETTING_SAMPLE_STRIDE = "sample_stride"
 
 DEFAULT_DYNAMIC_ADJUST = 2
 DEFAULT_SMOOTH = 2
+DEFAULT_SMOOTH_METHOD = SMOOTH_AVERAGE
+DEFAULT_SAMPLE_STRIDE = 1
 
 register_heif_opener()
 
@@ -55,6 +60,8 @@ class AppDynaface(AppJTH):
             )
             self.dynamic_adjust = DEFAULT_DYNAMIC_ADJUST
             self.data_smoothing = DEFAULT_SMOOTH
+            self.smoothing_method = DEFAULT_SMOOTH_METHOD
+            self.sample_stride = DEFAULT_SAMPLE_STRIDE
             self.tilt_threshold = DEFAULT_TILT_THRESHOLD
 
             self.BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -100,6 +107,19 @@ class AppDynaface(AppJTH):
         self.data_smoothing = utl_settings.get_int(
             self.settings, key=SETTING_SMOOTH, default=DEFAULT_SMOOTH
         )
+        self.smoothing_method = utl_settings.get_str(
+            self.settings, key=SETTING_SMOOTH_METHOD, default=DEFAULT_SMOOTH_METHOD
+        )
+        if self.smoothing_method not in SMOOTHING_METHODS:
+            self.smoothing_method = DEFAULT_SMOOTH_METHOD
+
+        # Landmark detection on every Nth frame, refined around gestures
+        self.sample_stride = max(
+            1,
+            utl_settings.get_int(
+                self.settings, key=SETTING_SAMPLE_STRIDE, default=DEFAULT_SAMPLE_STRIDE
+            ),
+        )
 
         # accelerator device
         acc = utl_settings.get_bool(self.settings, key=SETTING_ACC, default=True)
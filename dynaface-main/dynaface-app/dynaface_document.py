@@ -1,26 +1,259 @@
+import copy
 import gzip
+import io
+import json
+import os
 import pickle
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
 
+import cv2
+import numpy as np
 from jth_ui import utl_classes
 import dynaface
 
 DOC_HEADER = "header"
 DOC_HEADER_VERSION = "version"
 DOC_HEADER_FPS = "fps"
+DOC_HEADER_FRAME_COUNT = "frame_count"
 DOC_BODY = "body"
 DOC_BODY_FACE = "face"
 DOC_BODY_MEASURES = "measures"
 DOC_BODY_MEASURE = "measure"
 DOC_BODY_MEASURE_ITEMS = "items"
 DOC_BODY_FRAMES = "frames"
+DOC_BODY_LANDMARKS = "landmarks"
 
 DOC_NAME = "name"
 DOC_ENABLED = "enabled"
 
+# Version 2 container layout (all integers little endian):
+#   magic (8 bytes) | version (uint32) | index offset (uint64) | index length (uint64)
+#   landmark table block | frame image chunks... | index (JSON)
+# The index holds the header, the measures block, the location of the landmark
+# table and one (offset, length, height, width, channels) entry per frame.
+DOC_MAGIC = b"DYFC\r\n\x1a\n"
+DOC_PREFIX = struct.Struct("<8sIQQ")
+DOC_VERSION = 2
+CHUNK_PNG_COMPRESSION = 3
+CHUNK_CACHE_SIZE = 16
+STORE_PNG_COMPRESSION = 1  # Frames spilled while loading, favor speed
+
+
+def _encode_chunk(img, compression):
+    """PNG encode a frame image, returning the chunk and its (h, w, c) shape."""
+    ok, encoded = cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, compression])
+    if not ok:
+        raise ValueError("Unable to encode frame")
+    shape = img.shape if img.ndim == 3 else img.shape + (1,)
+    return encoded.tobytes(), shape
+
+
+class _ChunkReader:
+    """Thread-safe random access to the byte blocks of a version 2 document."""
+
+    def __init__(self, filename: str, file=None):
+        """Open filename, or use an already open file (filename may be None)."""
+        self.filename = None if filename is None else os.path.abspath(filename)
+        self._file = open(filename, "rb") if file is None else file
+        self._held = []  # Chunks no longer in the file, addressed as -(i + 1)
+        self._lock = threading.Lock()
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            if offset < 0:
+                return self._held[-offset - 1]
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def append(self, data: bytes) -> int:
+        """Write a chunk at the end of a writable file, returning its offset."""
+        with self._lock:
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            return offset
+
+    def replace(self, temp_name: str, filename: str, entries, moved):
+        """Replace the file with the rewritten document temp_name and reopen it.
+
+        entries are the frame entries read through this reader, they are updated
+        in place so every sequence sharing them follows the move. moved maps an
+        entry index to its entry in the new file; chunks that were not saved
+        are held in memory, as they no longer exist on disk.
+        """
+        with self._lock:
+            for idx, entry in enumerate(entries):
+                if idx not in moved and entry[0] >= 0:
+                    self._file.seek(entry[0])
+                    self._held.append(self._file.read(entry[1]))
+                    entry[0] = -len(self._held)
+            self._file.close()
+            os.replace(temp_name, filename)
+            self._file = open(filename, "rb")
+            self.filename = os.path.abspath(filename)
+            for idx, entry in moved.items():
+                entries[idx][:] = entry
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class DocumentFrames:
+    """Read-only, lazily decoded sequence of frame states from a document.
+
+    The landmark table is held in memory; each frame image is decoded from its
+    own chunk on first access and kept in a small LRU cache.
+    """
+
+    def __init__(self, reader, entries, table, indexes=None):
+        self._reader = reader
+        self._entries = entries
+        self._table = table
+        self._indexes = list(range(len(entries))) if indexes is None else indexes
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return DocumentFrames(
+                self._reader, self._entries, self._table, self._indexes[i]
+            )
+        return self._state(self._indexes[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def filename(self):
+        return self._reader.filename
+
+    def raw_chunk(self, i):
+        """Return the compressed image chunk and its shape, without decoding."""
+        return self._chunk(self._indexes[i])
+
+    def landmark_table(self):
+        """Return the rows of the landmark table covered by this sequence."""
+        return {key: value[self._indexes] for key, value in self._table.items()}
+
+    def _chunk(self, idx):
+        offset, length, height, width, channels = self._entries[idx]
+        return self._reader.read(offset, length), (height, width, channels)
+
+    def _image(self, idx):
+        with self._cache_lock:
+            if idx in self._cache:
+                self._cache.move_to_end(idx)
+                return self._cache[idx]
+
+        data, shape = self._chunk(idx)
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        img = img.reshape(shape)
+
+        with self._cache_lock:
+            self._cache[idx] = img
+            if len(self._cache) > CHUNK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return img
+
+    def _state(self, idx):
+        t = self._table
+        count = int(t["landmark_count"][idx])
+        landmarks = t["landmarks"][idx, :count].copy()
+        rotation = float(t["face_rotation"][idx])
+        return [
+            self._image(idx),
+            t["headpose"][idx].tolist(),
+            landmarks,
+            float(t["pupillary_distance"][idx]),
+            float(t["pix2mm"][idx]),
+            None if np.isnan(rotation) else rotation,
+        ]
+
+    def replace_file(self, temp_name, filename, entries):
+        """Move this sequence onto its rewritten document, see _ChunkReader.replace.
+
+        entries are the entries of this sequence's frames in the new file."""
+        moved = dict(zip(self._indexes, entries))
+        self._reader.replace(temp_name, filename, self._entries, moved)
+
+    def close(self):
+        self._reader.close()
+
+
+class FrameStore(DocumentFrames):
+    """Appendable sequence of frame states, for a video being loaded.
+
+    Each frame image is PNG encoded into an anonymous temporary file as it is
+    appended, so memory does not grow with the length of the video; only the
+    landmarks and the other small values stay in memory. Slices share the
+    store, and saving one copies the chunks without encoding them again.
+    """
+
+    def __init__(self, reader=None, entries=None, states=None, indexes=None):
+        if reader is None:
+            reader = _ChunkReader(None, tempfile.TemporaryFile())
+        entries = [] if entries is None else entries
+        super().__init__(reader, entries, None, indexes)
+        self._states = [] if states is None else states
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return FrameStore(
+                self._reader, self._entries, self._states, self._indexes[i]
+            )
+        return self._state(self._indexes[i])
+
+    def append(self, state):
+        data, shape = _encode_chunk(state[0], STORE_PNG_COMPRESSION)
+        offset = self._reader.append(data)
+        self._states.append([None] + list(state[1:]))
+        self._entries.append([offset, len(data)] + [int(x) for x in shape])
+        # Last, so readers on other threads only see complete frames
+        self._indexes.append(len(self._entries) - 1)
+
+    def landmark_table(self):
+        return _build_landmark_table([self._states[i] for i in self._indexes])
+
+    def _state(self, idx):
+        return [self._image(idx)] + [copy.copy(v) for v in self._states[idx][1:]]
+
+
+def _build_landmark_table(frames):
+    count = len(frames)
+    width = max((len(frame[2]) for frame in frames), default=0)
+    table = {
+        "landmarks": np.zeros((count, width, 2), dtype=np.float32),
+        "landmark_count": np.zeros(count, dtype=np.int32),
+        "headpose": np.zeros((count, 3), dtype=np.float64),
+        "pupillary_distance": np.zeros(count, dtype=np.float64),
+        "pix2mm": np.zeros(count, dtype=np.float64),
+        "face_rotation": np.full(count, np.nan, dtype=np.float64),
+    }
+    for i, frame in enumerate(frames):
+        landmarks = frame[2]
+        if len(landmarks) > 0:
+            table["landmarks"][i, : len(landmarks)] = np.asarray(landmarks)
+        table["landmark_count"][i] = len(landmarks)
+        table["headpose"][i] = np.asarray(frame[1], dtype=np.float64)[:3]
+        table["pupillary_distance"][i] = frame[3]
+        table["pix2mm"][i] = frame[4]
+        rotation = frame[5] if len(frame) > 5 else None
+        if rotation is not None:
+            table["face_rotation"][i] = rotation
+    return table
+
 
 class DynafaceDocument:
     def __init__(self):
-        self._version = 1
+        self._version = DOC_VERSION
         self.face = None
         self.frames = []
         self.measures = []
@@ -28,19 +261,106 @@ class DynafaceDocument:
 
     def save(self, filename: str):
         measures = self._save_measures(self.measures)
+        frames = self.frames
+
+        # Chunks of a document we loaded are copied as-is, not re-encoded.
+        reuse = isinstance(frames, DocumentFrames)
+        overwrite = reuse and frames.filename == os.path.abspath(filename)
+
+        if reuse:
+            table = frames.landmark_table()
+        else:
+            table = _build_landmark_table(frames)
+        table_buf = io.BytesIO()
+        np.savez(table_buf, **table)
+        table_bytes = table_buf.getvalue()
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, temp_name = tempfile.mkstemp(suffix=".dyfc", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(DOC_PREFIX.pack(DOC_MAGIC, self._version, 0, 0))
+                table_offset = f.tell()
+                f.write(table_bytes)
 
-        doc = {
-            DOC_HEADER: {
-                DOC_HEADER_VERSION: self._version,
-                DOC_HEADER_FPS: self.fps,
-            },
-            DOC_BODY: {DOC_BODY_MEASURES: measures, DOC_BODY_FRAMES: self.frames},
-        }
+                entries = []
+                for i in range(len(frames)):
+                    if reuse:
+                        data, shape = frames.raw_chunk(i)
+                    else:
+                        data, shape = _encode_chunk(
+                            frames[i][0], CHUNK_PNG_COMPRESSION
+                        )
+                    entries.append([f.tell(), len(data)] + [int(x) for x in shape])
+                    f.write(data)
 
-        with gzip.open(filename, "wb") as f:
-            pickle.dump(doc, f)
+                index = {
+                    DOC_HEADER: {
+                        DOC_HEADER_VERSION: self._version,
+                        DOC_HEADER_FPS: self.fps,
+                        DOC_HEADER_FRAME_COUNT: len(entries),
+                    },
+                    DOC_BODY_MEASURES: measures,
+                    DOC_BODY_LANDMARKS: [table_offset, len(table_bytes)],
+                    DOC_BODY_FRAMES: entries,
+                }
+                index_bytes = json.dumps(index).encode("utf-8")
+                index_offset = f.tell()
+                f.write(index_bytes)
+                f.seek(0)
+                f.write(
+                    DOC_PREFIX.pack(
+                        DOC_MAGIC, self._version, index_offset, len(index_bytes)
+                    )
+                )
+            if overwrite:
+                # Keep reading frames lazily, now from the new file
+                frames.replace_file(temp_name, filename, entries)
+            else:
+                os.replace(temp_name, filename)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
 
     def load(self, filename: str):
+        with open(filename, "rb") as f:
+            prefix = f.read(DOC_PREFIX.size)
+
+        if prefix[:2] == b"\x1f\x8b":
+            self._load_legacy(filename)
+            return
+
+        if len(prefix) < DOC_PREFIX.size or prefix[:8] != DOC_MAGIC:
+            raise TypeError(
+                f"The file '{filename}' does not appear to be a valid Dynaface document."
+            )
+
+        _, version, index_offset, index_length = DOC_PREFIX.unpack(prefix)
+        if version > DOC_VERSION:
+            raise TypeError(
+                f"The file '{filename}' was written by a newer version of Dynaface."
+            )
+
+        reader = _ChunkReader(filename)
+        try:
+            index = json.loads(reader.read(index_offset, index_length))
+            table_offset, table_length = index[DOC_BODY_LANDMARKS]
+            with np.load(io.BytesIO(reader.read(table_offset, table_length))) as npz:
+                table = {key: npz[key] for key in npz.files}
+        except Exception:
+            reader.close()
+            raise
+
+        measures = self._load_measures(index[DOC_BODY_MEASURES])
+        self._add_missing_measures(measures, dynaface.measures.all_measures())
+
+        self.fps = index[DOC_HEADER][DOC_HEADER_FPS]
+        self.frames = DocumentFrames(reader, index[DOC_BODY_FRAMES], table)
+        self.measures = measures
+
+    def _load_legacy(self, filename: str):
+        """Load a version 1 document, a gzip compressed pickle."""
         try:
             with gzip.open(filename, "rb") as f:
                 doc = pickle.load(f)
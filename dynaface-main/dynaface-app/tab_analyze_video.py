@@ -1,6 +1,7 @@
 import csv
 import io
 import logging
+import time
 
 import cmds
 import custom_control
@@ -12,7 +13,10 @@ import utl_gfx
 import utl_print
 import worker_threads
 from dynaface.facial import AnalyzeFace
-from dynaface.measures import AnalyzeDentalArea, AnalyzeEyeArea, all_measures
+from dynaface.layers import LayeredRenderer
+from dynaface.measures import all_measures
+from dynaface.prefetch import FramePrefetcher
+from dynaface.timeseries import MeasureTable, Reduction
 from jth_ui import app_jth, utl_etc
 from jth_ui.tab_graphic import TabGraphic
 from matplotlib.figure import Figure
@@ -45,7 +49,7 @@ from PyQt6.QtWidgets import (
 
 logger = logging.getLogger(__name__)
 
-MAX_FRAMES = 5000
+MAX_FRAMES = 100000  # Frame images are kept on disk, see FrameStore
 GRAPH_MAX = 100
 
 
@@ -62,6 +66,10 @@ class AnalyzeVideoTab(TabGraphic):
         self._frame_end = 0
         self.frame_rate = 30
         self._frame_step = 1  # The scale of the video graph
+        self._measure_table = MeasureTable()  # Cached measure values per frame
+        self._renderer = None  # Cached drawing layers of the current frame
+        self._prefetcher = None  # Renders frames ahead during playback
+        self._play_start = None  # (time, frame) playback started at
 
         if path.lower().endswith((".jpg", ".jpeg", ".png", ".tiff", ".heic")):
             self.load_image(path)
@@ -114,6 +122,8 @@ class AnalyzeVideoTab(TabGraphic):
         # If there are frames already defined (1), we loaded a single image.
         self._last_etc = ""
         if self.filename is None and len(self._frames) == 0:
+            # Frame images are spilled to disk as they are loaded
+            self._frames = dynaface_document.FrameStore()
             self.thread = worker_threads.WorkerLoad(self)
             self.thread._update_signal.connect(self.update_load_progress)
             self.thread.start()
@@ -149,9 +159,8 @@ class AnalyzeVideoTab(TabGraphic):
 
         if self.frame_count > MAX_FRAMES:
             self._window.display_message_box(
-                f"""This program can open at most {MAX_FRAMES} video frames, you have {self.frame_count} frames.
-and is designed mainly to analyze short video clips. Please cut this video down to just the
-gesture you wish to analyze."""
+                f"""This program can open at most {MAX_FRAMES:,} video frames, you have {self.frame_count:,} frames.
+Please cut this video down to the part you wish to analyze."""
             )
             self.video_stream.release()
             self.video_stream = None
@@ -400,6 +409,7 @@ gesture you wish to analyze."""
 
         if self._auto_update:
             self.update_items()
+            self.invalidate_measures()
             self.update_face()
             if self._chk_graph.isChecked():
                 logger.debug("Update chart, because measures changed")
@@ -441,16 +451,34 @@ gesture you wish to analyze."""
     def action_measures(self, state):
         self.update_face()
 
+    def invalidate_frame(self):
+        if self._renderer is not None:
+            self._renderer.invalidate()
+
+    def invalidate_measures(self):
+        if self._renderer is not None:
+            self._renderer.invalidate_measures()
+        if self._prefetcher is not None:
+            self._prefetcher.invalidate()
+
     def update_face(self):
-        self._face.render_reset()
-        if self._chk_measures.isChecked():
-            self._face.analyze()
-        if self._chk_landmarks.isChecked():
-            self._face.draw_landmarks(numbers=True)
-        self._face.draw_static()
+        # Layers are recorded once per frame; toggles and text zoom only replay
+        if self._renderer is None or self._renderer.face is not self._face:
+            self._renderer = LayeredRenderer(self._face)
+        self._renderer.show_measures = self._chk_measures.isChecked()
+        self._renderer.show_landmarks = self._chk_landmarks.isChecked()
+        self._renderer.render()
+        if self._prefetcher is not None:
+            self._prefetcher.configure(
+                self._renderer.show_measures,
+                self._renderer.show_landmarks,
+                self._face.text_size,
+            )
 
         if self._face.render_img is not None and self._render_buffer is not None:
-            self._render_buffer[:, :] = self._face.render_img
+            # The graphic usually shares render_img, no copy needed then
+            if self._render_buffer is not self._face.render_img:
+                self._render_buffer[:, :] = self._face.render_img
             self.update_graphic(resize=False)
 
     def event(self, event):
@@ -468,6 +496,11 @@ gesture you wish to analyze."""
             self.loading = False
             self.thread.running = False
 
+        self.stop_prefetch()
+
+        if isinstance(self._frames, dynaface_document.DocumentFrames):
+            self._frames.close()
+
     def on_resize(self):
         pass
 
@@ -484,6 +517,7 @@ gesture you wish to analyze."""
             item.setCheckState(0, Qt.CheckState.Checked)
         self._auto_update = True
         self.update_items()
+        self.invalidate_measures()
         self.update_face()
 
         if self._chart_view is not None:
@@ -498,6 +532,7 @@ gesture you wish to analyze."""
             item.setCheckState(0, Qt.CheckState.Unchecked)
         self._auto_update = True
         self.update_items()
+        self.invalidate_measures()
         self.update_face()
 
         if self._chart_view is not None:
@@ -529,6 +564,7 @@ gesture you wish to analyze."""
         if len(self._frames) > 0:
             logger.debug("Display first video frame on load")
             self._face.load_state(self._frames[0])
+            self.invalidate_frame()
             self.create_graphic(buffer=self._face.render_img, msg_overlay=True)
             self._view.grabGesture(Qt.GestureType.PinchGesture)
             self._view.installEventFilter(self)
@@ -600,7 +636,14 @@ gesture you wish to analyze."""
             num = self._video_slider.sliderPosition()
         frame = self._frames[num]
         self._face.load_state(frame)
-        self.update_face()
+        self.invalidate_frame()
+        img = None if self._prefetcher is None else self._prefetcher.get(num)
+        if img is not None and self._render_buffer is not None:
+            # Rendered ahead by the prefetcher, just display it
+            self._render_buffer[:, :] = img
+            self.update_graphic(resize=False)
+        else:
+            self.update_face()
 
     def action_play_pause(self):
         if not self._running:
@@ -612,15 +655,56 @@ gesture you wish to analyze."""
                 self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPause)
             )
             self.start_game()
-            self.init_animate(30)
+            self.start_prefetch()
+            self.init_animate(self.frame_rate)
         else:
             self._btn_play.setIcon(
                 self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
             )
             self.stop_animate()
 
+    def stop_animate(self):
+        super().stop_animate()
+        self.stop_prefetch()
+
+    def start_prefetch(self):
+        self.stop_prefetch()
+        self._prefetcher = FramePrefetcher(
+            self._frames,
+            self._face.measures,
+            self.frame_rate,
+            tilt_threshold=self._face.tilt_threshold,
+        )
+        self._prefetcher.configure(
+            self._chk_measures.isChecked(),
+            self._chk_landmarks.isChecked(),
+            self._face.text_size,
+        )
+        self._play_start = (time.perf_counter(), self._video_slider.sliderPosition())
+
+    def stop_prefetch(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        self._play_start = None
+
     def running_step(self):
-        self.forward_action()
+        i = self._video_slider.sliderPosition()
+        mx = self._video_slider.maximum()
+        if self._prefetcher is None or i >= mx:
+            self.forward_action()
+            return
+
+        # Hold the source frame rate: show the frame due now, or the latest
+        # one rendered before it, skipping frames that were not ready in time
+        start_time, start_frame = self._play_start
+        due = start_frame + int((time.perf_counter() - start_time) * self.frame_rate)
+        due = min(max(due, i + 1), mx)
+        self._prefetcher.prefetch(due)
+        for j in range(due, i, -1):
+            if self._prefetcher.get(j) is not None:
+                self._video_slider.setSliderPosition(j)
+                return
 
     def action_video_seek(self, _):
         try:
@@ -760,25 +844,13 @@ gesture you wish to analyze."""
             self._window.display_message_box("Unable to save file.")
 
     def collect_data(self, step_size=1):
-        app = QApplication.instance()
+        stats = self._face.get_all_items()
+        self._measure_table.sync(self._frames)
+        columns = self._measure_table.columns(
+            stats, self._frame_begin, self._frame_end
+        )
+        data = {stat: columns[stat][::step_size].tolist() for stat in columns}
 
-        tilt_threshold = app.tilt_threshold
-        face = AnalyzeFace(self._face.measures, tilt_threshold=tilt_threshold)
-        stats = face.get_all_items()
-        data = {stat: [] for stat in stats}
-
-        cols = list(data.keys())
-        cols = ["frame", "time"] + cols
-
-        frames = range(self._frame_begin, self._frame_end, step_size)
-
-        for i in frames:
-            frame = self._frames[i]
-            face.load_state(frame)
-            rec = face.analyze()
-            for stat in rec.keys():
-                if stat in data:
-                    data[stat].append(rec[stat])
         frame_count = self._frame_end - self._frame_begin
         data["frame"] = list(range(0, frame_count, step_size))
         return data
@@ -1066,6 +1138,8 @@ gesture you wish to analyze."""
         dlg_modal.display_please_wait(window=self, f=f, message="Loading document")
         tilt_threshold = app.tilt_threshold
         self._face = AnalyzeFace(doc.measures, tilt_threshold=tilt_threshold)
+        if isinstance(self._frames, dynaface_document.DocumentFrames):
+            self._frames.close()
         self._frames = doc.frames
         self.filename = filename
         self.frame_count = len(self._frames)
@@ -1169,47 +1243,23 @@ gesture you wish to analyze."""
         return True
 
     def find_max_dental(self):
-        app = QApplication.instance()
-
-        measures = [AnalyzeDentalArea()]
-        tilt_threshold = app.tilt_threshold
-        face = AnalyzeFace(measures, tilt_threshold=tilt_threshold)
-        frames = range(self._frame_begin, self._frame_end, 1)
-
-        max_smile_idx = max_smile = -1
-        for i in frames:
-            frame = self._frames[i]
-            face.load_state(frame)
-            rec = face.analyze()
-            da = rec["dental_area"]
-            if max_smile == -1 or da > max_smile:
-                max_smile_idx = i
-                max_smile = da
-
-        return max_smile_idx
+        return self._measure_table.find(
+            self._frames,
+            {"dental": Reduction(("dental_area",))},
+            self._frame_begin,
+            self._frame_end,
+        )["dental"]
 
     def find_max_ocular(self):
-        app = QApplication.instance()
-
-        measures = [AnalyzeEyeArea()]
-        tilt_threshold = app.tilt_threshold
-        face = AnalyzeFace(measures, tilt_threshold=tilt_threshold)
-        frames = range(self._frame_begin, self._frame_end, 1)
-
-        max_eye_idx = max_eye = -1
-        for i in frames:
-            frame = self._frames[i]
-            face.load_state(frame)
-            rec = face.analyze()
-            if "eye.left" not in rec or "eye.right" not in rec:
-                logger.info("Jump to max ocular, can't find ocular information")
-                return -1
-            ea = rec["eye.left"] + rec["eye.right"]
-            if max_eye == -1 or ea > max_eye:
-                max_eye_idx = i
-                max_eye = ea
-
-        return max_eye_idx
+        idx = self._measure_table.find(
+            self._frames,
+            {"ocular": Reduction(("eye.left", "eye.right"))},
+            self._frame_begin,
+            self._frame_end,
+        )["ocular"]
+        if idx == -1:
+            logger.info("Jump to max ocular, can't find ocular information")
+        return idx
 
     def exec_max_dental(self):
         idx = self.find_max_dental()
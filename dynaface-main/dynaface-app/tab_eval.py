@@ -1,8 +1,7 @@
 import logging
 
 import dlg_modal
-from dynaface.facial import AnalyzeFace
-from dynaface.measures import AnalyzeDentalArea, AnalyzeEyeArea, all_measures
+from dynaface.timeseries import Reduction
 from jth_ui.app_jth import get_library_version
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QPushButton, QTextEdit, QVBoxLayout, QWidget
@@ -42,42 +41,36 @@ class TabEval(QWidget):
         pass
 
     def exec_eval(self, analyze):
-        import dynaface_app
-
-        measures = [AnalyzeEyeArea(), AnalyzeDentalArea()]
-        tilt_threshold = app.tilt_threshold
-        face = AnalyzeFace(measures, tilt_threshold=tilt_threshold)
-        frames = range(analyze._frame_begin, analyze._frame_end, 1)
+        table = analyze._measure_table
+        frames = analyze._frames
+        found = table.find(
+            frames,
+            {
+                "dental": Reduction(("dental_area",)),
+                "ocular": Reduction(("eye.left", "eye.right")),
+            },
+            analyze._frame_begin,
+            analyze._frame_end,
+        )
 
-        max_eye_idx = max_eye = -1
-        max_eye_data = ""
-        max_smile_idx = max_smile = -1
         max_smile_data = ""
+        i = found["dental"]
+        if i != -1:
+            da = table.values(frames, i, ["dental_area"])["dental_area"]
+            max_smile_data = f"Max Dental (frame:{i}: Dental area: {round(da,1)})"
 
-        for i in frames:
-            frame = analyze._frames[i]
-            face.load_state(frame)
-            rec = face.analyze()
-            el = rec["eye.l"]
-            er = rec["eye.r"]
+        max_eye_data = ""
+        i = found["ocular"]
+        if i != -1:
+            eyes = table.values(frames, i, ["eye.left", "eye.right"])
+            el, er = eyes["eye.left"], eyes["eye.right"]
             ea = el + er
-            da = rec["dental_area"]
-
-            if max_eye == -1 or ea > max_eye:
-                # max_eye_idx = i
-                max_eye = ea
-                max_eye_data = f"Max Dental (frame:{i}: Dental area: {round(da,1)})"
-
-            if max_smile == -1 or da > max_smile:
-                # max_smile_idx = i
-                max_smile = da
-
-                ratio_lr = round(el / er, 3)
-                ratio_rl = round(er / el, 3)
-                max_smile_data = f"Max ocular (frame:{i}): left={round(el,1)}, right={round(er,1)}, lr={ratio_lr}, rl={ratio_rl}, total={round(ea,1)}"
+            ratio_lr = round(el / er, 3)
+            ratio_rl = round(er / el, 3)
+            max_eye_data = f"Max ocular (frame:{i}): left={round(el,1)}, right={round(er,1)}, lr={ratio_lr}, rl={ratio_rl}, total={round(ea,1)}"
 
         self._window._background_queue.append(
-            lambda: self.text_edit.setHtml(f"{max_eye_data}<br>{max_smile_data}")
+            lambda: self.text_edit.setHtml(f"{max_smile_data}<br>{max_eye_data}")
         )
 
     def generate(self, analyze):
@@ -1,6 +1,7 @@
 import logging
 
 from dynaface.facial import DEFAULT_TILT_THRESHOLD, STD_PUPIL_DIST
+from dynaface.smoothing import SMOOTHING_METHODS
 from jth_ui import utl_settings
 from PyQt6.QtGui import QIntValidator
 from PyQt6.QtWidgets import (
@@ -45,6 +46,16 @@ class SettingsTab(QWidget):
         self._text_data_smooth = QLineEdit(self)
         self._text_dynamic_adjust.setValidator(QIntValidator())
 
+        lbl_smooth_method = QLabel("Data smoothing method:", self)
+        self._smooth_method_combo_box = QComboBox()
+        self._smooth_method_combo_box.addItems(SMOOTHING_METHODS)
+
+        lbl_sample_stride = QLabel(
+            "Detect every Nth frame, refine gestures (1 to disable):", self
+        )
+        self._text_sample_stride = QLineEdit(self)
+        self._text_sample_stride.setValidator(QIntValidator())
+
         log_level_label = QLabel("Log Level:", self)
         self._log_combo_box = QComboBox()
         self._log_combo_box.addItems(["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
@@ -69,6 +80,8 @@ class SettingsTab(QWidget):
         form_layout.addRow(lbl_tilt, self._text_tilt)
         form_layout.addRow(lbl_dynamic_adjust, self._text_dynamic_adjust)
         form_layout.addRow(lbl_data_smooth, self._text_data_smooth)
+        form_layout.addRow(lbl_smooth_method, self._smooth_method_combo_box)
+        form_layout.addRow(lbl_sample_stride, self._text_sample_stride)
         form_layout.addRow(log_level_label, self._log_combo_box)
         form_layout.addRow(lbl_acc, self._chk_accelerator)
 
@@ -87,6 +100,10 @@ class SettingsTab(QWidget):
 
         self._text_dynamic_adjust.setText(str(self._window.app.dynamic_adjust))
         self._text_data_smooth.setText(str(self._window.app.data_smoothing))
+        utl_settings.set_combo(
+            self._smooth_method_combo_box, self._window.app.smoothing_method
+        )
+        self._text_sample_stride.setText(str(self._window.app.sample_stride))
 
         utl_settings.set_combo(
             self._log_combo_box,
@@ -109,6 +126,10 @@ class SettingsTab(QWidget):
         self._text_tilt.setText(str(dynaface.facial.DEFAULT_TILT_THRESHOLD))
         self._text_dynamic_adjust.setText(str(dynaface_app.DEFAULT_DYNAMIC_ADJUST))
         self._text_data_smooth.setText(str(dynaface_app.DEFAULT_SMOOTH))
+        utl_settings.set_combo(
+            self._smooth_method_combo_box, dynaface_app.DEFAULT_SMOOTH_METHOD
+        )
+        self._text_sample_stride.setText(str(dynaface_app.DEFAULT_SAMPLE_STRIDE))
         utl_settings.set_combo(self._log_combo_box, "INFO")
 
     def action_cancel(self):
@@ -140,13 +161,24 @@ class SettingsTab(QWidget):
             self._text_data_smooth.text(), default=dynaface_app.DEFAULT_SMOOTH
         )
 
+        sample_stride = utl_settings.parse_int(
+            self._text_sample_stride.text(),
+            default=dynaface_app.DEFAULT_SAMPLE_STRIDE,
+        )
+
         if dynamic_adjust < 1:
             dynamic_adjust = 1
         if data_smoothing < 1:
             data_smoothing = 1
+        if sample_stride < 1:
+            sample_stride = 1
 
         settings[dynaface_app.SETTING_DYNAMIC_ADJUST] = dynamic_adjust
         settings[dynaface_app.SETTING_SMOOTH] = data_smoothing
+        settings[dynaface_app.SETTING_SMOOTH_METHOD] = (
+            self._smooth_method_combo_box.currentText()
+        )
+        settings[dynaface_app.SETTING_SAMPLE_STRIDE] = sample_stride
 
         level = settings[dynaface_app.SETTING_LOG_LEVEL]
         logging_level = getattr(logging, level)
@@ -0,0 +1,190 @@
+import gzip
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dynaface.facial  # noqa: F401, imported before dynaface.measures
+import dynaface.measures
+from dynaface_document import DOC_MAGIC, DynafaceDocument, DocumentFrames, FrameStore
+
+
+def make_state(i):
+    img = np.random.default_rng(i).integers(0, 255, (24, 32, 3), dtype=np.uint8)
+    landmarks = np.full((98, 2), i, dtype=np.float32)
+    rotation = None if i % 2 == 0 else 0.1 * i
+    return [img, [0.0, 1.0, float(i)], landmarks, 60.0 + i, 0.25, rotation]
+
+
+def assert_state_equal(test, actual, expected):
+    np.testing.assert_array_equal(actual[0], expected[0])
+    test.assertEqual(list(actual[1]), list(expected[1]))
+    np.testing.assert_array_equal(actual[2], expected[2])
+    test.assertEqual(actual[3:5], expected[3:5])
+    if expected[5] is None:
+        test.assertIsNone(actual[5])
+    else:
+        test.assertAlmostEqual(actual[5], expected[5], places=6)
+
+
+class TestFrameStore(unittest.TestCase):
+
+    def test_append_and_read(self):
+        store = FrameStore()
+        self.addCleanup(store.close)
+        states = [make_state(i) for i in range(5)]
+        for state in states:
+            store.append(state)
+        self.assertEqual(len(store), 5)
+        for i in (0, 4, 2):
+            assert_state_equal(self, store[i], states[i])
+        part = store[1:3]
+        self.assertIsInstance(part, FrameStore)
+        self.assertEqual(len(part), 2)
+        assert_state_equal(self, part[1], states[2])
+
+    def test_save_slice(self):
+        store = FrameStore()
+        self.addCleanup(store.close)
+        states = [make_state(i) for i in range(4)]
+        for state in states:
+            store.append(state)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "clip.dyfc")
+            doc = DynafaceDocument()
+            doc.frames = store[1:4]
+            doc.fps = 30
+            doc.save(filename)
+
+            loaded = DynafaceDocument()
+            loaded.load(filename)
+            try:
+                self.assertEqual(len(loaded.frames), 3)
+                for i, state in enumerate(states[1:4]):
+                    assert_state_equal(self, loaded.frames[i], state)
+            finally:
+                loaded.frames.close()
+
+
+class TestDynafaceDocument(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def load(self, filename):
+        doc = DynafaceDocument()
+        doc.load(filename)
+        if isinstance(doc.frames, DocumentFrames):
+            self.addCleanup(doc.frames.close)
+        return doc
+
+    def save_states(self, filename, states):
+        doc = DynafaceDocument()
+        doc.frames = states
+        doc.fps = 25
+        fai = dynaface.measures.AnalyzeFAI()
+        fai.enabled = False
+        doc.measures = [fai]
+        doc.save(filename)
+
+    def assert_frames(self, frames, states):
+        self.assertEqual(len(frames), len(states))
+        for actual, expected in zip(frames, states):
+            assert_state_equal(self, actual, expected)
+
+    def test_round_trip(self):
+        filename = os.path.join(self.dir, "clip.dyfc")
+        states = [make_state(i) for i in range(4)]
+        self.save_states(filename, states)
+        with open(filename, "rb") as f:
+            self.assertEqual(f.read(len(DOC_MAGIC)), DOC_MAGIC)
+
+        doc = self.load(filename)
+        self.assertIsInstance(doc.frames, DocumentFrames)
+        self.assertEqual(doc.fps, 25)
+        self.assert_frames(doc.frames, states)
+        fai = [m for m in doc.measures if isinstance(m, dynaface.measures.AnalyzeFAI)]
+        self.assertEqual(len(fai), 1)
+        self.assertFalse(fai[0].enabled)
+        # Measures missing from the file are added
+        self.assertEqual(len(doc.measures), len(dynaface.measures.all_measures()))
+
+    def test_save_loaded_slice(self):
+        source = os.path.join(self.dir, "clip.dyfc")
+        states = [make_state(i) for i in range(5)]
+        self.save_states(source, states)
+        doc = self.load(source)
+
+        part = os.path.join(self.dir, "part.dyfc")
+        doc.frames = doc.frames[1:4]
+        doc.save(part)
+        self.assert_frames(self.load(part).frames, states[1:4])
+
+    def test_overwrite_loaded_file(self):
+        filename = os.path.join(self.dir, "clip.dyfc")
+        states = [make_state(i) for i in range(5)]
+        self.save_states(filename, states)
+        doc = self.load(filename)
+        frames = doc.frames
+
+        doc.frames = frames[::2]
+        doc.fps = 50
+        doc.save(filename)
+        # Frames loaded from the replaced file still read, from the new file
+        assert_state_equal(self, frames[4], states[4])
+        self.assert_frames(doc.frames, states[::2])
+        self.assertEqual(os.listdir(self.dir), ["clip.dyfc"])
+
+        reloaded = self.load(filename)
+        self.assertEqual(reloaded.fps, 50)
+        self.assert_frames(reloaded.frames, states[::2])
+
+    def test_load_version_1(self):
+        filename = os.path.join(self.dir, "old.dyfc")
+        states = [make_state(i) for i in range(3)]
+        doc = {
+            "header": {"version": 1, "fps": 30},
+            "body": {
+                "measures": [
+                    {
+                        "name": "dynaface.measures.AnalyzeFAI",
+                        "enabled": False,
+                        "items": [{"name": "fai", "enabled": False}],
+                    }
+                ],
+                "frames": states,
+            },
+        }
+        with gzip.open(filename, "wb") as f:
+            pickle.dump(doc, f)
+
+        loaded = self.load(filename)
+        self.assertEqual(loaded.fps, 30)
+        self.assert_frames(loaded.frames, states)
+        fai = loaded.measures[0]
+        self.assertIsInstance(fai, dynaface.measures.AnalyzeFAI)
+        self.assertFalse(fai.enabled)
+        self.assertFalse(fai.items[0].enabled)
+
+        # Saving it again writes the current format
+        filename2 = os.path.join(self.dir, "new.dyfc")
+        loaded.save(filename2)
+        self.assert_frames(self.load(filename2).frames, states)
+
+    def test_rejects_other_files(self):
+        filename = os.path.join(self.dir, "notes.dyfc")
+        with open(filename, "wb") as f:
+            f.write(b"not a document")
+        with self.assertRaises(TypeError):
+            DynafaceDocument().load(filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,29 +1,63 @@
 import logging
+import os
+import threading
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from typing import Callable
 
 import cv2
+import numpy as np
 from jth_ui import utl_etc
 from PyQt6.QtCore import QThread, pyqtSignal
 from PyQt6.QtWidgets import QApplication
 
-from dynaface import facial, measures, util
+from dynaface import facial, measures, sampling, smoothing, util
 
 logger = logging.getLogger(__name__)
 
 BATCH_SIZE = 10
+EXPORT_FOURCC = "mp4v"  # or use 'XVID'
+EXPORT_WINDOW = 4  # Frames in flight per export worker
 
 
 class WorkerExport(QThread):
-    """Export loaded video frames to an annotated video."""
+    """Export loaded video frames to an annotated video.
+
+    Frames are rendered by a pool of worker threads, each with its own
+    AnalyzeFace, and an ordered writer drains them into the VideoWriter. At
+    most EXPORT_WINDOW frames per worker are in flight at once.
+    """
 
     _update_signal = pyqtSignal(str)
 
-    def __init__(self, dlg, output_file):
+    def __init__(
+        self, dlg, output_file, workers=None, fourcc=EXPORT_FOURCC, hw_accel=True
+    ):
         super().__init__()
         self._dialog = dlg
         self._output_file = output_file
+        self._workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self._fourcc = fourcc
+        self._hw_accel = hw_accel
+
+    def _open_writer(self, width, height):
+        fourcc = cv2.VideoWriter_fourcc(*self._fourcc)
+        frame_rate = self._dialog._window.frame_rate
+        if self._hw_accel and hasattr(cv2, "VIDEOWRITER_PROP_HW_ACCELERATION"):
+            # Let OpenCV pick any available encoder acceleration, if there is one
+            params = [
+                cv2.VIDEOWRITER_PROP_HW_ACCELERATION,
+                cv2.VIDEO_ACCELERATION_ANY,
+            ]
+            out = cv2.VideoWriter(
+                self._output_file, fourcc, frame_rate, (width, height), params
+            )
+            if out.isOpened():
+                return out
+            logger.info("Accelerated video writer unavailable, using default")
+        return cv2.VideoWriter(self._output_file, fourcc, frame_rate, (width, height))
 
     def run(self):
         app = QApplication.instance()
@@ -33,73 +67,57 @@ class WorkerExport(QThread):
             while self._dialog._window.loading:
                 time.sleep(1)
         self._update_signal.emit("Exporting...")
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # or use 'XVID'
         width = self._dialog._window._face.width
         height = self._dialog._window._face.height
-        out = cv2.VideoWriter(
-            self._output_file, fourcc, self._dialog._window.frame_rate, (width, height)
-        )
         tilt_threshold = app.tilt_threshold
-        face = facial.AnalyzeFace(
-            self._dialog._window._face.measures, tilt_threshold=tilt_threshold
-        )
+        face_measures = self._dialog._window._face.measures
         t = self._dialog._window
         c = t._frame_end - t._frame_begin
-        for i in range(t._frame_begin, t._frame_end):
-            frame = t._frames[i]
-            self._update_signal.emit(f"Exporting frame {i-t._frame_begin:,}/{c:,}...")
-            face.load_state(frame)
+
+        local = threading.local()
+        lock = threading.Lock()
+        rendered = [0]
+
+        def render(i):
+            face = getattr(local, "face", None)
+            if face is None:
+                face = facial.AnalyzeFace(face_measures, tilt_threshold=tilt_threshold)
+                local.face = face
+            face.load_state(t._frames[i])
             face.render_reset()
             face.analyze()
             image = cv2.cvtColor(face.render_img, cv2.COLOR_BGR2RGB)
-            out.write(image)
-        out.release()
-        self._update_signal.emit("*")
-
-
-def mean_landmarks(data):
-    """
-    Calculate the average of corresponding tuples across multiple lists of tuples.
-
-    Args:
-        data (list of list of tuples): A list where each element is a list of tuples.
-            Each tuple contains two numeric values. For example:
-            data = [ [(1, 2), (3, 4)], [(1, 2), (3, 4)] ]
-
-    Returns:
-        list of tuples: A list of tuples where each tuple contains the average of the corresponding
-            tuples from the input lists. For example:
-            output = [(1.0, 2.0), (3.0, 4.0)]
-
-    Example:
-        data = [ [(1, 2), (3, 4)], [(1, 2), (3, 4)] ]
-        result = average_tuples(data)
-        print(result)  # Output: [(1.0, 2.0), (3.0, 4.0)]
-    """
-    # Determine the length of the inner lists
-    if not data or not data[0]:
-        return []
-
-    inner_list_length = len(data[0])
+            with lock:
+                rendered[0] += 1
+            return image
 
-    # Initialize sums for each tuple position
-    sums = [(0, 0) for _ in range(inner_list_length)]
-
-    # Calculate the number of outer lists
-    n_outer_lists = len(data)
-
-    # Iterate through the outer list
-    for outer_list in data:
-        for i, (x, y) in enumerate(outer_list):
-            sums[i] = (sums[i][0] + x, sums[i][1] + y)
-
-    # Calculate the averages
-    averages = [
-        (int(sum_x / n_outer_lists), int(sum_y / n_outer_lists))
-        for (sum_x, sum_y) in sums
-    ]
-
-    return averages
+        status = "*"
+        out = None
+        try:
+            out = self._open_writer(width, height)
+            frames = iter(range(t._frame_begin, t._frame_end))
+            window = self._workers * EXPORT_WINDOW
+            with ThreadPoolExecutor(max_workers=self._workers) as pool:
+                pending = deque(pool.submit(render, i) for i in islice(frames, window))
+                written = 0
+                while pending:
+                    image = pending.popleft().result()
+                    i = next(frames, None)
+                    if i is not None:
+                        pending.append(pool.submit(render, i))
+                    out.write(image)
+                    written += 1
+                    self._update_signal.emit(
+                        f"Exporting: rendered {rendered[0]:,}/{c:,}, written {written:,}/{c:,}..."
+                    )
+        except Exception as e:
+            logger.error("Error exporting video", exc_info=True)
+            status = f"*Export failed: {e}"
+        finally:
+            if out is not None:
+                out.release()
+            # A status starting with * ends the export, with an error if any
+            self._update_signal.emit(status)
 
 
 class WorkerLoad(QThread):
@@ -113,11 +131,33 @@ class WorkerLoad(QThread):
         self._total = self._target.frame_count
         self.running = True
 
-    def preprocess_frame(self, frame, pupils, color=True):
+    def prepare_frame(self, frame, color=True, window=None):
+        """Rotate and color convert a decoded frame, or only a window of it.
+
+        The window (x0, y0, x1, y1) is in the coordinates of the rotated frame,
+        only that region is rotated and converted."""
+        if window is not None:
+            x0, y0, x1, y1 = util.unrotate_window(
+                window, frame.shape, self._target.base_rotation
+            )
+            frame = frame[y0:y1, x0:x1]
         if self._target.base_rotation is not None:
             frame = cv2.rotate(frame, self._target.base_rotation)
         if color:
             frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        return frame
+
+    def rotated_shape(self, frame):
+        height, width = frame.shape[:2]
+        if self._target.base_rotation in (
+            cv2.ROTATE_90_CLOCKWISE,
+            cv2.ROTATE_90_COUNTERCLOCKWISE,
+        ):
+            return width, height
+        return height, width
+
+    def preprocess_frame(self, frame, pupils, color=True):
+        frame = self.prepare_frame(frame, color)
 
         success = self._face.load_image(img=frame, crop=True, pupils=pupils)
         if not success:
@@ -125,30 +165,176 @@ class WorkerLoad(QThread):
 
         return frame
 
+    def detect_roi(self, frame):
+        """Find the landmarks within the crop window of the previous pupils."""
+        shape = self.rotated_shape(frame)
+        window = facial.stylegan_window(self._roi_pupils, shape)
+        landmarks, headpose = self._face.find_landmarks(
+            self.prepare_frame(frame, window=window)
+        )
+        if len(landmarks) == 0:
+            return None
+        landmarks = landmarks + window[:2]
+        # The face must not have moved out of the window
+        x0, y0, x1, y1 = facial.stylegan_window(
+            facial.util_get_pupils(landmarks), shape, margin=0
+        )
+        if x0 < window[0] or y0 < window[1] or x1 > window[2] or y1 > window[3]:
+            return None
+        return landmarks, headpose
+
+    def detect_frame(self, frame):
+        """Find the landmarks of a decoded frame, in the coordinates of the
+        decoded (not rotated) frame.
+
+        The sampler holds frames back until the next keyframe, and detecting
+        a keyframe may change the base rotation. Detections do not depend on
+        the rotation, so add_sample() prepares every frame, held back or not,
+        with the rotation current at that time."""
+        found = None
+        if self._roi_pupils is not None:
+            found = self.detect_roi(frame)
+        if found is None:
+            # Fall back to the whole frame
+            image = self.prepare_frame(frame)
+            found = self._face.find_landmarks(image)
+        if len(found[0]) == 0:
+            # See if a rotation fixes this
+            for rotation in [cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_90_COUNTERCLOCKWISE]:
+                self._target.base_rotation = rotation
+                image = self.prepare_frame(frame)
+                found = self._face.find_landmarks(image)
+                if len(found[0]) > 0:
+                    break
+            else:
+                self._target.base_rotation = None
+                self._roi_pupils = None
+                return None
+        landmarks, headpose = found
+        self._roi_pupils = facial.util_get_pupils(landmarks)
+        landmarks = util.unrotate_points(
+            landmarks, frame.shape, self._target.base_rotation
+        )
+        return landmarks, headpose
+
+    def reset_orientation(self):
+        """Forget the pupils and smoothed landmarks after the base rotation
+        changed, they belong to the old orientation."""
+        self._rotation = self._target.base_rotation
+        self._pupils = None
+        self._pupil_filter.reset()
+        self._landmarks_filter.reset()
+
+    def add_sample(self, sample):
+        self._frame_num += 1
+        if sample.landmarks is None:
+            logger.info(f"No face found on frame {self._frame_num}")
+            return
+
+        if self._target.base_rotation != self._rotation:
+            self.reset_orientation()
+
+        landmarks = util.rotate_points(
+            sample.landmarks, sample.frame.shape, self._target.base_rotation
+        )
+
+        # Only the region the crop reads is converted and loaded, with the
+        # detected or interpolated landmarks moved into it
+        window = facial.stylegan_window(
+            facial.util_get_pupils(landmarks),
+            self.rotated_shape(sample.frame),
+        )
+        offset = np.array(window[:2], dtype=np.float32)
+        image = self.prepare_frame(sample.frame, window=window)
+        pupils = None if self._pupils is None else self._pupils - offset
+        self._face.load_image(
+            img=image,
+            crop=True,
+            pupils=pupils,
+            landmarks=landmarks - offset,
+            headpose=sample.headpose,
+        )
+        if self._face.lateral:
+            # The lateral crop is not bounded by the window, use the full frame
+            offset = 0
+            self._face.load_image(
+                img=self.prepare_frame(sample.frame),
+                crop=True,
+                landmarks=landmarks,
+                headpose=sample.headpose,
+            )
+
+        # See if we have a considerable tilt, and try to resolve
+        # This is likely due to an iphone held vertically but video stored horizontally
+        tilt = self._face.calculate_face_rotation()
+        if abs(tilt) > 70 and self._target.base_rotation is None:
+            if tilt < 0:
+                self._target.base_rotation = cv2.ROTATE_90_CLOCKWISE
+            else:
+                self._target.base_rotation = cv2.ROTATE_90_COUNTERCLOCKWISE
+
+            # The window and the pupils are in the old orientation, load the
+            # whole frame again in the new one
+            self.reset_orientation()
+            self._roi_pupils = None
+            offset = 0
+            if self.preprocess_frame(sample.frame, pupils=None) is None:
+                logger.info(f"No face found on rotated frame {self._frame_num}")
+                return
+
+        # Pupils are kept in frame coordinates, the crop window moves with them
+        self._pupils = self._pupil_filter(np.asarray(self._face.orig_pupils) + offset)
+
+        # Extract
+        landmarks = self._landmarks_filter(self._face.landmarks)
+
+        pupillary_distance, pix2mm = facial.util_calc_pd(
+            facial.util_get_pupils(landmarks)
+        )
+
+        # Update remaining face properties
+        self._face.landmarks = landmarks
+        self._face.pupillary_distance = pupillary_distance
+        self._face.pix2mm = pix2mm
+
+        # Build frame-state data
+        frame_state = self._face.dump_state()
+        self._target.add_frame(frame_state)
+
+        # Update UI
+        self._update_signal.emit(self._loading_etc.cycle())
+
     def run(self):
         app = QApplication.instance()
 
         dynamic_adjust = app.dynamic_adjust
         data_smoothing = app.data_smoothing
+        smoothing_method = app.smoothing_method
+        sample_stride = app.sample_stride
         tilt_threshold = app.tilt_threshold
 
         logger.debug("Running background thread")
         logger.debug(f"Smoothing crop buffer size: {dynamic_adjust}")
         logger.debug(f"Smoothing landmarks buffer size: {data_smoothing}")
+        logger.debug(f"Smoothing landmarks method: {smoothing_method}")
+        logger.debug(f"Landmark detection stride: {sample_stride}")
         logger.debug(f"Head tilt correct threshold: {tilt_threshold}")
 
         self._target.loading = True
         self._loading_etc = utl_etc.CalcETC(self._total)
         self._face = facial.AnalyzeFace([], tilt_threshold=tilt_threshold)
 
-        pupils = None
-        pupil_queue = deque(
-            maxlen=dynamic_adjust
-        )  # Queue to store the last 5 pupil positions
-
-        landmarks_queue = deque(
-            maxlen=data_smoothing
-        )  # Queue to store the last 5 pupil positions
+        self._frame_num = 0
+        self._pupils = None
+        self._rotation = self._target.base_rotation  # Orientation of _pupils
+        self._roi_pupils = None  # Pupils of the last detection, for its window
+        # Crop/zoom/tilt follows the mean of the last pupil positions
+        self._pupil_filter = smoothing.MovingAverageFilter(dynamic_adjust)
+        self._landmarks_filter = smoothing.create_filter(
+            smoothing_method, data_smoothing, fps=self._target.frame_rate
+        )
+        # Keyframes are detected, the frames between them detected or interpolated
+        sampler = sampling.AdaptiveSampler(self.detect_frame, sample_stride)
 
         try:
             i = 0
@@ -159,64 +345,19 @@ class WorkerLoad(QThread):
 
                 if not ret:
                     logger.debug("Thread done")
+                    for sample in sampler.flush():
+                        self.add_sample(sample)
                     break
 
-                # Make sure we did not get a request to stop during each of these:
-                if not self.running:
-                    break
-
-                # Handle frames where we fail to find a face
-                frame2 = frame
-                frame = self.preprocess_frame(frame, pupils=pupils)
-                if frame is None:
-                    # See if a rotation fixes this
-                    self._target.base_rotation = cv2.ROTATE_90_CLOCKWISE
-                    frame = self.preprocess_frame(frame2, pupils=pupils)
-                    if frame is None:
-                        self._target.base_rotation = cv2.ROTATE_90_COUNTERCLOCKWISE
-                        frame = self.preprocess_frame(frame2, pupils=pupils)
-                        if frame is None:
-                            self._target.base_rotation = None
-                            logger.info(f"No face found on frame {i}")
-                            continue
-
-                # See if we have a considerable tilt, and try to resolve
-                # This is likely due to an iphone held vertically but video stored horizontally
-                tilt = self._face.calculate_face_rotation()
-                if abs(tilt) > 70 and self._target.base_rotation is None:
-                    if tilt < 0:
-                        self._target.base_rotation = cv2.ROTATE_90_CLOCKWISE
-                    else:
-                        self._target.base_rotation = cv2.ROTATE_90_COUNTERCLOCKWISE
-
-                    frame = self.preprocess_frame(frame, pupils=pupils, color=False)
-
-                #
-                pupil_queue.append(self._face.orig_pupils)
-                pupils = mean_landmarks(pupil_queue)
-
-                # Extract
-                landmarks = self._face.landmarks
-                landmarks_queue.append(landmarks)
-                if len(landmarks_queue) > 1:
-                    landmarks = mean_landmarks(landmarks_queue)
-
-                pupillary_distance, pix2mm = facial.util_calc_pd(
-                    facial.util_get_pupils(landmarks)
-                )
-
-                # Update remaining face properties
-                self._face.landmarks = landmarks
-                self._face.pupillary_distance = pupillary_distance
-                self._face.pix2mm = pix2mm
-
-                # Build frame-state data
-                frame_state = self._face.dump_state()
-                self._target.add_frame(frame_state)
-
-                # Update UI
-                self._update_signal.emit(self._loading_etc.cycle())
+                for sample in sampler.push(frame):
+                    # Make sure we did not get a request to stop during each of these:
+                    if not self.running:
+                        break
+                    self.add_sample(sample)
 
+            logger.info(
+                f"Detected landmarks on {sampler.detections:,} of {sampler.frames:,} frames"
+            )
         except Exception as e:
             logger.error("Error loading video", exc_info=True)
         finally:
@@ -10,7 +10,7 @@ import dynaface.image
 import dynaface.measures
 import numpy as np
 import requests  # You may also use: # type: ignore[import]
-from dynaface.image import ImageAnalysis
+from dynaface.image import DrawingLog, ImageAnalysis, recorded
 from dynaface.lateral import analyze_lateral  # type: ignore
 from dynaface.measures import MeasureBase
 from dynaface.models import are_models_init
@@ -35,6 +35,7 @@ LM_RIGHT_PUPIL = 96
 
 # Changed FILL_COLOR to a tuple to match expected type in safe_clip.
 FILL_COLOR = (255, 255, 255)
+ROI_MARGIN = 0.25  # Border of stylegan_window() for movement between frames
 
 
 def util_calc_pd(
@@ -50,11 +51,70 @@ def util_calc_pd(
 
 
 def util_get_pupils(
-    landmarks: List[Tuple[int, int]],
-) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    landmarks: Any,
+) -> Tuple[Tuple[float, float], Tuple[float, float]]:
     return landmarks[LM_LEFT_PUPIL], landmarks[LM_RIGHT_PUPIL]
 
 
+def stylegan_window(
+    pupils: Tuple[Tuple[float, float], Tuple[float, float]],
+    shape: Tuple[int, ...],
+    margin: float = ROI_MARGIN,
+) -> Tuple[int, int, int, int]:
+    """
+    Region of a source image that crop_stylegan() reads for these pupils.
+
+    The crop is centered on the pupils and scaled by their distance; since a
+    tilt correction may rotate it, the region is the square around the circle
+    that holds the crop at any angle. Processing only this region, e.g. of a
+    4K video frame, gives the same crop as processing the whole image.
+
+    Args:
+        pupils (Tuple[Tuple[float, float], Tuple[float, float]]): The pupils,
+            in source image coordinates.
+        shape (Tuple[int, ...]): Shape of the source image.
+        margin (float): Extra border, as a fraction of the region radius, for
+            a face that moved since the pupils were found.
+
+    Returns:
+        Tuple[int, int, int, int]: (x0, y0, x1, y1), clipped to the image. The
+        whole image if the pupils coincide.
+    """
+    height, width = shape[:2]
+    (lx, ly), (rx, ry) = pupils
+    d = math.hypot(lx - rx, ly - ry)
+    if d == 0:
+        return 0, 0, width, height
+    cx = (STYLEGAN_LEFT_PUPIL[0] + STYLEGAN_RIGHT_PUPIL[0]) / 2
+    cy = (STYLEGAN_LEFT_PUPIL[1] + STYLEGAN_RIGHT_PUPIL[1]) / 2
+    corners = [(0, 0), (STYLEGAN_WIDTH, 0), (0, STYLEGAN_WIDTH)]
+    corners.append((STYLEGAN_WIDTH, STYLEGAN_WIDTH))
+    reach = max(math.hypot(x - cx, y - cy) for x, y in corners)
+    radius = reach * d / STYLEGAN_PUPIL_DIST * (1 + margin)
+    mx, my = (lx + rx) / 2, (ly + ry) / 2
+    return (
+        max(0, int(mx - radius)),
+        max(0, int(my - radius)),
+        min(width, int(math.ceil(mx + radius))),
+        min(height, int(math.ceil(my + radius))),
+    )
+
+
+class PanelPoint(Tuple[int, int]):
+    """
+    Position in the measurement panel, returned by analyze_next_pt() while
+    drawing is recorded. replay() swaps it for the position of the same panel
+    line at the current text size.
+    """
+
+    panel_index: int
+
+    def __new__(cls, pos: Tuple[int, int], panel_index: int) -> "PanelPoint":
+        obj = super().__new__(cls, pos)
+        obj.panel_index = panel_index
+        return obj
+
+
 class AnalyzeFace(ImageAnalysis):
     pd = STD_PUPIL_DIST
 
@@ -83,7 +143,7 @@ class AnalyzeFace(ImageAnalysis):
         else:
             self.measures = measures
         self.headpose: List[int] = [0, 0, 0]
-        self.landmarks: List[Tuple[int, int]] = []
+        self.landmarks: util.Landmarks = util.to_landmarks([])
         self.lateral: bool = False
         self.lateral_landmarks: NDArray[Any] = NDArray[Any]([])
         self.pupillary_distance: float = 0.0
@@ -92,7 +152,53 @@ class AnalyzeFace(ImageAnalysis):
         self.pix2mm: float = 1.0
         # Changed face_rotation to Optional[float] to allow assigning None.
         self.face_rotation: Optional[float] = 0.0
-        self.orig_pupils: Tuple[Tuple[int, int], Tuple[int, int]] = ((0, 0), (0, 0))
+        self.orig_pupils: Tuple[Tuple[float, float], Tuple[float, float]] = (
+            (0, 0),
+            (0, 0),
+        )
+        self._panel_lines: int = 0
+
+    def begin_stream(self) -> None:
+        """
+        Prepare this object to analyze a stream of frames, such as a video.
+
+        While streaming, load_image() reuses the image buffers of the previous
+        frame of the same size instead of allocating new ones, and the per-frame
+        state is reset before each frame. A single AnalyzeFace should be used for
+        the whole stream. The images held by this object are overwritten by the
+        next frame; dump_state() returns a copy of the image so that saved
+        states stay valid.
+        """
+        self.reuse_buffers = True
+
+    def end_stream(self) -> None:
+        """
+        Stop streaming and release the preallocated image buffers.
+
+        The current images are kept as copies, so the object remains usable.
+        """
+        self.reuse_buffers = False
+        self._buffers.clear()
+        if self.is_image_loaded():
+            self.original_img = self.original_img.copy()
+            self.gray_img = self.gray_img.copy()
+            self.render_img = self.render_img.copy()
+            self.original_hsv = self.original_hsv.copy()
+
+    def reset(self) -> None:
+        """
+        Clear the per-frame face state, ready for the next frame.
+        """
+        self.landmarks = util.to_landmarks([])
+        self._headpose = np.array([0.0, 0.0, 0.0])
+        self.headpose = [0, 0, 0]
+        self.lateral = False
+        self.flipped = False
+        self.lateral_landmarks = NDArray[Any]([])
+        self.pupillary_distance = 0.0
+        self.pix2mm = 1.0
+        self.face_rotation = 0.0
+        self.orig_pupils = ((0, 0), (0, 0))
 
     def get_all_items(self) -> List[str]:
         return [
@@ -112,9 +218,25 @@ class AnalyzeFace(ImageAnalysis):
         """
         return len(self.landmarks) == 0
 
+    def find_landmarks(
+        self, img: NDArray[Any]
+    ) -> Tuple[util.Landmarks, NDArray[Any]]:
+        """
+        Detect the landmarks of an image, without loading or cropping it.
+
+        Args:
+            img (NDArray[Any]): The image to search.
+
+        Returns:
+            Tuple[util.Landmarks, NDArray[Any]]: The landmarks in image
+            coordinates, empty if there is no face, and the headpose.
+        """
+        landmarks, headpose = self._find_landmarks(img)
+        return util.to_landmarks(landmarks), headpose
+
     def _find_landmarks(
         self, img: NDArray[Any]
-    ) -> Tuple[List[Tuple[int, int]], NDArray[Any]]:
+    ) -> Tuple[util.Landmarks, NDArray[Any]]:
         logger.debug("Called _find_landmarks")
         start_time = time.time()
 
@@ -130,8 +252,8 @@ class AnalyzeFace(ImageAnalysis):
         bbox, prob = models.mtcnn_model.detect(img)  # type: ignore
 
         if prob[0] is None or prob[0] < 0.9:
-            # Return an ndarray for headpose instead of a list.
-            return [], np.array([0, 0, 0])
+            # No face: empty (0, 2) landmarks, so callers can still index .shape
+            return util.to_landmarks([]), np.array([0, 0, 0])
 
         end_time = time.time()
         mtcnn_duration = end_time - start_time
@@ -227,7 +349,9 @@ class AnalyzeFace(ImageAnalysis):
         self,
         img: NDArray[Any],
         crop: Optional[bool] = True,
-        pupils: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
+        pupils: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None,
+        landmarks: Optional[Any] = None,
+        headpose: Optional[Any] = None,
     ) -> bool:
         """
         Load an image and process facial landmarks.
@@ -235,18 +359,30 @@ class AnalyzeFace(ImageAnalysis):
         Args:
             img (NDArray[Any]): The image to load.
             crop (bool): Whether to crop the face.
-            pupils (Optional[Tuple[Tuple[int, int], Tuple[int, int]]]): Optional pupils coordinates.
+            pupils (Optional[Tuple[Tuple[float, float], Tuple[float, float]]]): Optional pupils coordinates.
+            landmarks (Optional[Any]): Landmarks already known for this image,
+                e.g. interpolated between video frames. Detection is skipped,
+                unless a lateral face has to be flipped.
+            headpose (Optional[Any]): Head pose (yaw, pitch, roll) matching
+                `landmarks`.
         Returns:
             bool: True if the image was processed, False otherwise.
         """
+        if self.reuse_buffers:
+            self.reset()
         super().load_image(img)
         logger.debug("Low level-image loaded")
-        landmarks, self._headpose = self._find_landmarks(img)
-        self.landmarks = [(int(x), int(y)) for x, y in landmarks]
+        if landmarks is None:
+            landmarks, self._headpose = self._find_landmarks(img)
+        else:
+            landmarks = util.to_landmarks(landmarks)
+            if headpose is not None:
+                self._headpose = np.asarray(headpose, dtype=np.float64)
+        self.landmarks = landmarks
 
         lateral_pos, facing_left = self.is_lateral()
 
-        if lateral_pos and self.landmarks:
+        if lateral_pos and not self.is_no_face():
             self.lateral = True
             self.pix2mm = 0.24
             if not facing_left:
@@ -259,9 +395,7 @@ class AnalyzeFace(ImageAnalysis):
                 self.flipped = False
 
             self.crop_lateral()
-        elif (
-            self.landmarks
-        ):  # Changed check from "is not None" since landmarks is always a list.
+        elif not self.is_no_face():
             logger.debug("Landmarks located")
             self.calc_pd()
             self.lateral = False
@@ -300,11 +434,9 @@ class AnalyzeFace(ImageAnalysis):
         if self.is_no_face():
             return
         for i, landmark in enumerate(self.landmarks):
-            self.circle((int(landmark[0]), int(landmark[1])), radius=3, color=color)
+            self.circle(landmark, radius=3, color=color)
             if numbers:
-                self.write_text(
-                    (int(landmark[0]) + 3, int(landmark[1])), str(i), size=0.5
-                )
+                self.write_text((landmark[0] + 3, landmark[1]), str(i), size=0.5)
 
         # Changed conditions to check for non-None values.
         if self.left_eye is not None:
@@ -315,8 +447,8 @@ class AnalyzeFace(ImageAnalysis):
 
     def measure(
         self,
-        pt1: Tuple[int, int],
-        pt2: Tuple[int, int],
+        pt1: Tuple[float, float],
+        pt2: Tuple[float, float],
         color: Tuple[int, int, int] = (255, 0, 0),
         thickness: int = 3,
         render: bool = True,
@@ -391,6 +523,7 @@ class AnalyzeFace(ImageAnalysis):
                 self.write_text(mp, txt)
         return d
 
+    @recorded
     def draw_curve(
         self, segment: NDArray[Any], color: Tuple[int, int, int], thickness: int
     ) -> None:
@@ -416,33 +549,64 @@ class AnalyzeFace(ImageAnalysis):
         result = (self.analyze_x, self.analyze_y)
         m = self.calc_text_size(txt)
         self.analyze_y += int(m[0][1] * 2)
+        if self._draw_log is not None:
+            # Recorded too, so replay() lays out the panel lines the same way
+            self._draw_log.append(("analyze_next_pt", (txt,), {}))
+            self._panel_lines += 1
+            return PanelPoint(result, self._panel_lines)
         return result
 
-    def analyze(self) -> Optional[Dict[str, Any]]:
+    def _reset_panel(self) -> None:
+        m = self.calc_text_size("W")
+        self.analyze_x = int(m[0][0] * 0.25)
+        self.analyze_y = int(m[0][1] * 1.5)
+        self._panel_lines = 0
+
+    def replay(self, log: DrawingLog) -> None:
+        """
+        Draw a log made by record() onto render_img.
+
+        The measurement panel is laid out again, so a log recorded from
+        analyze() can be drawn at a different text size without analyzing
+        the face again.
+
+        Args:
+            log (DrawingLog): The recorded drawing calls.
+        """
+        self._reset_panel()
+        panel: Dict[int, Tuple[int, int]] = {}
+        for name, args, kwargs in log:
+            if name == "analyze_next_pt":
+                panel[len(panel) + 1] = self.analyze_next_pt(*args)
+                continue
+            if args and isinstance(args[0], PanelPoint):
+                args = (panel[args[0].panel_index],) + args[1:]
+            getattr(self, name)(*args, **kwargs)
+
+    def analyze(self, render: bool = True) -> Optional[Dict[str, Any]]:
         """
         Performs analysis on the face using enabled measures.
+
+        Args:
+            render (bool): Whether the measures draw onto render_img. Pass False
+                when only the values are needed. Defaults to True.
         """
-        if not self.landmarks:  # Changed check since landmarks is never None.
+        if self.is_no_face():
             return None
-        m = self.calc_text_size("W")
-        self.analyze_x = int(m[0][0] * 0.25)
-        self.analyze_y = int(m[0][1] * 1.5)
+        self._reset_panel()
         result: Dict[str, Any] = {}
         for calc in self.measures:
             if calc.enabled:
                 # Use type-ignore to bypass missing attribute error on 'calc'
-                result.update(calc.calc(self))  # type: ignore[attr-defined]
+                result.update(calc.calc(self, render=render))  # type: ignore[attr-defined]
         return result
 
     def calculate_face_rotation(self) -> float:
         """
         Calculates the face rotation in degrees.
         """
-        p = util_get_pupils(self.landmarks)
         return measures.to_degrees(
-            util.calculate_face_rotation(
-                ((int(p[0][0]), int(p[0][1])), (int(p[1][0]), int(p[1][1])))
-            )
+            util.calculate_face_rotation(util_get_pupils(self.landmarks))
         )
 
     def crop_lateral(self) -> None:
@@ -489,31 +653,27 @@ class AnalyzeFace(ImageAnalysis):
             STYLEGAN_WIDTH,
             FILL_COLOR,
         )
-        # Ensure landmarks is not None by providing a fallback empty list.
-        self.landmarks = [
-            (int(x), int(y))
-            for x, y in util.scale_crop_points(
-                [(int(x), int(y)) for x, y in self.landmarks], crop_x, crop_y, scale
-            )
-        ]
+        self.landmarks = util.scale_crop_points(
+            util.to_landmarks(self.landmarks), crop_x, crop_y, scale
+        )
         super().load_image(img2)
 
     def crop_stylegan(
-        self, pupils: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
+        self, pupils: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None
     ) -> None:
         """
         Processes and crops the image for StyleGAN.
         """
         pupils = cast(
-            Tuple[Tuple[int, int], Tuple[int, int]],
-            tuple((int(x), int(y)) for x, y in util_get_pupils(self.landmarks)),
+            Tuple[Tuple[float, float], Tuple[float, float]],
+            tuple((float(x), float(y)) for x, y in util_get_pupils(self.landmarks)),
         )
         self.orig_pupils = (
-            (int(pupils[0][0]), int(pupils[0][1])) if pupils else (0, 0),
-            (int(pupils[1][0]), int(pupils[1][1])) if pupils else (0, 0),
+            pupils[0] if pupils else (0, 0),
+            pupils[1] if pupils else (0, 0),
         )
         pupils = self.orig_pupils if util.is_zero_tuple(pupils) else pupils
-        img2 = self.original_img
+        angle = 0.0
         if pupils:
             r = util.calculate_face_rotation(pupils)
             tilt = measures.to_degrees(r)
@@ -522,13 +682,10 @@ class AnalyzeFace(ImageAnalysis):
                     f"Rotate landmarks: detected tilt={tilt} threshold={self.tilt_threshold}"
                 )
                 self.face_rotation = r
-                center = (
-                    self.original_img.shape[1] // 2,
-                    self.original_img.shape[0] // 2,
-                )
-                self.landmarks = util.rotate_crop_points(
-                    [(int(x), int(y)) for x, y in self.landmarks], center, tilt
-                )
+                # Unlike straighten(), no +-45 degree normalization: the crop
+                # expects landmark 96 on the left, so past 45 degrees it would
+                # turn the image and landmarks upside down.
+                angle = tilt
             else:
                 self.face_rotation = None
         if util.is_zero_tuple(pupils):
@@ -536,32 +693,53 @@ class AnalyzeFace(ImageAnalysis):
         d, _ = util_calc_pd(pupils)
         if d == 0:
             raise ValueError("Can't process face pupils must be in different locations")
-        if self.face_rotation:
-            logger.debug(f"Fix tilt: {self.face_rotation}")
-            img2 = util.straighten(self.original_img, self.face_rotation)
-        width, height = img2.shape[1], img2.shape[0]
-        ar = width / height
-        new_width = int(width * (STYLEGAN_PUPIL_DIST / d))
-        new_height = int(new_width / ar)
-        scale = new_width / width
-        crop_x = int((self.landmarks[96][0] * scale) - STYLEGAN_RIGHT_PUPIL[0])
-        crop_y = int((self.landmarks[96][1] * scale) - STYLEGAN_RIGHT_PUPIL[1])
-        img2 = cv2.resize(img2, (new_width, new_height))
-        img2, _, _ = util.safe_clip(
-            img2,
-            crop_x,
-            crop_y,
-            STYLEGAN_WIDTH,
-            STYLEGAN_WIDTH,
-            FILL_COLOR,
+
+        # Rotation, scale and crop are composed into one affine transform, so
+        # the image is interpolated once, straight into the 1024x1024 output.
+        width, height = self.original_img.shape[1], self.original_img.shape[0]
+        center = (width // 2, height // 2)
+        scale = int(width * (STYLEGAN_PUPIL_DIST / d)) / width
+        right_pupil = util.transform_points(
+            [self.landmarks[96]], util.crop_transform(center, angle, scale, 0, 0)
+        )[0]
+        crop_x = int(right_pupil[0] - STYLEGAN_RIGHT_PUPIL[0])
+        crop_y = int(right_pupil[1] - STYLEGAN_RIGHT_PUPIL[1])
+        matrix = util.crop_transform(center, angle, scale, crop_x, crop_y)
+
+        # As in straighten(), the corners uncovered by the rotation take the
+        # frame's average color; only what lies beyond the frame is padded
+        # with FILL_COLOR.
+        fill = FILL_COLOR if angle == 0 else util.calculate_average_rgb(
+            self.original_img
+        )
+
+        dst = None
+        if self.reuse_buffers:
+            shape = (STYLEGAN_WIDTH, STYLEGAN_WIDTH) + self.original_img.shape[2:]
+            dst = self.stream_buffers(shape, self.original_img.dtype)[0]
+            if dst is self.original_img:
+                dst = None
+        img2 = cv2.warpAffine(
+            self.original_img,
+            matrix,
+            (STYLEGAN_WIDTH, STYLEGAN_WIDTH),
+            dst=dst,
+            flags=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=fill,
+        )
+        if angle != 0:
+            x1 = min(max(int(width * scale) - crop_x, 0), STYLEGAN_WIDTH)
+            y1 = min(max(int(height * scale) - crop_y, 0), STYLEGAN_WIDTH)
+            x0 = min(max(-crop_x, 0), x1)
+            y0 = min(max(-crop_y, 0), y1)
+            img2[:y0] = FILL_COLOR
+            img2[y1:] = FILL_COLOR
+            img2[y0:y1, :x0] = FILL_COLOR
+            img2[y0:y1, x1:] = FILL_COLOR
+        self.landmarks = util.transform_points(self.landmarks, matrix).astype(
+            np.float32
         )
-        img2 = img2
-        self.landmarks = [
-            (int(x), int(y))
-            for x, y in util.scale_crop_points(
-                [(int(x), int(y)) for x, y in self.landmarks], crop_x, crop_y, scale
-            )
-        ]
         super().load_image(img2)
 
     def calc_pd(self) -> None:
@@ -571,8 +749,10 @@ class AnalyzeFace(ImageAnalysis):
         return util_get_pupils(self.landmarks)
 
     def dump_state(self) -> List[Any]:
+        # While streaming the image buffer is overwritten by the next frame.
+        img = self.original_img.copy() if self.reuse_buffers else self.original_img
         result: List[Any] = [
-            self.original_img,
+            img,
             self.headpose,
             self.landmarks,
             self.pupillary_distance,
@@ -582,12 +762,12 @@ class AnalyzeFace(ImageAnalysis):
         return copy.copy(result)
 
     def load_state(self, obj: List[Any]) -> None:
-        if not self.is_image_loaded():
+        if not self.is_image_loaded() or self.reuse_buffers:
             self.init_image(obj[0])
         else:
             self.original_img = obj[0][:]
         self.headpose = copy.copy(obj[1])
-        self.landmarks = copy.copy(obj[2])
+        self.landmarks = util.to_landmarks(obj[2]).copy()
         self.pupillary_distance = obj[3]
         self.pix2mm = obj[4]
         try:
@@ -599,12 +779,9 @@ class AnalyzeFace(ImageAnalysis):
         return util_get_pupils(self.landmarks)
 
     def calc_bisect(self) -> Any:
-        # Convert pupil coordinates to ints to match the expected type.
-        pupils: Tuple[Tuple[int, int], Tuple[int, int]] = (
-            (int(self.find_pupils()[0][0]), int(self.find_pupils()[0][1])),
-            (int(self.find_pupils()[1][0]), int(self.find_pupils()[1][1])),
-        )  # Explicitly type pupils
-        return util.bisecting_line_coordinates(img_size=1024, pupils=pupils)
+        return util.bisecting_line_coordinates(
+            img_size=1024, pupils=self.find_pupils()
+        )
 
     def draw_static(self) -> None:
         if self.lateral:
@@ -1,12 +1,12 @@
+import functools
 import math
 import os
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 from numpy.typing import NDArray
-from typing import Any, List, Optional, Tuple
 
 import cv2
 import numpy as np
-from dynaface.util import PolyArea
+from dynaface.util import Point, PolyArea, to_pixel
 
 COLORS = np.array(
     [
@@ -23,6 +23,49 @@ COLORS = np.array(
 )
 CLUST_NUM = 3
 USE_HSV = False
+MAX_STREAM_BUFFERS = 4  # Distinct frame sizes kept while streaming
+TEXT_SIZE_CACHE = 4096  # Text layouts kept by text_size()
+
+# Drawing calls recorded by ImageAnalysis.record(): (method, args, kwargs)
+DrawingLog = List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def recorded(method: F) -> F:
+    """
+    Mark a drawing method of ImageAnalysis as recordable. While recording,
+    the call is appended to the drawing log instead of drawn.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: "ImageAnalysis", *args: Any, **kwargs: Any) -> Any:
+        if self._draw_log is not None:
+            self._draw_log.append((method.__name__, args, kwargs))
+            return None
+        return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+@functools.lru_cache(maxsize=TEXT_SIZE_CACHE)
+def text_size(
+    txt: str, font: int, scale: float, thick: int
+) -> Tuple[Tuple[int, int], int]:
+    """
+    Cached cv2.getTextSize(), the overlay measures the same strings every frame.
+
+    Args:
+        txt (str): Text string.
+        font (int): OpenCV font face.
+        scale (float): Font scale.
+        thick (int): Text thickness.
+
+    Returns:
+        Tuple[Tuple[int, int], int]: Text size (width, height) and baseline.
+    """
+    (width, height), baseline = cv2.getTextSize(txt, font, scale, thick)
+    return (width, height), baseline
 
 
 def load_image(filename: str) -> NDArray[Any]:
@@ -56,6 +99,40 @@ class ImageAnalysis:
         self.width: int = 0
         self.height: int = 0
         self.shape: Tuple[int, ...] = (0, 0, 3)
+        self.reuse_buffers: bool = False
+        self._buffers: Dict[Tuple[Any, ...], Tuple[NDArray[Any], ...]] = {}
+        self._draw_log: Optional[DrawingLog] = None
+
+    def record(self, draw: Callable[[], Any]) -> Tuple[Any, DrawingLog]:
+        """
+        Run draw() with the drawing methods recorded instead of drawn.
+
+        The log can be drawn later, any number of times, with replay(). This
+        separates computing an overlay from rasterizing it.
+
+        Args:
+            draw (Callable[[], Any]): Function that draws on this image.
+
+        Returns:
+            Tuple[Any, DrawingLog]: The result of draw() and the drawing log.
+        """
+        log: DrawingLog = []
+        self._draw_log = log
+        try:
+            result = draw()
+        finally:
+            self._draw_log = None
+        return result, log
+
+    def replay(self, log: DrawingLog) -> None:
+        """
+        Draw a log made by record() onto render_img.
+
+        Args:
+            log (DrawingLog): The recorded drawing calls.
+        """
+        for name, args, kwargs in log:
+            getattr(self, name)(*args, **kwargs)
 
     def _check_image(self) -> None:
         """
@@ -102,6 +179,10 @@ class ImageAnalysis:
         Args:
             img (NDArray[Any]): Input image.
         """
+        if self.reuse_buffers:
+            self._init_image_buffers(img)
+            return
+
         self.original_img: NDArray[Any] = img.copy()
         self.gray_img: NDArray[Any] = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         self.render_img: NDArray[Any] = img.copy()
@@ -112,9 +193,62 @@ class ImageAnalysis:
 
         self.height, self.width = self.original_img.shape[:2]
 
+    def stream_buffers(
+        self, shape: Tuple[int, ...], dtype: Any
+    ) -> Tuple[NDArray[Any], ...]:
+        """
+        Get the preallocated buffers for a frame size while streaming.
+
+        Args:
+            shape (Tuple[int, ...]): Shape of the frame.
+            dtype (Any): Data type of the frame.
+
+        Returns:
+            Tuple[NDArray[Any], ...]: The original, gray, render, HSV (uint8) and
+            HSV (int64) buffers.
+        """
+        key = (tuple(shape), np.dtype(dtype).str)
+        buffers = self._buffers.get(key)
+        if buffers is None:
+            if len(self._buffers) >= MAX_STREAM_BUFFERS:
+                self._buffers.pop(next(iter(self._buffers)))
+            buffers = (
+                np.empty(shape, dtype=dtype),
+                np.empty(shape[:2], dtype=dtype),
+                np.empty(shape, dtype=dtype),
+                np.empty(shape, dtype=np.uint8),
+                np.empty(shape, dtype=np.int64),
+            )
+            self._buffers[key] = buffers
+        return buffers
+
+    def _init_image_buffers(self, img: NDArray[Any]) -> None:
+        """
+        Initialize the image into buffers that are reused from frame to frame.
+
+        Args:
+            img (NDArray[Any]): Input image.
+        """
+        original, gray, render, hsv, hsv64 = self.stream_buffers(img.shape, img.dtype)
+        if img is not original:
+            np.copyto(original, img)
+        cv2.cvtColor(original, cv2.COLOR_BGR2GRAY, dst=gray)
+        if render is not original:
+            np.copyto(render, original)
+        cv2.cvtColor(original, cv2.COLOR_RGB2HSV, dst=hsv)
+        np.copyto(hsv64, hsv)
+
+        self.original_img = original
+        self.gray_img = gray
+        self.render_img = render
+        self.original_hsv = hsv64
+        self.shape = original.shape
+        self.height, self.width = original.shape[:2]
+
+    @recorded
     def write_text(
         self,
-        pos: Tuple[int, int],
+        pos: Point,
         txt: str,
         color: Optional[Tuple[int, int, int]] = None,
         size: float = 1,
@@ -124,7 +258,7 @@ class ImageAnalysis:
         Write text on the image.
 
         Args:
-            pos (Tuple[int, int]): Position to place the text.
+            pos (Point): Position to place the text.
             txt (str): Text to write.
             color (Optional[Tuple[int, int, int]]): Text color, defaults to white.
             size (float): Scaling factor for text size.
@@ -133,6 +267,7 @@ class ImageAnalysis:
 
         size = self.text_size * size
         thick = int(self.text_thick * thick)
+        pos = to_pixel(pos)
         if color is None:
             color = self.text_color
 
@@ -146,16 +281,6 @@ class ImageAnalysis:
             thick + self.text_back,
             cv2.LINE_AA,
         )
-        cv2.putText(
-            self.render_img,
-            txt,
-            pos,
-            self.text_font,
-            size,
-            (0, 0, 0),
-            thick + self.text_back,
-            cv2.LINE_AA,
-        )
 
         cv2.putText(
             self.render_img,
@@ -168,6 +293,35 @@ class ImageAnalysis:
             cv2.LINE_AA,
         )
 
+    @recorded
+    def write_text_right(
+        self,
+        y: float,
+        txt: str,
+        margin: int = 5,
+        color: Optional[Tuple[int, int, int]] = None,
+        size: float = 1,
+        thick: int = 1,
+    ) -> None:
+        """
+        Write text right-aligned against the right edge of the image.
+
+        The x position is computed when drawing, so a recorded call is laid
+        out for the text size in effect at replay.
+
+        Args:
+            y (float): Baseline of the text.
+            txt (str): Text to write.
+            margin (int): Gap between the text and the right edge.
+            color (Optional[Tuple[int, int, int]]): Text color, defaults to white.
+            size (float): Scaling factor for text size.
+            thick (int): Thickness of the text.
+        """
+        m = self.calc_text_size(txt, size, thick)
+        self.write_text(
+            (self.width - (m[0][0] + margin), y), txt, color, size, thick
+        )
+
     def calc_text_size(
         self, txt: str, size: float = 1, thick: int = 1
     ) -> Tuple[Tuple[int, int], int]:
@@ -185,13 +339,12 @@ class ImageAnalysis:
         self._check_image()
         size = self.text_size * size
         thick = int(self.text_thick * thick)
-        textSize, baseline = cv2.getTextSize(txt, self.text_font, size, thick)
-        width, height = textSize
-        return ((width, height), baseline)
+        return text_size(txt, self.text_font, size, thick)
 
+    @recorded
     def write_text_sq(
         self,
-        pos: Tuple[int, int],
+        pos: Point,
         txt: str,
         color: Optional[Tuple[int, int, int]] = None,
         mark: str = "2",
@@ -201,13 +354,14 @@ class ImageAnalysis:
         Write text with a square marker on the image.
 
         Args:
-            pos (Tuple[int, int]): Position to place the text.
+            pos (Point): Position to place the text.
             txt (str): Text to write.
             color (Optional[Tuple[int, int, int]]): Text color.
             mark (str): Marker character.
             up (int): Upward offset for the marker.
         """
         self._check_image()
+        pos = to_pixel(pos)
         if color is None:
             color = self.text_color
 
@@ -221,7 +375,7 @@ class ImageAnalysis:
             self.text_thick + self.text_back,
             cv2.LINE_AA,
         )
-        w1 = cv2.getTextSize(
+        w1 = text_size(
             txt, self.text_font, self.text_size, self.text_thick + self.text_back
         )[0][0]
 
@@ -235,7 +389,6 @@ class ImageAnalysis:
             self.text_thick,
             cv2.LINE_AA,
         )
-        cv2.getTextSize(txt, self.text_font, self.text_size, self.text_thick)[0][0]
 
         cv2.putText(
             self.render_img,
@@ -259,6 +412,7 @@ class ImageAnalysis:
             cv2.LINE_AA,
         )
 
+    @recorded
     def hline(
         self,
         y: int,
@@ -282,8 +436,9 @@ class ImageAnalysis:
             x1 = 0
         if not x2:
             x2 = self.render_img.shape[0]
-        cv2.line(self.render_img, (x1, y), (x2, y), color, width)
+        cv2.line(self.render_img, to_pixel((x1, y)), to_pixel((x2, y)), color, width)
 
+    @recorded
     def vline(
         self,
         x: int,
@@ -306,11 +461,12 @@ class ImageAnalysis:
             y1 = 0
         if not y2:
             y2 = self.render_img.shape[1]
-        cv2.line(self.render_img, (x, y1), (x, y2), color, width)
+        cv2.line(self.render_img, to_pixel((x, y1)), to_pixel((x, y2)), color, width)
 
+    @recorded
     def circle(
         self,
-        pt: Tuple[int, int],
+        pt: Point,
         color: Tuple[int, int, int] = (0, 0, 255),
         radius: Optional[int] = None,
     ) -> None:
@@ -318,14 +474,14 @@ class ImageAnalysis:
         Draw a circle on the image.
 
         Args:
-            pt (Tuple[int, int]): Center point.
+            pt (Point): Center point.
             color (Tuple[int, int, int]): Circle color.
             radius (Optional[int]): Circle radius.
         """
         self._check_image()
         if radius is None:
             radius = int(self.render_img.shape[0] // 200)
-        cv2.circle(self.render_img, pt, radius, color, -1)
+        cv2.circle(self.render_img, to_pixel(pt), radius, color, -1)
 
     def render_reset(self) -> None:
         """
@@ -405,15 +561,8 @@ class ImageAnalysis:
         :return: The computed area of the polygon.
         """
         self._check_image()
-        # Create an integer numpy array for rendering.
-        contours_arr = np.array(contours, dtype=np.int32)
-
         if render:
-            overlay = self.render_img.copy()
-            cv2.fillPoly(overlay, pts=[contours_arr], color=color)
-            self.render_img[:, :] = cv2.addWeighted(
-                overlay, alpha, self.render_img, 1 - alpha, 0
-            ).astype(self.render_img.dtype)
+            self.fill_polygon(contours, alpha, color)
 
         # Create a separate float array for area measurement.
         scaled_contours = np.array(contours, dtype=np.float64) * pix2mm
@@ -422,10 +571,39 @@ class ImageAnalysis:
 
         return float(PolyArea(x, y))
 
+    @recorded
+    def fill_polygon(
+        self,
+        contours: List[Tuple[int, int]],
+        alpha: float = 0.4,
+        color: Tuple[int, int, int] = (0, 0, 255),
+    ) -> None:
+        """
+        Blends a filled polygon over the image.
+
+        :param contours: A list of points defining the polygon.
+        :param alpha: Opacity of the fill.
+        :param color: Color of the fill.
+        """
+        # Round to pixels for rendering only, the area uses the exact points.
+        contours_arr = np.rint(np.asarray(contours, dtype=np.float64)).astype(np.int32)
+
+        # Only the bounding box of the polygon changes, blend just that
+        x, y, w, h = cv2.boundingRect(contours_arr)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + w, self.render_img.shape[1])
+        y1 = min(y + h, self.render_img.shape[0])
+        if x0 < x1 and y0 < y1:
+            region = self.render_img[y0:y1, x0:x1]
+            overlay = region.copy()
+            cv2.fillPoly(overlay, pts=[contours_arr - (x0, y0)], color=color)
+            cv2.addWeighted(overlay, alpha, region, 1 - alpha, 0, dst=region)
+
+    @recorded
     def line(
         self,
-        pt1: Tuple[int, int],
-        pt2: Tuple[int, int],
+        pt1: Point,
+        pt2: Point,
         color: Tuple[int, int, int] = (255, 0, 0),
         thickness: int = 3,
     ) -> None:
@@ -438,10 +616,10 @@ class ImageAnalysis:
         :param thickness: Thickness of the line.
         """
         self._check_image()
-        cv2.line(self.render_img, pt1, pt2, color, thickness)
+        cv2.line(self.render_img, to_pixel(pt1), to_pixel(pt2), color, thickness)
 
     def arrow_head(
-        self, pt1: Tuple[int, int], pt2: Tuple[int, int], par: int = 15
+        self, pt1: Point, pt2: Point, par: int = 15
     ) -> None:
         """
         Draws an arrowhead at the end of a line.
@@ -471,10 +649,11 @@ class ImageAnalysis:
             ),
         )
 
+    @recorded
     def arrow(
         self,
-        pt1: Tuple[int, int],
-        pt2: Tuple[int, int],
+        pt1: Point,
+        pt2: Point,
         color: Tuple[int, int, int] = (255, 0, 0),
         thickness: int = 3,
         apt1: bool = True,
@@ -0,0 +1,89 @@
+from typing import Any, Dict, Optional
+
+from numpy.typing import NDArray
+
+from dynaface.facial import AnalyzeFace
+from dynaface.image import DrawingLog
+
+
+class LayeredRenderer:
+    """
+    Renders an AnalyzeFace from three cached layers: the frame image, the
+    measure annotations and the landmarks.
+
+    The annotation layers are recorded drawing logs (see ImageAnalysis.record),
+    so they are computed once per frame and then only replayed: toggling a
+    layer or changing the text size redraws without running analyze() again.
+    Each layer is invalidated on its own; render() composites the base image
+    and the visible layers into render_img in one pass.
+    """
+
+    def __init__(self, face: AnalyzeFace) -> None:
+        """
+        Initialize the LayeredRenderer.
+
+        Args:
+            face (AnalyzeFace): The face to render, with its frame loaded.
+        """
+        self.face = face
+        self.show_measures: bool = True
+        self.show_landmarks: bool = False
+        self.landmark_numbers: bool = True
+        self.values: Optional[Dict[str, Any]] = None
+        self._measures: Optional[DrawingLog] = None
+        self._landmarks: Optional[DrawingLog] = None
+
+    def invalidate(self) -> None:
+        """
+        The frame changed (e.g. load_state()), every layer is stale.
+        """
+        self._measures = None
+        self._landmarks = None
+        self.values = None
+
+    def invalidate_measures(self) -> None:
+        """
+        The measure configuration changed, the annotation layer is stale.
+        """
+        self._measures = None
+        self.values = None
+
+    def measures_layer(self) -> DrawingLog:
+        """
+        The measure annotations of the frame, running analyze() if needed.
+
+        Returns:
+            DrawingLog: The recorded annotations.
+        """
+        if self._measures is None:
+            self.values, self._measures = self.face.record(self.face.analyze)
+        return self._measures
+
+    def landmarks_layer(self) -> DrawingLog:
+        """
+        The landmarks of the frame.
+
+        Returns:
+            DrawingLog: The recorded landmarks.
+        """
+        if self._landmarks is None:
+            _, self._landmarks = self.face.record(
+                lambda: self.face.draw_landmarks(numbers=self.landmark_numbers)
+            )
+        return self._landmarks
+
+    def render(self) -> NDArray[Any]:
+        """
+        Composite the base image and the visible layers into render_img.
+
+        Returns:
+            NDArray[Any]: The face's render_img.
+        """
+        face = self.face
+        face.render_reset()
+        if self.show_measures:
+            face.replay(self.measures_layer())
+        if self.show_landmarks:
+            face.replay(self.landmarks_layer())
+        face.draw_static()
+        return face.render_img
@@ -328,14 +328,10 @@ class AnalyzeBrows(MeasureBase):
 
         diff = abs(left_brow[1] - right_brow[1]) * face.pix2mm
         txt = f"d.brow={diff:.2f} mm"
-        m: Any = face.calc_text_size(txt)
 
         if render and render2:
             face.arrow(face.landmarks[44], left_brow, apt2=False)
-            face.write_text(
-                (face.width - (m[0][0] + 5), min(left_brow[1], right_brow[1]) - 10),
-                txt,
-            )
+            face.write_text_right(min(left_brow[1], right_brow[1]) - 10, txt)
 
         return filter_measurements({"brow.d": diff}, self.items)
 
@@ -407,8 +403,8 @@ class AnalyzeDentalArea(MeasureBase):
                 contours_area, (p1, p2)
             )
 
-            contours_area_left = np.array(contours_area_left, dtype=int)
-            contours_area_right = np.array(contours_area_right, dtype=int)
+            contours_area_left = np.array(contours_area_left, dtype=np.float64)
+            contours_area_right = np.array(contours_area_right, dtype=np.float64)
 
             dental_area_right: float = face.measure_polygon(
                 contours_area_right,
@@ -631,8 +627,8 @@ class AnalyzePosition(MeasureBase):
 
         if p:
             landmarks: Any = face.landmarks
+            tilt = to_degrees(util.calculate_face_rotation(p))
             if render and render2_tilt:
-                tilt = to_degrees(util.calculate_face_rotation(p))
                 if face.face_rotation:
                     orig: float = to_degrees(face.face_rotation)
                     txt = f"tilt={round(orig,2)} -> {round(tilt,2)}"
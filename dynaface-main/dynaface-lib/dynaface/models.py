@@ -15,6 +15,7 @@ from dynaface.spiga.inference.framework import SPIGAFramework
 from dynaface.util import VERIFY_CERTS
 from facenet_pytorch import MTCNN  # type: ignore
 from facenet_pytorch.models.mtcnn import ONet, PNet, RNet  # type: ignore
+from numpy.typing import NDArray
 from rembg.sessions.u2net import U2netSession  # type: ignore
 from torch import nn
 from torch.nn.functional import interpolate  # type: ignore
@@ -233,8 +234,8 @@ def detect_device() -> str:
     return "cpu"
 
 
-def convert_landmarks(landmarks: Dict[str, Any]) -> List[List[Tuple[int, int]]]:
+def convert_landmarks(landmarks: Dict[str, Any]) -> List[NDArray[np.float32]]:
+    # Sub-pixel positions are kept, rounding happens only when drawing.
     return [
-        [(int(x[0]), int(x[1])) for x in np.array(landmark)]
-        for landmark in landmarks["landmarks"]
+        np.asarray(landmark, dtype=np.float32) for landmark in landmarks["landmarks"]
     ]
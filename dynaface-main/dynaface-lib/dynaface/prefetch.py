@@ -0,0 +1,204 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from numpy.typing import NDArray
+
+from dynaface.facial import DEFAULT_TILT_THRESHOLD, AnalyzeFace
+from dynaface.layers import LayeredRenderer
+from dynaface.measures import MeasureBase
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_CAPACITY = 48  # Rendered frames kept in the cache
+PREFETCH_MAX_AHEAD = 32  # Most frames rendered ahead of the playhead
+RENDER_TIME_DECAY = 0.2  # Weight of the newest render time in the average
+
+
+class FramePrefetcher:
+    """
+    Renders frame states ahead of the playhead on background threads.
+
+    Each worker thread owns an AnalyzeFace and draws the same layers as the
+    interactive view. Rendered frames are kept in a bounded LRU cache keyed
+    by frame index. The number of frames rendered ahead adapts to the
+    measured render time, so one render latency of playback is always
+    covered. Changing the render settings drops the cache; frames still in
+    flight for the old settings are discarded when they complete.
+    """
+
+    def __init__(
+        self,
+        frames: Sequence[List[Any]],
+        measures: List[MeasureBase],
+        fps: float,
+        tilt_threshold: float = DEFAULT_TILT_THRESHOLD,
+        capacity: int = PREFETCH_CAPACITY,
+        max_ahead: int = PREFETCH_MAX_AHEAD,
+        workers: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the FramePrefetcher.
+
+        Args:
+            frames (Sequence[List[Any]]): Frame states, as from dump_state().
+                Frames may be appended while prefetching.
+            measures (List[MeasureBase]): Measures to draw.
+            fps (float): Playback frame rate.
+            tilt_threshold (float): Tilt threshold of the worker faces.
+            capacity (int): Maximum number of rendered frames cached.
+            max_ahead (int): Maximum number of frames rendered ahead.
+            workers (Optional[int]): Render threads. Defaults to half the CPUs.
+        """
+        self.frames = frames
+        self.measures = measures
+        self.fps = float(fps) if fps and fps > 0 else 30.0
+        self.tilt_threshold = tilt_threshold
+        self.capacity = max(1, capacity)
+        self.max_ahead = max(1, min(max_ahead, self.capacity))
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.show_measures = True
+        self.show_landmarks = False
+        self.text_size = 0.75
+        self.render_time: Optional[float] = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[int, NDArray[Any]]" = OrderedDict()
+        self._pending: Dict[int, Future[Any]] = {}
+        self._generation = 0
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    @property
+    def ahead(self) -> int:
+        """
+        Number of frames to render ahead of the playhead.
+
+        Covers the frames shown during one render, plus one per worker so
+        every thread has a frame queued.
+
+        Returns:
+            int: Frames ahead, between the worker count and max_ahead.
+        """
+        if self.render_time is None:
+            return min(self.workers, self.max_ahead)
+        needed = math.ceil(self.render_time * self.fps) + self.workers
+        return max(1, min(needed, self.max_ahead))
+
+    def configure(
+        self, show_measures: bool, show_landmarks: bool, text_size: float
+    ) -> None:
+        """
+        Set what is drawn, dropping the cache if anything changed.
+
+        Args:
+            show_measures (bool): Draw the measure annotations.
+            show_landmarks (bool): Draw the landmarks.
+            text_size (float): Text size of the annotations.
+        """
+        settings = (show_measures, show_landmarks, text_size)
+        if settings != (self.show_measures, self.show_landmarks, self.text_size):
+            self.show_measures, self.show_landmarks, self.text_size = settings
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Drop all rendered frames, e.g. when the measure selection changed.
+        """
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+
+    def get(self, index: int) -> Optional[NDArray[Any]]:
+        """
+        Look up a rendered frame.
+
+        Args:
+            index (int): Frame index.
+
+        Returns:
+            Optional[NDArray[Any]]: The rendered image, or None if not ready.
+        """
+        with self._lock:
+            img = self._cache.get(index)
+            if img is not None:
+                self._cache.move_to_end(index)
+            return img
+
+    def prefetch(self, index: int, direction: int = 1) -> None:
+        """
+        Queue the frames from index up to `ahead` frames in the playback
+        direction, and cancel queued frames that fell outside that window.
+
+        Args:
+            index (int): The frame about to be shown.
+            direction (int): 1 for forward playback, -1 for backward.
+        """
+        step = 1 if direction >= 0 else -1
+        count = len(self.frames)
+        wanted = [
+            i for i in range(index, index + step * self.ahead, step) if 0 <= i < count
+        ]
+        with self._lock:
+            keep = set(wanted)
+            for i in [i for i in self._pending if i not in keep]:
+                if self._pending[i].cancel():
+                    del self._pending[i]
+            for i in wanted:
+                if i not in self._cache and i not in self._pending:
+                    self._pending[i] = self._pool.submit(
+                        self._render, i, self._generation
+                    )
+
+    def close(self) -> None:
+        """
+        Stop the render threads and release the cache.
+        """
+        self.invalidate()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _worker_renderer(self) -> LayeredRenderer:
+        renderer = getattr(self._local, "renderer", None)
+        if renderer is None:
+            face = AnalyzeFace(self.measures, tilt_threshold=self.tilt_threshold)
+            renderer = LayeredRenderer(face)
+            self._local.renderer = renderer
+        return renderer
+
+    def _render(self, index: int, generation: int) -> None:
+        start = time.perf_counter()
+        try:
+            renderer = self._worker_renderer()
+            renderer.face.text_size = self.text_size
+            renderer.face.load_state(self.frames[index])
+            renderer.invalidate()
+            renderer.show_measures = self.show_measures
+            renderer.show_landmarks = self.show_landmarks
+            img = renderer.render().copy()
+        except Exception:
+            logger.error(f"Error prefetching frame {index}", exc_info=True)
+            with self._lock:
+                if generation == self._generation:
+                    self._pending.pop(index, None)
+            return
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._pending.pop(index, None)
+            self._cache[index] = img
+            self._cache.move_to_end(index)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+            if self.render_time is None:
+                self.render_time = elapsed
+            else:
+                self.render_time += RENDER_TIME_DECAY * (elapsed - self.render_time)
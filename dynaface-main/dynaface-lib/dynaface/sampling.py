@@ -0,0 +1,175 @@
+import logging
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from dynaface import util
+from dynaface.util import Landmarks
+
+logger = logging.getLogger(__name__)
+
+MOTION_THRESHOLD = 0.02  # Keyframe landmark movement, fraction of the pupil distance
+DIFF_THRESHOLD = 4.0  # Mean absolute difference of consecutive thumbnails (0-255)
+THUMBNAIL_WIDTH = 64
+
+# (landmarks, headpose) of a frame
+Detection = Tuple[Landmarks, NDArray[np.float64]]
+
+
+class SampledFrame(NamedTuple):
+    """
+    A frame released by AdaptiveSampler, in stream order.
+
+    `landmarks` are in the coordinates the detector returned, and None when no
+    face was found. `detected` is False for interpolated frames.
+    """
+
+    frame: NDArray[Any]
+    landmarks: Optional[Landmarks]
+    headpose: Optional[NDArray[np.float64]]
+    detected: bool
+
+
+def _thumbnail(frame: NDArray[Any]) -> NDArray[np.float32]:
+    height, width = frame.shape[:2]
+    size = (THUMBNAIL_WIDTH, max(1, height * THUMBNAIL_WIDTH // max(1, width)))
+    thumb = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = thumb.mean(axis=2)
+    return thumb.astype(np.float32)
+
+
+class AdaptiveSampler:
+    """
+    Runs landmark detection on a subset of the frames of a stream.
+
+    Every `stride` frames a keyframe is detected. The frames between two
+    keyframes are held back until the second keyframe arrives; if the face
+    barely moved between the keyframes (landmark movement relative to the
+    pupil distance) and the frames did not change much (mean difference of
+    small thumbnails), their landmarks are interpolated linearly. Otherwise
+    there was a gesture and every frame of that interval is detected. At most
+    `stride` decoded frames are held at once. A stride of 1 detects every
+    frame.
+    """
+
+    def __init__(
+        self,
+        detect: Callable[[NDArray[Any]], Optional[Detection]],
+        stride: int,
+        motion_threshold: float = MOTION_THRESHOLD,
+        diff_threshold: float = DIFF_THRESHOLD,
+    ) -> None:
+        """
+        Initialize the AdaptiveSampler.
+
+        Args:
+            detect (Callable[[NDArray[Any]], Optional[Detection]]): Detects the
+                face of a frame, returning None if there is no face.
+            stride (int): Frames from one keyframe to the next.
+            motion_threshold (float): Keyframe movement, as a fraction of the
+                pupil distance, above which the interval is detected densely.
+            diff_threshold (float): Thumbnail difference above which the
+                interval is detected densely.
+        """
+        self.detect = detect
+        self.stride = max(1, int(stride))
+        self.motion_threshold = motion_threshold
+        self.diff_threshold = diff_threshold
+        self.detections = 0
+        self.frames = 0
+        self._key: Optional[Detection] = None
+        self._key_thumb: Optional[NDArray[np.float32]] = None
+        self._pending: List[Tuple[NDArray[Any], NDArray[np.float32]]] = []
+
+    def push(self, frame: NDArray[Any]) -> List[SampledFrame]:
+        """
+        Add the next frame of the stream.
+
+        Args:
+            frame (NDArray[Any]): The decoded frame.
+
+        Returns:
+            List[SampledFrame]: Frames whose landmarks are now known, in order.
+        """
+        self.frames += 1
+        if self.stride == 1:
+            return [self._detected(frame)]
+        thumb = _thumbnail(frame)
+        if self._key_thumb is None:
+            self._key_thumb = thumb
+            result = self._detected(frame)
+            self._key = self._detection(result)
+            return [result]
+        self._pending.append((frame, thumb))
+        if len(self._pending) < self.stride:
+            return []
+        return self._release()
+
+    def flush(self) -> List[SampledFrame]:
+        """
+        Release the frames still held back, at the end of the stream.
+
+        Returns:
+            List[SampledFrame]: The remaining frames, in order.
+        """
+        return self._release() if self._pending else []
+
+    def _detected(self, frame: NDArray[Any]) -> SampledFrame:
+        self.detections += 1
+        found = self.detect(frame)
+        if found is None:
+            return SampledFrame(frame, None, None, True)
+        landmarks, headpose = found
+        return SampledFrame(frame, landmarks, headpose, True)
+
+    def _detection(self, sample: SampledFrame) -> Optional[Detection]:
+        if sample.landmarks is None or sample.headpose is None:
+            return None
+        return (sample.landmarks, sample.headpose)
+
+    def _moved(self, start: Landmarks, end: Landmarks) -> bool:
+        if start.shape != end.shape:
+            return True
+        pd = float(np.linalg.norm(start[97] - start[96])) if len(start) > 97 else 0.0
+        if pd <= 0:
+            return True
+        movement = np.linalg.norm(end - start, axis=-1).max() / pd
+        return bool(movement > self.motion_threshold)
+
+    def _release(self) -> List[SampledFrame]:
+        pending, self._pending = self._pending, []
+        start = self._key
+        key_frame, key_thumb = pending[-1]
+        last = self._detected(key_frame)
+        self._key = end = self._detection(last)
+
+        thumbs = [thumb for _, thumb in pending]
+        previous, self._key_thumb = self._key_thumb, key_thumb
+        diff = np.inf
+        if previous is not None:
+            diff = max(
+                float(np.abs(b - a).mean()) if a.shape == b.shape else np.inf
+                for a, b in zip([previous] + thumbs, thumbs)
+            )
+        between = [frame for frame, _ in pending[:-1]]
+        if (
+            start is None
+            or end is None
+            or diff > self.diff_threshold
+            or self._moved(start[0], end[0])
+        ):
+            # A gesture (or a lost face) between the keyframes, detect densely
+            return [self._detected(frame) for frame in between] + [last]
+
+        count = len(pending)
+        result = []
+        for i, frame in enumerate(between, 1):
+            t = i / count
+            landmarks = util.to_landmarks((1 - t) * start[0] + t * end[0])
+            headpose = (1 - t) * np.asarray(start[1], dtype=np.float64)
+            headpose += t * np.asarray(end[1], dtype=np.float64)
+            result.append(SampledFrame(frame, landmarks, headpose, False))
+        return result + [last]
@@ -0,0 +1,297 @@
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.ndimage import uniform_filter1d
+from scipy.signal import filtfilt, savgol_coeffs, savgol_filter
+
+from dynaface.util import Landmarks
+
+SMOOTH_AVERAGE = "average"
+SMOOTH_EXPONENTIAL = "exponential"
+SMOOTH_ONE_EURO = "one-euro"
+SMOOTH_SAVGOL = "savitzky-golay"
+SMOOTHING_METHODS = [
+    SMOOTH_AVERAGE,
+    SMOOTH_EXPONENTIAL,
+    SMOOTH_ONE_EURO,
+    SMOOTH_SAVGOL,
+]
+
+DEFAULT_FPS = 30.0
+SAVGOL_ORDER = 2
+ONE_EURO_MIN_CUTOFF = 1.0  # Hz, smoothing of a still face
+ONE_EURO_BETA = 0.05  # Cutoff increase per pixel/second of movement
+ONE_EURO_D_CUTOFF = 1.0  # Hz, smoothing of the speed estimate
+
+
+class LandmarkFilter:
+    """
+    Causal filter over a stream of landmark arrays, one call per frame.
+
+    Each call takes the landmarks of the next frame, any array of (x, y)
+    points such as (98, 2), and returns the filtered landmarks as float32.
+    All points are filtered at once; the state is reset when the shape of the
+    input changes.
+    """
+
+    def __init__(self) -> None:
+        self._shape: Optional[Tuple[int, ...]] = None
+
+    def __call__(self, points: Any) -> Landmarks:
+        pts = np.asarray(points, dtype=np.float64)
+        if pts.shape != self._shape:
+            self.reset()
+            self._shape = pts.shape
+        return self._update(pts).astype(np.float32)
+
+    def reset(self) -> None:
+        """
+        Forget all previous frames.
+        """
+        self._shape = None
+
+    def _update(self, pts: NDArray[np.float64]) -> NDArray[np.float64]:
+        raise NotImplementedError
+
+
+class _RingBuffer:
+    """The last `window` frames in a preallocated (window, ...) array."""
+
+    def __init__(self, window: int, shape: Tuple[int, ...]) -> None:
+        self.data = np.zeros((window,) + shape, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+    def push(self, pts: NDArray[np.float64]) -> NDArray[np.float64]:
+        """Store a frame, returning the frame it replaced (zeros if none)."""
+        window = len(self.data)
+        old = self.data[self.head].copy()
+        self.data[self.head] = pts
+        self.head = (self.head + 1) % window
+        self.count = min(self.count + 1, window)
+        return np.asarray(old, dtype=np.float64)
+
+    def ordered(self) -> NDArray[np.float64]:
+        """The stored frames, oldest first."""
+        window = len(self.data)
+        if self.count < window:
+            return self.data[: self.count]
+        return self.data[(self.head + np.arange(window)) % window]
+
+
+class MovingAverageFilter(LandmarkFilter):
+    """
+    Mean of the last `window` frames, with a running sum so each frame costs
+    the same whatever the window size.
+    """
+
+    def __init__(self, window: int) -> None:
+        super().__init__()
+        self.window = max(1, int(window))
+        self._ring: Optional[_RingBuffer] = None
+        self._sum: NDArray[np.float64] = np.zeros(0)
+
+    def reset(self) -> None:
+        super().reset()
+        self._ring = None
+
+    def _update(self, pts: NDArray[np.float64]) -> NDArray[np.float64]:
+        if self._ring is None:
+            self._ring = _RingBuffer(self.window, pts.shape)
+            self._sum = np.zeros_like(pts)
+        self._sum += pts - self._ring.push(pts)
+        if self._ring.head == 0:
+            # Recompute once per wrap so rounding errors cannot accumulate
+            self._sum = self._ring.data.sum(axis=0)
+        return self._sum / self._ring.count
+
+
+class ExponentialFilter(LandmarkFilter):
+    """
+    Exponential moving average, y = alpha * x + (1 - alpha) * y.
+    """
+
+    def __init__(self, alpha: float) -> None:
+        super().__init__()
+        self.alpha = float(alpha)
+        self._value: Optional[NDArray[np.float64]] = None
+
+    @classmethod
+    def from_window(cls, window: int) -> "ExponentialFilter":
+        """
+        An exponential filter with the same center of mass as a moving
+        average of `window` frames.
+        """
+        return cls(2.0 / (max(1, int(window)) + 1))
+
+    def reset(self) -> None:
+        super().reset()
+        self._value = None
+
+    def _update(self, pts: NDArray[np.float64]) -> NDArray[np.float64]:
+        if self._value is None:
+            self._value = pts.copy()
+        else:
+            self._value += self.alpha * (pts - self._value)
+        return self._value
+
+
+def _smoothing_factor(cutoff: Any, freq: float) -> Any:
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau * freq)
+
+
+class OneEuroFilter(LandmarkFilter):
+    """
+    One-Euro filter (Casiez et al., 2012): a low-pass filter whose cutoff
+    rises with the speed of each point, so a still face is smoothed heavily
+    while fast movement is followed with little lag.
+    """
+
+    def __init__(
+        self,
+        freq: float = DEFAULT_FPS,
+        min_cutoff: float = ONE_EURO_MIN_CUTOFF,
+        beta: float = ONE_EURO_BETA,
+        d_cutoff: float = ONE_EURO_D_CUTOFF,
+    ) -> None:
+        super().__init__()
+        self.freq = float(freq) if freq and freq > 0 else DEFAULT_FPS
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._value: Optional[NDArray[np.float64]] = None
+        self._speed: NDArray[np.float64] = np.zeros(0)
+
+    def reset(self) -> None:
+        super().reset()
+        self._value = None
+
+    def _update(self, pts: NDArray[np.float64]) -> NDArray[np.float64]:
+        if self._value is None:
+            self._value = pts.copy()
+            self._speed = np.zeros_like(pts)
+            return self._value
+
+        speed = (pts - self._value) * self.freq
+        self._speed += _smoothing_factor(self.d_cutoff, self.freq) * (
+            speed - self._speed
+        )
+        cutoff = self.min_cutoff + self.beta * np.abs(self._speed)
+        self._value += _smoothing_factor(cutoff, self.freq) * (pts - self._value)
+        return self._value
+
+
+class SavitzkyGolayFilter(LandmarkFilter):
+    """
+    Causal Savitzky-Golay filter: a polynomial of degree `order` is fitted to
+    the last `window` frames and evaluated at the newest one. It follows
+    steady movement without the lag of a moving average of the same window.
+    """
+
+    def __init__(self, window: int, order: int = SAVGOL_ORDER) -> None:
+        super().__init__()
+        self.window = max(1, int(window))
+        self.order = order
+        self._ring: Optional[_RingBuffer] = None
+        self._coeffs: Dict[int, NDArray[np.float64]] = {}
+
+    def reset(self) -> None:
+        super().reset()
+        self._ring = None
+
+    def _coefficients(self, count: int) -> Optional[NDArray[np.float64]]:
+        if count <= self.order:
+            return None
+        coeffs = self._coeffs.get(count)
+        if coeffs is None:
+            coeffs = savgol_coeffs(count, self.order, pos=count - 1, use="dot")
+            self._coeffs[count] = coeffs
+        return coeffs
+
+    def _update(self, pts: NDArray[np.float64]) -> NDArray[np.float64]:
+        if self._ring is None:
+            self._ring = _RingBuffer(self.window, pts.shape)
+        self._ring.push(pts)
+        frames = self._ring.ordered()
+        coeffs = self._coefficients(len(frames))
+        if coeffs is None:
+            # Too few frames for the fit yet
+            return np.asarray(frames.mean(axis=0), dtype=np.float64)
+        return np.tensordot(coeffs, frames, axes=1)
+
+
+def create_filter(
+    method: str, window: int, fps: float = DEFAULT_FPS
+) -> LandmarkFilter:
+    """
+    Create a causal landmark filter.
+
+    Args:
+        method (str): One of SMOOTHING_METHODS.
+        window (int): Number of frames the filter spans. For the One-Euro
+            filter, which has no window, it scales the minimum cutoff.
+        fps (float): Frame rate of the stream.
+
+    Returns:
+        LandmarkFilter: The filter, ready for the first frame.
+    """
+    window = max(1, int(window))
+    if method == SMOOTH_AVERAGE:
+        return MovingAverageFilter(window)
+    if method == SMOOTH_EXPONENTIAL:
+        return ExponentialFilter.from_window(window)
+    if method == SMOOTH_ONE_EURO:
+        return OneEuroFilter(fps, min_cutoff=ONE_EURO_MIN_CUTOFF * 2 / (window + 1))
+    if method == SMOOTH_SAVGOL:
+        return SavitzkyGolayFilter(window)
+    raise ValueError(f"Unknown smoothing method: {method}")
+
+
+def smooth_offline(
+    landmarks: Any, method: str, window: int, fps: float = DEFAULT_FPS
+) -> Landmarks:
+    """
+    Zero-phase smoothing of a whole clip that is already loaded.
+
+    Unlike the causal filters, every frame is smoothed using the frames both
+    before and after it, so the result does not lag behind the movement.
+
+    Args:
+        landmarks (Any): Array of shape (frames, points, 2).
+        method (str): One of SMOOTHING_METHODS.
+        window (int): Number of frames the filter spans.
+        fps (float): Frame rate of the clip.
+
+    Returns:
+        Landmarks: float32 array of the same shape.
+    """
+    data = np.asarray(landmarks, dtype=np.float64)
+    frames = len(data)
+    window = min(max(1, int(window)), frames)
+    if frames < 2 or window < 2:
+        return data.astype(np.float32)
+
+    if method == SMOOTH_AVERAGE:
+        # A centered moving average is symmetric, hence zero-phase
+        result = uniform_filter1d(data, window, axis=0, mode="nearest")
+    elif method == SMOOTH_EXPONENTIAL:
+        alpha = 2.0 / (window + 1)
+        padlen = min(3 * window, frames - 1)
+        result = filtfilt([alpha], [1.0, alpha - 1.0], data, axis=0, padlen=padlen)
+    elif method == SMOOTH_SAVGOL:
+        order = min(SAVGOL_ORDER, window - 1)
+        result = savgol_filter(data, window, order, axis=0, mode="interp")
+    elif method == SMOOTH_ONE_EURO:
+        # A forward and a backward pass lag in opposite directions, their
+        # mean cancels the lag out
+        forward = create_filter(method, window, fps)
+        backward = create_filter(method, window, fps)
+        ahead = np.stack([forward(frame) for frame in data])
+        behind = np.stack([backward(frame) for frame in data[::-1]])[::-1]
+        result = (ahead.astype(np.float64) + behind) / 2
+    else:
+        raise ValueError(f"Unknown smoothing method: {method}")
+    return np.asarray(result, dtype=np.float32)
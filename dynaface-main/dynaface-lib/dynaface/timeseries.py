@@ -0,0 +1,490 @@
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+# facial first: importing measures on its own is circular, and spawned scan
+# workers import this module fresh
+from dynaface.facial import AnalyzeFace  # isort: skip
+import dynaface.measures
+from dynaface.measures import MeasureBase
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 256
+SCAN_CHUNK = 256  # Frames per worker task of scan_frames()
+
+ARGMAX = "argmax"
+ARGMIN = "argmin"
+
+
+class Reduction(NamedTuple):
+    """
+    A search over the frames: the frame where the sum of `items` is largest
+    (ARGMAX) or smallest (ARGMIN).
+    """
+
+    items: Tuple[str, ...]
+    op: str = ARGMAX
+
+
+class MeasureTable:
+    """
+    Columnar cache of measurement values over a sequence of frame states.
+
+    Every measure item is stored as one float array indexed by frame, so a
+    whole-clip pass of load_state()/analyze() happens once per video instead of
+    once per consumer. Rows are computed lazily by sync() and new frames are
+    appended incrementally. The table is rebuilt when the measure
+    configuration changes. Frames without a face are stored as NaN.
+    """
+
+    def __init__(self, measures: Optional[List[MeasureBase]] = None) -> None:
+        """
+        Initialize the MeasureTable.
+
+        Args:
+            measures (Optional[List[MeasureBase]]): Measures to tabulate. Defaults
+                to all measures, fully enabled.
+        """
+        if measures is None:
+            measures = dynaface.measures.all_measures()
+        self._measures: List[MeasureBase] = measures
+        self._face: AnalyzeFace = AnalyzeFace(self._measures)
+        self._lock = threading.RLock()
+        self._items: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._data: NDArray[np.float64] = np.empty((0, 0), dtype=np.float64)
+        self._rows: int = 0
+        self._source: Optional[int] = None
+        self._signature: Optional[Tuple[Any, ...]] = None
+        # Results of scans run while the table was not current, see find()
+        self._scan_source: Optional[Tuple[Any, ...]] = None
+        self._scans: Dict[Tuple[Any, ...], Dict[str, int]] = {}
+
+    @property
+    def items(self) -> List[str]:
+        """
+        Names of the measure items held by the table.
+
+        Returns:
+            List[str]: Item names, in measure order.
+        """
+        return [item.name for m in self._measures for item in m.items]
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _config_signature(self) -> Tuple[Any, ...]:
+        """
+        Build a hashable description of everything that affects the values.
+        """
+        return (
+            AnalyzeFace.pd,
+            tuple(
+                (
+                    type(m).__name__,
+                    m.enabled,
+                    tuple((item.name, item.enabled) for item in m.items),
+                )
+                for m in self._measures
+            ),
+        )
+
+    def invalidate(self) -> None:
+        """
+        Discard all cached rows, they are recomputed on the next sync().
+        """
+        with self._lock:
+            self._items = self.items
+            self._index = {name: i for i, name in enumerate(self._items)}
+            self._data = np.full(
+                (len(self._items), INITIAL_CAPACITY), np.nan, dtype=np.float64
+            )
+            self._rows = 0
+            self._signature = self._config_signature()
+
+    def _reserve(self, rows: int) -> None:
+        capacity = self._data.shape[1]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        data = np.full((len(self._items), capacity), np.nan, dtype=np.float64)
+        data[:, : self._rows] = self._data[:, : self._rows]
+        self._data = data
+
+    def _calc_row(self, state: List[Any], row: int) -> None:
+        self._face.load_state(state)
+        rec = self._face.analyze(render=False)
+        if not rec:
+            return
+        for name, value in rec.items():
+            idx = self._index.get(name)
+            if idx is not None and value is not None:
+                self._data[idx, row] = value
+
+    def sync(self, frames: Sequence[List[Any]]) -> int:
+        """
+        Make sure the table holds a row for every frame.
+
+        Only frames added since the last call are analyzed. The table is
+        rebuilt if a different frame list is passed or the measure
+        configuration changed.
+
+        Args:
+            frames (Sequence[List[Any]]): Frame states from AnalyzeFace.dump_state().
+
+        Returns:
+            int: The number of rows in the table.
+        """
+        with self._lock:
+            if (
+                self._source != id(frames)
+                or self._signature != self._config_signature()
+                or self._rows > len(frames)
+            ):
+                logger.debug("Measure table invalidated")
+                self.invalidate()
+                self._source = id(frames)
+
+            count = len(frames)
+            if count > self._rows:
+                self._reserve(count)
+                for row in range(self._rows, count):
+                    self._calc_row(frames[row], row)
+                    self._rows = row + 1
+            return self._rows
+
+    def column(
+        self, name: str, begin: int = 0, end: Optional[int] = None
+    ) -> NDArray[np.float64]:
+        """
+        Return the values of one measure item for a range of frames.
+
+        Args:
+            name (str): The measure item name.
+            begin (int): First frame of the range.
+            end (Optional[int]): End of the range (exclusive). Defaults to all rows.
+
+        Returns:
+            NDArray[np.float64]: A copy of the values, NaN where unavailable.
+
+        Raises:
+            KeyError: If the item is not held by the table.
+        """
+        with self._lock:
+            if name not in self._index:
+                raise KeyError(name)
+            if end is None or end > self._rows:
+                end = self._rows
+            return self._data[self._index[name], begin:end].copy()
+
+    def columns(
+        self, names: List[str], begin: int = 0, end: Optional[int] = None
+    ) -> Dict[str, NDArray[np.float64]]:
+        """
+        Return several measure item columns for a range of frames.
+
+        Args:
+            names (List[str]): The measure item names, unknown names are skipped.
+            begin (int): First frame of the range.
+            end (Optional[int]): End of the range (exclusive). Defaults to all rows.
+
+        Returns:
+            Dict[str, NDArray[np.float64]]: Item name to values.
+        """
+        with self._lock:
+            return {
+                name: self.column(name, begin, end)
+                for name in names
+                if name in self._index
+            }
+
+    def _is_current(self, frames: Sequence[List[Any]]) -> bool:
+        return (
+            self._source == id(frames)
+            and self._rows == len(frames)
+            and self._signature == self._config_signature()
+        )
+
+    def find(
+        self,
+        frames: Sequence[List[Any]],
+        reductions: Dict[str, Reduction],
+        begin: int = 0,
+        end: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Run several frame searches over a range of frames in one pass.
+
+        If the table already holds every frame the cached columns are
+        searched. Otherwise the frames are scanned with scan_frames(), which
+        computes only the measures the searches need and does not fill the
+        table; the result is kept until the frames or the measure
+        configuration change, so repeating a search does not rescan.
+
+        Args:
+            frames (Sequence[List[Any]]): Frame states from AnalyzeFace.dump_state().
+            reductions (Dict[str, Reduction]): Searches, by result name.
+            begin (int): First frame of the range.
+            end (Optional[int]): End of the range (exclusive). Defaults to all frames.
+
+        Returns:
+            Dict[str, int]: Result name to frame index (counted from the first
+            frame, not from begin), or -1 if no frame has a value.
+        """
+        _check_reductions(reductions)
+        with self._lock:
+            if self._is_current(frames):
+                names = sorted({item for r in reductions.values() for item in r.items})
+                cols = self.columns(names, begin, end)
+                return {
+                    key: _offset(_search(cols, r), begin)
+                    for key, r in reductions.items()
+                }
+            source = (id(frames), len(frames), self._config_signature())
+            if self._scan_source != source:
+                self._scan_source = source
+                self._scans = {}
+            key = (begin, end, tuple(sorted(reductions.items())))
+            found = self._scans.get(key)
+        if found is None:
+            found = scan_frames(
+                frames, reductions, begin, end, measures=self._measures
+            )
+            with self._lock:
+                if self._scan_source == source:
+                    self._scans[key] = found
+        return dict(found)
+
+    def values(
+        self, frames: Sequence[List[Any]], row: int, names: List[str]
+    ) -> Dict[str, float]:
+        """
+        Measure item values of one frame, from the table if it holds the frame.
+
+        Args:
+            frames (Sequence[List[Any]]): Frame states from AnalyzeFace.dump_state().
+            row (int): The frame.
+            names (List[str]): The measure item names.
+
+        Returns:
+            Dict[str, float]: Item name to value, NaN where unavailable.
+        """
+        with self._lock:
+            if self._is_current(frames):
+                return {
+                    name: float(self._data[self._index[name], row])
+                    if name in self._index
+                    else np.nan
+                    for name in names
+                }
+            self._face.load_state(frames[row])
+            rec = self._face.analyze(render=False) or {}
+        return {
+            name: np.nan if rec.get(name) is None else float(rec[name])
+            for name in names
+        }
+
+
+def nanargmax(values: NDArray[np.float64]) -> int:
+    """
+    Index of the largest value, ignoring NaN.
+
+    Args:
+        values (NDArray[np.float64]): The values to search.
+
+    Returns:
+        int: The index of the first maximum, or -1 if there is no valid value.
+    """
+    if len(values) == 0 or bool(np.all(np.isnan(values))):
+        return -1
+    return int(np.nanargmax(values))
+
+
+def nanargmin(values: NDArray[np.float64]) -> int:
+    """
+    Index of the smallest value, ignoring NaN.
+
+    Args:
+        values (NDArray[np.float64]): The values to search.
+
+    Returns:
+        int: The index of the first minimum, or -1 if there is no valid value.
+    """
+    if len(values) == 0 or bool(np.all(np.isnan(values))):
+        return -1
+    return int(np.nanargmin(values))
+
+
+def _check_reductions(reductions: Dict[str, Reduction]) -> None:
+    for key, reduction in reductions.items():
+        if not reduction.items:
+            raise ValueError(f"Reduction {key!r} has no items")
+        if reduction.op not in (ARGMAX, ARGMIN):
+            raise ValueError(f"Unknown reduction: {reduction.op}")
+
+
+def _search(cols: Dict[str, NDArray[np.float64]], reduction: Reduction) -> int:
+    if any(item not in cols for item in reduction.items):
+        return -1
+    values = np.sum(np.stack([cols[item] for item in reduction.items]), axis=0)
+    if reduction.op == ARGMAX:
+        return nanargmax(values)
+    return nanargmin(values)
+
+
+def _offset(idx: int, begin: int) -> int:
+    return -1 if idx == -1 else begin + idx
+
+
+def scan_chunk(
+    frames: Sequence[List[Any]],
+    reductions: Dict[str, Reduction],
+    measures: List[MeasureBase],
+    offset: int = 0,
+) -> Dict[str, Tuple[float, int]]:
+    """
+    Map step of scan_frames(): analyze a chunk of frames and search it.
+
+    Runs in a worker, with its own AnalyzeFace, so it only takes picklable
+    arguments and can be submitted to a thread or a process pool.
+
+    Args:
+        frames (Sequence[List[Any]]): The frame states of the chunk.
+        reductions (Dict[str, Reduction]): Searches, by result name.
+        measures (List[MeasureBase]): Measures to draw the items from.
+        offset (int): Index of the first frame of the chunk in the clip.
+
+    Returns:
+        Dict[str, Tuple[float, int]]: Result name to the best value and its
+        frame index, or (NaN, -1) if no frame of the chunk has a value.
+    """
+    face = AnalyzeFace(measures)
+    names = sorted({item for r in reductions.values() for item in r.items})
+    data = np.full((len(names), len(frames)), np.nan, dtype=np.float64)
+    for row, state in enumerate(frames):
+        face.load_state(state)
+        rec = face.analyze(render=False)
+        if not rec:
+            continue
+        for i, name in enumerate(names):
+            value = rec.get(name)
+            if value is not None:
+                data[i, row] = value
+    cols = dict(zip(names, data))
+    result = {}
+    for key, reduction in reductions.items():
+        idx = _search(cols, reduction)
+        if idx == -1:
+            result[key] = (np.nan, -1)
+        else:
+            value = np.sum([cols[item][idx] for item in reduction.items])
+            result[key] = (float(value), offset + idx)
+    return result
+
+
+def merge_scans(
+    parts: List[Dict[str, Tuple[float, int]]], reductions: Dict[str, Reduction]
+) -> Dict[str, int]:
+    """
+    Reduce step of scan_frames(): merge per-chunk results.
+
+    Args:
+        parts (List[Dict[str, Tuple[float, int]]]): Results of scan_chunk(),
+            in frame order.
+        reductions (Dict[str, Reduction]): The searches the chunks ran.
+
+    Returns:
+        Dict[str, int]: Result name to frame index, or -1 if no frame has a value.
+        Ties go to the earliest frame.
+    """
+    result = {}
+    for key, reduction in reductions.items():
+        best_value, best = np.nan, -1
+        for part in parts:
+            value, idx = part[key]
+            if idx == -1:
+                continue
+            if (
+                best == -1
+                or (reduction.op == ARGMAX and value > best_value)
+                or (reduction.op == ARGMIN and value < best_value)
+            ):
+                best_value, best = value, idx
+        result[key] = best
+    return result
+
+
+def scan_frames(
+    frames: Sequence[List[Any]],
+    reductions: Dict[str, Reduction],
+    begin: int = 0,
+    end: Optional[int] = None,
+    measures: Optional[List[MeasureBase]] = None,
+    workers: Optional[int] = None,
+    chunk: int = SCAN_CHUNK,
+    executor: Optional[Executor] = None,
+) -> Dict[str, int]:
+    """
+    Parallel map/reduce search over frame states.
+
+    Only the measures that produce the searched items are computed. The
+    frame range is split into chunks that are mapped with scan_chunk() on a
+    pool of workers, and the per-chunk results are reduced with
+    merge_scans(). All searches share one pass over the frames. The
+    analysis is mostly Python, so threads contend for the GIL; pass a
+    ProcessPoolExecutor as executor to spread the chunks over CPUs instead.
+    Give it a "spawn" context: forked workers inherit the torch runtime of
+    the parent and can hang on exit.
+
+    Args:
+        frames (Sequence[List[Any]]): Frame states from AnalyzeFace.dump_state().
+        reductions (Dict[str, Reduction]): Searches, by result name.
+        begin (int): First frame of the range.
+        end (Optional[int]): End of the range (exclusive). Defaults to all frames.
+        measures (Optional[List[MeasureBase]]): Measures to draw the items from.
+            Defaults to all measures, fully enabled.
+        workers (Optional[int]): Worker threads when no executor is given.
+            Defaults to the number of CPUs less one; 1 scans on the calling
+            thread.
+        chunk (int): Frames per worker task.
+        executor (Optional[Executor]): Pool to map the chunks on. It is not
+            shut down.
+
+    Returns:
+        Dict[str, int]: Result name to frame index, or -1 if no frame has a value.
+    """
+    _check_reductions(reductions)
+    if measures is None:
+        measures = dynaface.measures.all_measures()
+    end = len(frames) if end is None else min(end, len(frames))
+    names = {item for r in reductions.values() for item in r.items}
+    needed = [m for m in measures if any(item.name in names for item in m.items)]
+    chunk = max(1, chunk)
+    bounds = [(b, min(b + chunk, end)) for b in range(begin, end, chunk)]
+
+    def submit(pool: Executor) -> List[Dict[str, Tuple[float, int]]]:
+        tasks = [
+            pool.submit(scan_chunk, frames[b:e], reductions, needed, b)
+            for b, e in bounds
+        ]
+        return [task.result() for task in tasks]
+
+    if executor is not None:
+        parts = submit(executor)
+    else:
+        workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        if workers == 1 or len(bounds) <= 1:
+            parts = [
+                scan_chunk(frames[b:e], reductions, needed, b) for b, e in bounds
+            ]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+                parts = submit(pool)
+    return merge_scans(parts, reductions)
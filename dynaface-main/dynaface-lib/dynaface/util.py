@@ -11,6 +11,13 @@ from PIL import Image
 
 Number = Union[int, float]
 
+# An (x, y) position, int or sub-pixel float. Drawing rounds it with to_pixel().
+Point = Tuple[Number, Number]
+
+# Landmarks are held as float32 arrays of shape (points, 2), or
+# (frames, points, 2) for a batch of frames.
+Landmarks = NDArray[np.float32]
+
 # Should request.get verify SSL certificates. The strict setting of True can cause this to
 # fail when run from corporate networks that intercept HTTPS traffic. Setting to True will
 # generally work on home networks. For a controlled server environment you will likely
@@ -74,43 +81,223 @@ def safe_clip(
     return new_image, new_x_start, new_y_start
 
 
+def to_landmarks(points: Any) -> Landmarks:
+    """
+    Convert points to the landmark array type.
+
+    Args:
+        points (Any): A list of (x, y) points, a list of such lists (one per
+            frame), or an array.
+
+    Returns:
+        Landmarks: float32 array of shape (points, 2) or (frames, points, 2).
+    """
+    arr = np.asarray(points, dtype=np.float32)
+    if arr.size == 0:
+        return arr.reshape(0, 2)
+    return arr
+
+
+def to_pixel(pt: Any) -> Tuple[int, int]:
+    """
+    Round a point to the nearest pixel. Landmarks keep their sub-pixel
+    position; this is only applied when drawing.
+
+    Args:
+        pt (Any): An (x, y) point, int or float.
+
+    Returns:
+        Tuple[int, int]: The rounded point.
+    """
+    return (int(round(float(pt[0]))), int(round(float(pt[1]))))
+
+
+def _to_int_tuples(points: NDArray[Any]) -> Any:
+    """Int tuples of a (points, 2) array, or nested lists of them per frame."""
+    if points.ndim > 2:
+        return [_to_int_tuples(frame) for frame in points]
+    return [(int(x), int(y)) for x, y in points.reshape(-1, 2).astype(np.int64).tolist()]
+
+
 def scale_crop_points(
-    lst: List[Tuple[int, int]], crop_x: int, crop_y: int, scale: float
-) -> List[Tuple[int, int]]:
+    lst: Any, crop_x: float, crop_y: float, scale: float
+) -> Any:
     """
-    Scales and crops a list of points.
+    Scales and crops points.
+
+    Args:
+        lst (Any): A list of (x, y) tuples, a list of such lists (one per
+            frame), or a landmark array of shape (..., points, 2).
+        crop_x (float): Left edge of the crop, in scaled coordinates.
+        crop_y (float): Top edge of the crop, in scaled coordinates.
+        scale (float): Scale factor.
+
+    Returns:
+        Any: For a list, a list of int tuples (truncated), one list per frame
+        for a list of frames. For an array, a float32 array of the same shape.
     """
-    lst2: List[Tuple[int, int]] = []
-    for pt in lst:
-        lst2.append((int((pt[0] * scale) - crop_x), int((pt[1] * scale) - crop_y)))
-    return lst2
+    pts = np.asarray(lst, dtype=np.float64)
+    result = pts * scale - np.array([crop_x, crop_y], dtype=np.float64)
+    if isinstance(lst, np.ndarray):
+        return result.astype(np.float32)
+    return _to_int_tuples(np.trunc(result))
 
 
 def rotate_crop_points(
-    points: List[Tuple[int, int]], center: Tuple[int, int], angle_degrees: float
-) -> List[Tuple[int, int]]:
+    points: Any, center: Tuple[float, float], angle_degrees: float
+) -> Any:
     """
     Rotate the points around the center by the specified angle.
+
+    Args:
+        points (Any): A list of (x, y) tuples, a list of such lists (one per
+            frame), or a landmark array of shape (..., points, 2).
+        center (Tuple[float, float]): Center of the rotation.
+        angle_degrees (float): Rotation angle in degrees.
+
+    Returns:
+        Any: For a list, a list of int tuples (rounded), one list per frame
+        for a list of frames. For an array, a float32 array of the same shape.
     """
     angle_radians = -np.deg2rad(angle_degrees)  # Negate for correct rotation direction
     cos_theta = np.cos(angle_radians)
     sin_theta = np.sin(angle_radians)
     rotation_matrix = np.array([[cos_theta, -sin_theta], [sin_theta, cos_theta]])
 
-    rotated_points: List[Tuple[int, int]] = []
-    for point in points:
-        vector = np.array(point) - np.array(center)
-        rotated_vector = np.dot(rotation_matrix, vector)
-        rotated_point = rotated_vector + np.array(center)
-        rotated_points.append(
-            (int(round(rotated_point[0])), int(round(rotated_point[1])))
-        )
+    c = np.asarray(center, dtype=np.float64)
+    rotated = (np.asarray(points, dtype=np.float64) - c) @ rotation_matrix.T + c
+    if isinstance(points, np.ndarray):
+        return rotated.astype(np.float32)
+    return _to_int_tuples(np.round(rotated))
+
 
-    return rotated_points
+def crop_transform(
+    center: Point,
+    angle_degrees: float,
+    scale: float,
+    crop_x: float,
+    crop_y: float,
+) -> NDArray[np.float64]:
+    """
+    Build the 2x3 affine matrix that rotates around the center (as
+    rotate_crop_points does), scales (as scale_crop_points does) and then
+    crops by translating by (-crop_x, -crop_y).
+
+    Args:
+        center (Point): Center of the rotation.
+        angle_degrees (float): Rotation angle in degrees.
+        scale (float): Scale factor applied after the rotation.
+        crop_x (float): Left edge of the crop, in scaled coordinates.
+        crop_y (float): Top edge of the crop, in scaled coordinates.
+
+    Returns:
+        NDArray[np.float64]: The matrix, usable with cv2.warpAffine().
+    """
+    rotation = cv2.getRotationMatrix2D(
+        (float(center[0]), float(center[1])), angle_degrees, 1.0
+    )
+    matrix: NDArray[np.float64] = np.asarray(rotation, dtype=np.float64) * scale
+    matrix[:, 2] -= np.array((crop_x, crop_y), dtype=np.float64)
+    return matrix
+
+
+def transform_points(points: Any, matrix: NDArray[Any]) -> NDArray[np.float64]:
+    """
+    Apply a 2x3 affine matrix to a set of points.
+
+    Args:
+        points (Any): Points as a sequence of (x, y) or an (n, 2) array.
+        matrix (NDArray[Any]): The 2x3 affine matrix.
+
+    Returns:
+        NDArray[np.float64]: The transformed (n, 2) points.
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return cast(NDArray[np.float64], pts @ matrix[:, :2].T + matrix[:, 2])
+
+
+def unrotate_window(
+    window: Tuple[int, int, int, int], shape: Tuple[int, ...], rotation: Optional[int]
+) -> Tuple[int, int, int, int]:
+    """
+    Map a window of a rotated image back to the image before the rotation.
+
+    cv2.rotate() of the returned window of the original image equals the
+    given window of cv2.rotate() of the whole image.
+
+    Args:
+        window (Tuple[int, int, int, int]): (x0, y0, x1, y1) in the rotated
+            image.
+        shape (Tuple[int, ...]): Shape of the original image.
+        rotation (Optional[int]): cv2.ROTATE_* code, or None for no rotation.
+
+    Returns:
+        Tuple[int, int, int, int]: (x0, y0, x1, y1) in the original image.
+    """
+    x0, y0, x1, y1 = window
+    height, width = shape[:2]
+    if rotation == cv2.ROTATE_90_CLOCKWISE:
+        return y0, height - x1, y1, height - x0
+    if rotation == cv2.ROTATE_90_COUNTERCLOCKWISE:
+        return width - y1, x0, width - y0, x1
+    if rotation == cv2.ROTATE_180:
+        return width - x1, height - y1, width - x0, height - y0
+    return window
+
+
+def rotate_points(points: Any, shape: Tuple[int, ...], rotation: Optional[int]) -> Any:
+    """
+    Map points of an image to the image rotated by cv2.rotate().
+
+    Args:
+        points (Any): Points of shape (..., 2), in pixel coordinates.
+        shape (Tuple[int, ...]): Shape of the image before the rotation.
+        rotation (Optional[int]): cv2.ROTATE_* code, or None for no rotation.
+
+    Returns:
+        Any: A float32 array of the points in the rotated image.
+    """
+    pts = np.asarray(points, dtype=np.float32)
+    height, width = shape[:2]
+    x, y = pts[..., 0], pts[..., 1]
+    if rotation == cv2.ROTATE_90_CLOCKWISE:
+        return np.stack([height - 1 - y, x], -1)
+    if rotation == cv2.ROTATE_90_COUNTERCLOCKWISE:
+        return np.stack([y, width - 1 - x], -1)
+    if rotation == cv2.ROTATE_180:
+        return np.stack([width - 1 - x, height - 1 - y], -1)
+    return pts.copy()
+
+
+def unrotate_points(
+    points: Any, shape: Tuple[int, ...], rotation: Optional[int]
+) -> Any:
+    """
+    Map points of an image rotated by cv2.rotate() back to the original image,
+    the inverse of rotate_points().
+
+    Args:
+        points (Any): Points of shape (..., 2) in the rotated image.
+        shape (Tuple[int, ...]): Shape of the image before the rotation.
+        rotation (Optional[int]): cv2.ROTATE_* code, or None for no rotation.
+
+    Returns:
+        Any: A float32 array of the points in the original image.
+    """
+    pts = np.asarray(points, dtype=np.float32)
+    height, width = shape[:2]
+    u, v = pts[..., 0], pts[..., 1]
+    if rotation == cv2.ROTATE_90_CLOCKWISE:
+        return np.stack([v, height - 1 - u], -1)
+    if rotation == cv2.ROTATE_90_COUNTERCLOCKWISE:
+        return np.stack([width - 1 - v, u], -1)
+    if rotation == cv2.ROTATE_180:
+        return np.stack([width - 1 - u, height - 1 - v], -1)
+    return pts.copy()
 
 
 def calculate_face_rotation(
-    pupil_coords: Tuple[Tuple[int, int], Tuple[int, int]],
+    pupil_coords: Tuple[Point, Point],
 ) -> float:
     """
     Calculate the rotation angle of a face based on the coordinates of the pupils.
@@ -127,10 +314,8 @@ def calculate_average_rgb(image: NDArray[Any]) -> Tuple[int, int, int]:
     """
     Calculate the average RGB value of an image.
     """
-    average_color_per_row = np.mean(image, axis=0)
-    average_color = np.mean(average_color_per_row, axis=0)
-    # Unpack exactly three channels to match the declared return type.
-    r, g, b = average_color
+    # cv2.mean avoids the float64 copy of the whole image np.mean makes.
+    r, g, b = cv2.mean(image)[:3]
     return int(r), int(g), int(b)
 
 
@@ -151,21 +336,15 @@ def straighten(image: NDArray[Any], angle_radians: float) -> NDArray[Any]:
     center = (w // 2, h // 2)
 
     rotation_matrix = cv2.getRotationMatrix2D(center, angle_degrees, 1.0)
-    rotated_image = cv2.warpAffine(image, rotation_matrix, (w, h))
-
     avg_rgb = calculate_average_rgb(image)
-    result_image = np.full_like(rotated_image, avg_rgb, dtype=np.uint8)
-
-    result_center = (result_image.shape[1] // 2, result_image.shape[0] // 2)
-    top_left_x = result_center[0] - center[0]
-    top_left_y = result_center[1] - center[1]
-    result_image[top_left_y : top_left_y + h, top_left_x : top_left_x + w] = (
-        rotated_image
+    return cv2.warpAffine(
+        image,
+        rotation_matrix,
+        (w, h),
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=avg_rgb,
     )
 
-    cropped_image = result_image[:h, :w]
-    return cropped_image
-
 
 def symmetry_ratio(a: float, b: float) -> float:
     """
@@ -185,21 +364,38 @@ def line_intersection(
     Return a list of (intersection_point, edge_index) for all edges in 'contour'
     that intersect with 'line'. Deduplicate near-identical points.
     """
-    intersections: List[Tuple[Tuple[int, int], int]] = []
-    for i in range(len(contour)):
-        p1 = contour[i]
-        p2 = contour[(i + 1) % len(contour)]
-        intersection = compute_intersection(line, (p1, p2))
-        if intersection is not None:
-            intersections.append(((int(intersection[0]), int(intersection[1])), i))
+    # All edges at once, same arithmetic as compute_intersection()
+    p1 = np.asarray(contour, dtype=np.float64).reshape(-1, 2)
+    p2 = np.roll(p1, -1, axis=0)
+    (lx1, ly1), (lx2, ly2) = line
+
+    xdiff0, ydiff0 = lx1 - lx2, ly1 - ly2
+    xdiff1 = p1[:, 0] - p2[:, 0]
+    ydiff1 = p1[:, 1] - p2[:, 1]
+    div = xdiff0 * ydiff1 - ydiff0 * xdiff1
+    d0 = lx1 * ly2 - ly1 * lx2
+    d1 = p1[:, 0] * p2[:, 1] - p1[:, 1] * p2[:, 0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (d0 * xdiff1 - d1 * xdiff0) / div
+        y = (d0 * ydiff1 - d1 * ydiff0) / div
+
+    hit = (
+        (div != 0)
+        & (np.minimum(p1[:, 0], p2[:, 0]) <= x)
+        & (x <= np.maximum(p1[:, 0], p2[:, 0]))
+        & (np.minimum(p1[:, 1], p2[:, 1]) <= y)
+        & (y <= np.maximum(p1[:, 1], p2[:, 1]))
+    )
 
     unique_intersections: List[Tuple[Tuple[int, int], int]] = []
-    for pt, idx in intersections:
+    for i in np.flatnonzero(hit).tolist():
+        pt = (int(x[i]), int(y[i]))
         if not any(
-            np.linalg.norm(np.array(pt) - np.array(u_pt)) < tol
+            math.hypot(pt[0] - u_pt[0], pt[1] - u_pt[1]) < tol
             for (u_pt, _) in unique_intersections
         ):
-            unique_intersections.append(((int(pt[0]), int(pt[1])), idx))
+            unique_intersections.append((pt, i))
 
     return unique_intersections
 
@@ -253,66 +449,64 @@ def split_polygon(
         idx1, idx2 = idx2, idx1
         intersection1, intersection2 = intersection2, intersection1
 
-    poly1 = polygon[: idx1 + 1].tolist()
-    poly1.append(intersection1)
-    poly1.append(intersection2)
-    poly1.extend(polygon[idx2 + 1 :])
-
-    poly2 = polygon[idx1 + 1 : idx2 + 1].tolist()
-    poly2.append(intersection2)
-    poly2.append(intersection1)
+    polygon = np.asarray(polygon)
+    cut = np.array([intersection1, intersection2], dtype=polygon.dtype)
+    poly1 = np.concatenate([polygon[: idx1 + 1], cut, polygon[idx2 + 1 :]])
+    poly2 = np.concatenate([polygon[idx1 + 1 : idx2 + 1], cut[::-1]])
 
-    return np.array(poly1), np.array(poly2)
+    return poly1, poly2
 
 
 def bisecting_line_coordinates(
-    img_size: int, pupils: Tuple[Tuple[int, int], Tuple[int, int]]
-) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    img_size: int, pupils: Any
+) -> Any:
     """
     Compute the coordinates of the bisecting line of the eyes in an image.
+
+    Args:
+        img_size (int): Size of the (square) image.
+        pupils (Any): The two pupils as ((x1, y1), (x2, y2)), or a list or
+            array of shape (..., 2, 2) for a batch of frames.
+
+    Returns:
+        Any: The end points ((x0, y0), (x1, y1)) as ints. For a batch, a list
+        of those per frame, or a float array of shape (..., 2, 2) if pupils
+        is an array.
     """
-    (x1, y1), (x2, y2) = pupils
+    p = np.asarray(pupils, dtype=np.float64)
+    x1, y1 = p[..., 0, 0], p[..., 0, 1]
+    x2, y2 = p[..., 1, 0], p[..., 1, 1]
 
     # Calculate midpoint between the pupils
     mid_x = (x1 + x2) / 2
     mid_y = (y1 + y2) / 2
 
-    # Calculate the angle of the line
-    if x1 == x2:
-        angle = np.pi / 2
-    else:
-        angle = np.arctan2((y2 - y1), (x2 - x1))
-
-    # Determine the slope of the perpendicular bisecting line
+    # Calculate the angle of the line, and the slope of its perpendicular
+    angle = np.where(x1 == x2, np.pi / 2, np.arctan2((y2 - y1), (x2 - x1)))
     perp_slope = np.tan(angle + np.pi / 2)
 
-    def get_y(x: float, mid_x: float, mid_y: float, slope: float) -> float:
-        return slope * (x - mid_x) + mid_y
-
-    def get_x(y: float, mid_x: float, mid_y: float, slope: float) -> float:
-        return (y - mid_y) / slope + mid_x
-
-    # Initialize as floats so that assignments from get_x/get_y are valid.
-    x0, x1_img = 0.0, float(img_size)
-    y0, y1_img = get_y(x0, mid_x, mid_y, perp_slope), get_y(
-        x1_img, mid_x, mid_y, perp_slope
-    )
-
-    if y0 < 0:
-        y0 = 0.0
-        x0 = get_x(y0, mid_x, mid_y, perp_slope)
-    elif y0 > img_size:
-        y0 = float(img_size)
-        x0 = get_x(y0, mid_x, mid_y, perp_slope)
-
-    if y1_img < 0:
-        y1_img = 0.0
-        x1_img = get_x(y1_img, mid_x, mid_y, perp_slope)
-    elif y1_img > img_size:
-        y1_img = float(img_size)
-        x1_img = get_x(y1_img, mid_x, mid_y, perp_slope)
-
-    return (int(x0), int(y0)), (int(x1_img), int(y1_img))
+    size = float(img_size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+
+        def clamp(x: NDArray[Any]) -> Tuple[NDArray[Any], NDArray[Any]]:
+            # Point on the line at x, moved along the line into [0, img_size] in y
+            y = perp_slope * (x - mid_x) + mid_y
+            y_clamped = np.clip(y, 0.0, size)
+            x_clamped = np.where(
+                y == y_clamped, x, (y_clamped - mid_y) / perp_slope + mid_x
+            )
+            return x_clamped, y_clamped
+
+        x0, y0 = clamp(np.zeros_like(mid_x))
+        x1_img, y1_img = clamp(np.full_like(mid_x, size))
+
+    result = np.stack([np.stack([x0, y0], -1), np.stack([x1_img, y1_img], -1)], -2)
+    if p.ndim > 2:
+        if isinstance(pupils, np.ndarray):
+            return result
+        return [tuple(frame) for frame in _to_int_tuples(np.trunc(result))]
+    (a, b), (c, d) = np.trunc(result).astype(np.int64).tolist()
+    return (a, b), (c, d)
 
 
 def line_to_edge(
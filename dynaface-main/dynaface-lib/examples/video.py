@@ -1,10 +1,9 @@
 import csv
 import logging
 import os
-import re
-import shutil
-import subprocess
-import tempfile
+import queue
+import threading
+from itertools import chain
 
 import cv2
 from dynaface.facial import AnalyzeFace
@@ -12,87 +11,141 @@ from dynaface.facial import AnalyzeFace
 logger = logging.getLogger(__name__)
 
 SAMPLE_RATE = 44100
+QUEUE_SIZE = 32  # Frames buffered between the decode, analyze and encode stages
+
+
+class _Sentinel:
+    pass
+
+
+_DONE = _Sentinel()
+
+
+def _put(q, item, stop):
+    """Put an item on a bounded queue, giving up if the consumer went away."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
 
 
 class ProcessVideoOpenCV:
-    def __init__(self):
-        # Create a temporary directory
-        self.temp_path = tempfile.mkdtemp()
+    """Streaming video decode/encode. Frames stay in memory, nothing is written
+    to temporary files, and decode/encode run on their own threads connected by
+    bounded queues."""
 
-    def cleanup(self):
-        # Delete the temporary directory when you're done
-        shutil.rmtree(self.temp_path)
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.frame_rate = 0
+        self.frames = 0
+        self._cap = None
 
-    def extract(self, input_file, quality=2):
+    def open(self, input_file):
         # Open the video file
-        cap = cv2.VideoCapture(input_file)
+        self._cap = cv2.VideoCapture(input_file)
 
         # Check if video file opened successfully
-        if not cap.isOpened():
+        if not self._cap.isOpened():
             logger.error("Error: Couldn't open the video file.")
             return False
 
         # Get the frame rate of the video
-        self.frame_rate = int(cap.get(cv2.CAP_PROP_FPS))
-        self.frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        self.frame_rate = int(self._cap.get(cv2.CAP_PROP_FPS))
+        self.frames = self._cap.get(cv2.CAP_PROP_FRAME_COUNT)
         data_length = round(self.frames / self.frame_rate, 2)
         logger.info(f"Frame rate: {self.frame_rate} FPS")
         logger.info(f"Frames: {self.frames}")
         logger.debug(f"Video length (sec): {data_length}")
-
-        frame_num = 0
-
-        while True:
-            ret, frame = cap.read()
-
-            # Break the loop if video has ended
-            if not ret:
-                break
-
-            frame_num += 1
-            output_filename = os.path.join(self.temp_path, f"input-{frame_num}.jpg")
-            logger.debug(output_filename)
-            # Save the frame as an image
-            cv2.imwrite(output_filename, frame)
-
-        # Release the video file
-        cap.release()
         return True
 
-    def build(self, output_path, frame_rate):
+    def read_frames(self):
+        """Generator of decoded frames (BGR), decoded ahead on a background thread."""
+        q = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        cap = self._cap
+
+        def decode():
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    # Break the loop if video has ended
+                    if not ret:
+                        break
+                    if not _put(q, frame, stop):
+                        break
+            except Exception as e:
+                _put(q, e, stop)
+            finally:
+                cap.release()
+                _put(q, _DONE, stop)
+
+        thread = threading.Thread(target=decode, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def write_frames(self, output_path, frame_rate, frames):
+        """Encode an iterable of BGR frames on a background thread.
+
+        The output size is taken from the first frame, later frames are
+        resized to match."""
         if os.path.exists(output_path):
             os.remove(output_path)
 
-        # Filter out the files that start with 'output' and end with '.jpg'
-        files = [
-            f
-            for f in os.listdir(self.temp_path)
-            if f.startswith("output") and f.endswith(".jpg")
-        ]
-
-        # Sort the files based on the numeric part in their names
-        files = sorted(files, key=lambda x: int(x.split("-")[1].split(".jpg")[0]))
-
-        # Read the first image to get the dimensions
-        img = cv2.imread(os.path.join(self.temp_path, files[0]))
-        height, width, layers = img.shape
-
-        # Create the video writer
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # or use 'XVID'
-        out = cv2.VideoWriter(output_path, fourcc, frame_rate, (width, height))
-
-        # Add images to the video
-        for file in files:
-            path = os.path.join(self.temp_path, file)
-            logger.debug(f"Output: {path}")
-            img = cv2.imread(path)
-
-            # Resize image to match the frame size
-            resized_img = cv2.resize(img, (width, height))
-
-            out.write(resized_img)
-
-        out.release()
+        q = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def encode():
+            out = None
+            try:
+                while True:
+                    img = q.get()
+                    if img is _DONE:
+                        break
+                    if out is None:
+                        height, width = img.shape[:2]
+                        # Create the video writer
+                        fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # or use 'XVID'
+                        out = cv2.VideoWriter(
+                            output_path, fourcc, frame_rate, (width, height)
+                        )
+                    if img.shape[:2] != (height, width):
+                        # Resize image to match the frame size
+                        img = cv2.resize(img, (width, height))
+                    out.write(img)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                if out is not None:
+                    out.release()
+
+        thread = threading.Thread(target=encode, daemon=True)
+        thread.start()
+        try:
+            for img in frames:
+                if not _put(q, img, stop):
+                    break
+        finally:
+            # The encoder always drains to the sentinel unless it failed
+            if not stop.is_set():
+                q.put(_DONE)
+            thread.join()
+        if errors:
+            raise errors[0]
         return True
 
 
@@ -108,38 +161,47 @@ class VideoToVideo:
         self._crop = crop
 
     def process(self, input_video, output_video, stats=[]):
-        # p = ProcessVideoFFMPEG()
         p = ProcessVideoOpenCV()
-        if not p.extract(input_video):
-            logger.error("Failed to execute ffmpeg")
+        if not p.open(input_video):
+            logger.error("Failed to open video")
+            return False
+
+        frames = p.read_frames()
+        first = next(frames, None)
+        if first is None:
+            logger.error("Video has no frames")
             return False
 
         # sample 1st
-        filename = os.path.join(p.temp_path, "input-1.jpg")
-        logger.debug(filename)
-        image = cv2.imread(filename)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image = cv2.cvtColor(first, cv2.COLOR_BGR2RGB)
         face = AnalyzeFace(stats)
         face.load_image(image, self._crop)
 
         self.stats = face.get_all_items()
         self.data = {stat: [] for stat in self.stats}
 
-        out_idx = 1
+        try:
+            p.write_frames(
+                output_video,
+                p.frame_rate,
+                self._analyze(chain([first], frames), stats),
+            )
+        finally:
+            frames.close()
+        return True
+
+    def _analyze(self, frames, stats):
+        """Generator that analyzes and renders each frame, yielding BGR images."""
         pupils = None
+        # One face for the whole video, its image buffers are reused per frame
+        face = AnalyzeFace(stats)
+        face.begin_stream()
 
-        idx = 0
-        while True:
-            idx += 1
-            filename = os.path.join(p.temp_path, f"input-{idx}.jpg")
-            if not os.path.exists(filename):
-                break
-            logger.debug(filename)
+        for idx, frame in enumerate(frames, start=1):
+            logger.debug(f"Frame {idx}")
             # Load frame and crop/size
-            image = cv2.imread(filename)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-            face = AnalyzeFace(stats)
             face.load_image(image, self._crop, pupils)
 
             rec = face.analyze()
@@ -151,15 +213,11 @@ class VideoToVideo:
             if self._points:
                 face.draw_landmarks(numbers=True)
 
-            face.save(os.path.join(p.temp_path, f"output-{out_idx}.jpg"))
+            yield cv2.cvtColor(face.render_img, cv2.COLOR_RGB2BGR)
             if pupils is None:
                 pupils = face.get_pupils()
-            out_idx += 1
 
-        p.build(output_video, p.frame_rate)
-        p.cleanup()
-        logger.debug(p.temp_path)
-        return True
+        face.end_stream()
 
     def plot_chart(self, filename, plot_stats=None):
         pass
@@ -5,7 +5,7 @@ import unittest
 
 import cv2
 import numpy as np
-from dynaface.image import ImageAnalysis, load_image
+from dynaface.image import ImageAnalysis, load_image, text_size
 from dynaface.util import safe_clip
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -100,6 +100,29 @@ class TestImage(unittest.TestCase):
         analysis.load_image(test_img)
         analysis.write_text((10, 10), "")
 
+    def test_calc_text_size_cached(self):
+        analysis = ImageAnalysis()
+        analysis.load_image(np.zeros((100, 100, 3), dtype=np.uint8))
+        text_size.cache_clear()
+        size = analysis.calc_text_size("W")
+        analysis.calc_text_size("W")
+        assert text_size.cache_info().hits == 1
+        expected = cv2.getTextSize(
+            "W", analysis.text_font, analysis.text_size, analysis.text_thick
+        )
+        assert size == expected
+
+    def test_measure_polygon_blends_only_polygon(self):
+        analysis = ImageAnalysis()
+        test_img = np.full((100, 100, 3), 200, dtype=np.uint8)
+        analysis.load_image(test_img)
+        area = analysis.measure_polygon([(10, 10), (30, 10), (30, 30)], 1.0)
+        assert area == 200.0
+        assert tuple(analysis.render_img[12, 28]) != (200, 200, 200)
+        assert (analysis.render_img[40:, :] == 200).all()
+        # Partly outside the image is clipped
+        analysis.measure_polygon([(-10, -10), (20, -10), (20, 20)], 1.0)
+
     #
     # hline() and vline() Tests
     #
@@ -132,6 +155,17 @@ class TestImage(unittest.TestCase):
     #
     # arrow() and arrow_head() Tests
     #
+    def test_arrow_float_points(self):
+        analysis = ImageAnalysis()
+        test_img = np.zeros((100, 100, 3), dtype=np.uint8)
+        analysis.load_image(test_img)
+        pt = np.array([10.6, 10.4], dtype=np.float32)
+        analysis.arrow(pt, (89.5, 90.2))
+        analysis.circle(pt, radius=1)
+        analysis.write_text(pt, "Test")
+        # Points are rounded to the nearest pixel when drawn
+        assert analysis.render_img[10, 11].any()
+
     def test_arrow_one_side(self):
         analysis = ImageAnalysis()
         test_img = np.zeros((100, 100, 3), dtype=np.uint8)
@@ -222,3 +256,37 @@ class TestImage(unittest.TestCase):
         analysis.load_image(test_img)
         section = analysis.extract_horiz_hsv(50)
         assert section.shape[0] == 100
+
+    #
+    # Streaming buffer reuse Tests
+    #
+    def test_reuse_buffers(self):
+        analysis = ImageAnalysis()
+        analysis.reuse_buffers = True
+        img1 = np.full((50, 60, 3), 10, dtype=np.uint8)
+        img2 = np.full((50, 60, 3), 200, dtype=np.uint8)
+        analysis.load_image(img1)
+        original, gray, render = (
+            analysis.original_img,
+            analysis.gray_img,
+            analysis.render_img,
+        )
+        analysis.load_image(img2)
+        assert analysis.original_img is original
+        assert analysis.gray_img is gray
+        assert analysis.render_img is render
+        assert analysis.original_img[0, 0, 0] == 200
+        assert analysis.render_img[0, 0, 0] == 200
+        assert analysis.gray_img[0, 0] == 200
+        assert analysis.original_hsv.dtype == np.int64
+
+    def test_reuse_buffers_sizes(self):
+        analysis = ImageAnalysis()
+        analysis.reuse_buffers = True
+        analysis.load_image(np.zeros((50, 60, 3), dtype=np.uint8))
+        small = analysis.original_img
+        analysis.load_image(np.zeros((80, 80, 3), dtype=np.uint8))
+        assert analysis.shape == (80, 80, 3)
+        assert analysis.width == 80
+        analysis.load_image(np.zeros((50, 60, 3), dtype=np.uint8))
+        assert analysis.original_img is small
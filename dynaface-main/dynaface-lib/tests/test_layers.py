@@ -0,0 +1,104 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dynaface.facial import AnalyzeFace, PanelPoint
+from dynaface.layers import LayeredRenderer
+
+from dynaface import measures
+
+
+def make_face():
+    face = AnalyzeFace(
+        [
+            measures.AnalyzeFAI(),
+            measures.AnalyzeEyeArea(),
+            measures.AnalyzeIntercanthalDistance(),
+            measures.AnalyzePosition(),
+            measures.AnalyzeBrows(),
+        ]
+    )
+    landmarks = np.random.default_rng(0).uniform(400, 600, (98, 2))
+    t = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+    eye = np.column_stack((40 * np.cos(t), 15 * np.sin(t)))
+    landmarks[60:68] = eye + (380, 480)
+    landmarks[68:76] = eye + (640, 480)
+    landmarks[96], landmarks[97] = (380.4, 480.2), (640.6, 482.5)
+    img = np.full((1024, 1024, 3), 90, dtype=np.uint8)
+    face.load_state([img, [0, 0, 0], landmarks, 260.0, 0.24, None])
+    return face
+
+
+def direct_render(face):
+    face.render_reset()
+    face.analyze()
+    return face.render_img.copy()
+
+
+class TestLayers(unittest.TestCase):
+
+    def test_replay_matches_direct_drawing(self):
+        face = make_face()
+        expected = direct_render(face)
+        renderer = LayeredRenderer(face)
+        np.testing.assert_array_equal(renderer.render(), expected)
+        self.assertIsNotNone(renderer.values)
+        self.assertIn("fai", renderer.values)
+
+    def test_panel_point_is_a_tuple(self):
+        pt = PanelPoint((10, 20), 3)
+        self.assertEqual(pt, (10, 20))
+        self.assertEqual(pt.panel_index, 3)
+        self.assertEqual(pt.index(20), 1)
+
+    def test_record_does_not_draw(self):
+        face = make_face()
+        face.render_reset()
+        _, log = face.record(face.analyze)
+        self.assertTrue(len(log) > 0)
+        np.testing.assert_array_equal(face.render_img, face.original_img)
+
+    def test_toggle_and_text_size_do_not_analyze(self):
+        face = make_face()
+        renderer = LayeredRenderer(face)
+        renderer.render()
+        with patch.object(face, "analyze", wraps=face.analyze) as analyze:
+            renderer.show_landmarks = True
+            renderer.render()
+            renderer.show_landmarks = False
+            face.text_size = 1.25
+            img = renderer.render().copy()
+            analyze.assert_not_called()
+        # The panel is laid out again for the new text size
+        np.testing.assert_array_equal(img, direct_render(face))
+
+    def test_right_aligned_text_follows_text_size(self):
+        face = make_face()
+        face.render_reset()
+        _, log = face.record(face.analyze)
+        self.assertIn("write_text_right", [name for name, _, _ in log])
+        face.text_size = 1.5
+        with patch.object(face, "write_text", wraps=face.write_text) as write:
+            face.render_reset()
+            face.replay(log)
+        txt = next(args[1] for name, args, _ in log if name == "write_text_right")
+        pos = next(c.args[0] for c in write.call_args_list if c.args[1] == txt)
+        self.assertEqual(pos[0], face.width - (face.calc_text_size(txt)[0][0] + 5))
+
+    def test_invalidate(self):
+        face = make_face()
+        renderer = LayeredRenderer(face)
+        renderer.render()
+        with patch.object(face, "analyze", wraps=face.analyze) as analyze:
+            renderer.invalidate_measures()
+            renderer.render()
+            analyze.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dynaface.facial import AnalyzeFace
+from dynaface.layers import LayeredRenderer
+from dynaface.prefetch import FramePrefetcher
+
+from dynaface import measures
+
+
+def make_frames(count):
+    landmarks = np.random.default_rng(0).uniform(400, 600, (98, 2))
+    landmarks[96], landmarks[97] = (380.4, 480.2), (640.6, 482.5)
+    img = np.full((1024, 1024, 3), 90, dtype=np.uint8)
+    return [[img, [0, 0, 0], landmarks + i, 260.0, 0.24, None] for i in range(count)]
+
+
+def wait_for(prefetcher, index, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        img = prefetcher.get(index)
+        if img is not None:
+            return img
+        time.sleep(0.01)
+    raise AssertionError(f"Frame {index} was not prefetched")
+
+
+def make_prefetcher(frames, **kwargs):
+    return FramePrefetcher(
+        frames, [measures.AnalyzeFAI(), measures.AnalyzeEyeArea()], 30, **kwargs
+    )
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_prefetched_frame_matches_direct_render(self):
+        frames = make_frames(3)
+        prefetcher = make_prefetcher(frames, workers=2)
+        try:
+            prefetcher.prefetch(0)
+            img = wait_for(prefetcher, 1)
+        finally:
+            prefetcher.close()
+        face = AnalyzeFace([measures.AnalyzeFAI(), measures.AnalyzeEyeArea()])
+        face.load_state(frames[1])
+        np.testing.assert_array_equal(img, LayeredRenderer(face).render())
+
+    def test_cache_is_bounded(self):
+        frames = make_frames(8)
+        prefetcher = make_prefetcher(frames, capacity=3, workers=1)
+        try:
+            for i in range(len(frames)):
+                prefetcher.prefetch(i)
+                wait_for(prefetcher, i)
+            self.assertLessEqual(len(prefetcher._cache), 3)
+            self.assertIsNone(prefetcher.get(0))
+            self.assertIsNotNone(prefetcher.get(len(frames) - 1))
+        finally:
+            prefetcher.close()
+
+    def test_ahead_adapts_to_render_time(self):
+        prefetcher = make_prefetcher([], workers=2, max_ahead=20)
+        try:
+            prefetcher.render_time = 0.01
+            self.assertEqual(prefetcher.ahead, 3)
+            prefetcher.render_time = 0.2
+            self.assertEqual(prefetcher.ahead, 8)
+            prefetcher.render_time = 5.0
+            self.assertEqual(prefetcher.ahead, 20)
+        finally:
+            prefetcher.close()
+
+    def test_configure_invalidates(self):
+        frames = make_frames(2)
+        prefetcher = make_prefetcher(frames, workers=1)
+        try:
+            prefetcher.prefetch(0)
+            wait_for(prefetcher, 0)
+            prefetcher.configure(True, False, 0.75)
+            self.assertIsNotNone(prefetcher.get(0))
+            prefetcher.configure(True, True, 0.75)
+            self.assertIsNone(prefetcher.get(0))
+        finally:
+            prefetcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
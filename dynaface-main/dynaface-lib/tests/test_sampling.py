@@ -0,0 +1,113 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dynaface.sampling import AdaptiveSampler
+
+
+def make_clip(count, gesture=None):
+    # Face drifting slowly, optionally with a quick gesture of landmark 0
+    base = np.random.default_rng(0).uniform(300, 700, (98, 2))
+    base[96], base[97] = (380.0, 480.0), (640.0, 480.0)
+    truth = []
+    for i in range(count):
+        lm = base + (i * 0.1, 0.0)
+        if gesture is not None and gesture[0] <= i < gesture[1]:
+            lm[0] += (0.0, 40.0)
+        truth.append(lm.astype(np.float32))
+    frames = []
+    for i in range(count):
+        frame = np.full((48, 64, 3), 100, dtype=np.uint8)
+        frame[0, 0, 0] = i
+        frames.append(frame)
+    return frames, truth
+
+
+def run(frames, truth, stride, **kwargs):
+    detected = []
+
+    def detect(frame):
+        i = int(frame[0, 0, 0])
+        detected.append(i)
+        return truth[i], np.array([0.0, 0.0, float(i)])
+
+    sampler = AdaptiveSampler(detect, stride, **kwargs)
+    result = []
+    for frame in frames:
+        result += sampler.push(frame)
+    result += sampler.flush()
+    return result, detected
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_stride_one_detects_every_frame(self):
+        frames, truth = make_clip(10)
+        result, detected = run(frames, truth, 1)
+        self.assertEqual(detected, list(range(10)))
+        self.assertTrue(all(s.detected for s in result))
+
+    def test_interpolates_steady_motion(self):
+        frames, truth = make_clip(41)
+        result, detected = run(frames, truth, 10)
+        self.assertEqual(detected, [0, 10, 20, 30, 40])
+        self.assertEqual(len(result), 41)
+        for i, sample in enumerate(result):
+            self.assertIs(sample.frame, frames[i])
+            np.testing.assert_allclose(sample.landmarks, truth[i], atol=1e-3)
+            self.assertAlmostEqual(sample.headpose[2], i)
+        self.assertFalse(result[5].detected)
+        self.assertTrue(result[10].detected)
+
+    def test_refines_around_gesture(self):
+        frames, truth = make_clip(51, gesture=(28, 33))
+        result, detected = run(frames, truth, 10)
+        # Only the intervals next to the keyframe that saw the gesture are dense
+        self.assertEqual(sorted(detected), [0, 10] + list(range(20, 41)) + [50])
+        self.assertEqual(len(result), 51)
+        for i in range(20, 41):
+            np.testing.assert_array_equal(result[i].landmarks, truth[i])
+
+    def test_refines_on_frame_difference(self):
+        # The gesture ends before the next keyframe, only the frames show it
+        frames, truth = make_clip(21, gesture=(3, 6))
+        for i in range(3, 6):
+            frames[i][1:, :32] = 200
+        result, detected = run(frames, truth, 10)
+        self.assertEqual(sorted(detected), list(range(11)) + [20])
+        np.testing.assert_array_equal(result[4].landmarks, truth[4])
+
+    def test_no_face_keyframe(self):
+        frames, truth = make_clip(21)
+        detected = []
+
+        def detect(frame):
+            i = int(frame[0, 0, 0])
+            detected.append(i)
+            if i == 10:
+                return None
+            return truth[i], np.zeros(3)
+
+        sampler = AdaptiveSampler(detect, 10)
+        result = []
+        for frame in frames:
+            result += sampler.push(frame)
+        result += sampler.flush()
+        self.assertEqual(len(result), 21)
+        self.assertIsNone(result[10].landmarks)
+        self.assertEqual(sorted(detected), list(range(21)))
+
+    def test_flush_partial_interval(self):
+        frames, truth = make_clip(15)
+        result, detected = run(frames, truth, 10)
+        self.assertEqual(len(result), 15)
+        self.assertEqual(detected, [0, 10, 14])
+        np.testing.assert_allclose(result[12].landmarks, truth[12], atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
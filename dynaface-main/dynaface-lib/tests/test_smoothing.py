@@ -0,0 +1,99 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dynaface.smoothing import (
+    SMOOTHING_METHODS,
+    ExponentialFilter,
+    MovingAverageFilter,
+    OneEuroFilter,
+    SavitzkyGolayFilter,
+    create_filter,
+    smooth_offline,
+)
+
+
+def linear_motion(frames=40, points=98):
+    # Every point moves 0.5 px right and 0.25 px down per frame
+    t = np.arange(frames, dtype=np.float64)[:, None, None]
+    start = np.random.default_rng(1).uniform(0, 1000, (1, points, 2))
+    return start + t * np.array([0.5, 0.25])
+
+
+class TestSmoothing(unittest.TestCase):
+
+    def test_moving_average_matches_window_mean(self):
+        frames = np.random.default_rng(0).uniform(0, 1000, (50, 98, 2))
+        f = MovingAverageFilter(5)
+        for i, frame in enumerate(frames):
+            result = f(frame)
+            expected = frames[max(0, i - 4) : i + 1].mean(axis=0)
+            np.testing.assert_allclose(result, expected, rtol=1e-5)
+        self.assertEqual(result.dtype, np.float32)
+
+    def test_window_one_is_passthrough(self):
+        f = create_filter("average", 1)
+        frame = np.array([[1.5, 2.5], [3.0, 4.0]])
+        np.testing.assert_allclose(f(frame), frame)
+
+    def test_shape_change_resets(self):
+        f = MovingAverageFilter(3)
+        f(np.zeros((98, 2)))
+        np.testing.assert_allclose(f(np.ones((2, 2))), np.ones((2, 2)))
+
+    def test_exponential(self):
+        f = ExponentialFilter(0.5)
+        f(np.zeros((1, 2)))
+        np.testing.assert_allclose(f(np.full((1, 2), 4.0)), [[2.0, 2.0]])
+        np.testing.assert_allclose(f(np.full((1, 2), 4.0)), [[3.0, 3.0]])
+
+    def test_savgol_follows_linear_motion(self):
+        frames = linear_motion()
+        f = SavitzkyGolayFilter(7)
+        for frame in frames:
+            result = f(frame)
+        # No lag, unlike a moving average of the same window
+        np.testing.assert_allclose(result, frames[-1], atol=1e-3)
+        avg = MovingAverageFilter(7)
+        for frame in frames:
+            lagged = avg(frame)
+        self.assertGreater(np.abs(lagged - frames[-1]).max(), 1.0)
+
+    def test_one_euro_reduces_noise(self):
+        rng = np.random.default_rng(2)
+        f = OneEuroFilter(30.0)
+        still = np.full((98, 2), 500.0)
+        errors = []
+        for _ in range(100):
+            result = f(still + rng.normal(0, 0.5, still.shape))
+            errors.append(np.abs(result - still).mean())
+        self.assertLess(np.mean(errors[20:]), 0.2)
+
+    def test_create_filter(self):
+        for method in SMOOTHING_METHODS:
+            f = create_filter(method, 5, fps=30)
+            result = f(np.ones((98, 2)))
+            self.assertEqual(result.shape, (98, 2))
+        with self.assertRaises(ValueError):
+            create_filter("median", 5)
+
+    def test_smooth_offline_zero_phase(self):
+        frames = linear_motion(frames=100)
+        for method in SMOOTHING_METHODS:
+            result = smooth_offline(frames, method, 5)
+            self.assertEqual(result.shape, frames.shape)
+            self.assertEqual(result.dtype, np.float32)
+            # Away from the ends a linear motion is not delayed
+            np.testing.assert_allclose(result[30:70], frames[30:70], atol=0.01)
+
+    def test_smooth_offline_short_clip(self):
+        frames = linear_motion(frames=1)
+        np.testing.assert_allclose(smooth_offline(frames, "savitzky-golay", 5), frames)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dynaface import util
+from dynaface.facial import AnalyzeFace, stylegan_window
+
+
+def make_state(value):
+    img = np.full((32, 32, 3), value, dtype=np.uint8)
+    return [img, [0, 0, 0], [(value, value)] * 98, 1.0, 2.0, None]
+
+
+class TestStream(unittest.TestCase):
+
+    def test_dump_state_copies_while_streaming(self):
+        face = AnalyzeFace([])
+        face.begin_stream()
+        face.load_state(make_state(10))
+        state = face.dump_state()
+        face.load_state(make_state(20))
+        assert state[0][0, 0, 0] == 10
+        assert face.original_img[0, 0, 0] == 20
+
+    def test_load_state_does_not_alias(self):
+        face = AnalyzeFace([])
+        face.begin_stream()
+        state = make_state(10)
+        face.load_state(state)
+        face.load_state(make_state(30))
+        assert state[0][0, 0, 0] == 10
+
+    def test_reset(self):
+        face = AnalyzeFace([])
+        face.load_state(make_state(10))
+        face.lateral = True
+        face.reset()
+        assert len(face.landmarks) == 0
+        assert not face.lateral
+        assert face.pix2mm == 1.0
+
+    def test_end_stream(self):
+        face = AnalyzeFace([])
+        face.begin_stream()
+        face.load_state(make_state(10))
+        img = face.original_img
+        face.end_stream()
+        assert not face.reuse_buffers
+        assert face.original_img is not img
+        assert face.original_img[0, 0, 0] == 10
+
+
+class TestCropStylegan(unittest.TestCase):
+
+    def crop(self, tilt_px, reuse, half_pd=300):
+        face = AnalyzeFace([], tilt_threshold=5)
+        face.reuse_buffers = reuse
+        face.init_image(np.full((600, 800, 3), 50, dtype=np.uint8))
+        landmarks = [(400, 300)] * 98
+        landmarks[96] = (400 - half_pd, 300 - tilt_px)
+        landmarks[97] = (400 + half_pd, 300 + tilt_px)
+        face.landmarks = landmarks
+        face.crop_stylegan()
+        return face
+
+    def test_pupils_aligned(self):
+        for reuse in (False, True):
+            face = self.crop(0, reuse)
+            assert face.render_img.shape == (1024, 1024, 3)
+            assert abs(face.landmarks[96][0] - 380) <= 1
+            assert abs(face.landmarks[97][0] - 640) <= 2
+            assert abs(face.landmarks[96][1] - 480) <= 1
+            # Outside the source image is filled, not black
+            assert tuple(face.original_img[0, 0]) == (255, 255, 255)
+
+    def test_tilt_removed(self):
+        face = self.crop(20, False, half_pd=50)
+        assert face.face_rotation is not None
+        assert abs(face.landmarks[96][1] - face.landmarks[97][1]) <= 1
+        assert abs(face.landmarks[97][0] - face.landmarks[96][0] - 260) <= 2
+
+    def test_steep_tilt(self):
+        # A face tilted 60 degrees: image and landmarks turn together and
+        # the right pupil still lands on the left.
+        img = np.full((600, 800, 3), 20, dtype=np.uint8)
+        img[300:] = 100
+        cv2.circle(img, (350, 213), 6, (0, 0, 255), -1)
+        cv2.circle(img, (450, 387), 6, (0, 255, 0), -1)
+        landmarks = np.full((98, 2), (400.0, 300.0), dtype=np.float32)
+        landmarks[96], landmarks[97] = (350.0, 213.0), (450.0, 387.0)
+        face = AnalyzeFace([], tilt_threshold=5)
+        face.init_image(img)
+        face.landmarks = landmarks
+        face.crop_stylegan()
+        out = face.original_img
+        assert face.face_rotation is not None
+        assert abs(face.landmarks[96][0] - 380) <= 1
+        assert abs(face.landmarks[96][1] - face.landmarks[97][1]) <= 1
+        assert face.landmarks[97][0] > face.landmarks[96][0]
+        x, y = np.round(face.landmarks[96]).astype(int)
+        assert tuple(out[y, x]) == (0, 0, 255)
+        x, y = np.round(face.landmarks[97]).astype(int)
+        assert tuple(out[y, x]) == (0, 255, 0)
+        # Corners uncovered by the rotation take the average color, as in
+        # straighten(); beyond the frame the crop is padded with white.
+        avg = util.calculate_average_rgb(img)
+        assert tuple(out[140, 10]) == avg
+        assert tuple(out[800, 1010]) == avg
+        assert tuple(out[10, 512]) == (255, 255, 255)
+        assert tuple(out[1010, 512]) == (255, 255, 255)
+
+    def test_landmarks_keep_subpixel(self):
+        face = self.crop(0, False)
+        assert face.landmarks.dtype == np.float32
+        assert face.landmarks.shape == (98, 2)
+        # Drawing rounds the points, the landmarks themselves are not changed
+        before = face.landmarks.copy()
+        face.draw_landmarks(numbers=True)
+        np.testing.assert_array_equal(face.landmarks, before)
+
+    def test_load_image_with_landmarks(self):
+        # Known landmarks are cropped like detected ones, without the models
+        landmarks = np.full((98, 2), (400.0, 300.0), dtype=np.float32)
+        landmarks[96], landmarks[97] = (100.0, 300.0), (700.0, 300.0)
+        face = AnalyzeFace([])
+        img = np.full((600, 800, 3), 50, dtype=np.uint8)
+        face.load_image(img, crop=True, landmarks=landmarks, headpose=[0, 0, 0])
+        assert face.render_img.shape == (1024, 1024, 3)
+        assert abs(face.landmarks[96][0] - 380) <= 1
+        assert abs(face.landmarks[96][1] - 480) <= 1
+        assert face.pupillary_distance > 0
+
+    def test_find_landmarks_no_face(self):
+        # A rejected detection gives empty (0, 2) landmarks, not a list
+        mtcnn = MagicMock()
+        mtcnn.detect.return_value = (None, [None])
+        face = AnalyzeFace([])
+        img = np.zeros((64, 64, 3), dtype=np.uint8)
+        with patch("dynaface.facial.are_models_init", return_value=True), patch(
+            "dynaface.models.mtcnn_model", mtcnn
+        ):
+            landmarks, headpose = face.find_landmarks(img)
+        assert landmarks.shape == (0, 2)
+        assert landmarks.dtype == np.float32
+        assert len(headpose) == 3
+
+    def test_stylegan_window_crop_matches_full_image(self):
+        # A smooth image, so the crops may differ by a sub-pixel shift only
+        y, x = np.mgrid[0:1600, 0:2400]
+        img = np.stack([x % 256, y % 256, (x + y) % 256], axis=2).astype(np.uint8)
+        img = cv2.GaussianBlur(img, (0, 0), 4)
+        landmarks = np.full((98, 2), (1200.0, 800.0), dtype=np.float32)
+        landmarks[96], landmarks[97] = (1150.5, 790.0), (1260.0, 815.2)
+        pupils = (tuple(landmarks[97]), tuple(landmarks[96]))
+
+        full = AnalyzeFace([], tilt_threshold=5)
+        full.init_image(img)
+        full.landmarks = landmarks.copy()
+        full.crop_stylegan()
+
+        x0, y0, x1, y1 = stylegan_window(pupils, img.shape, margin=0)
+        assert (x1 - x0) * (y1 - y0) < img.shape[0] * img.shape[1] / 5
+        roi = AnalyzeFace([], tilt_threshold=5)
+        roi.init_image(img[y0:y1, x0:x1])
+        roi.landmarks = landmarks - (x0, y0)
+        roi.crop_stylegan()
+
+        np.testing.assert_allclose(roi.landmarks, full.landmarks, atol=1)
+        diff = np.abs(roi.render_img.astype(int) - full.render_img.astype(int))
+        assert diff.mean() < 2
+        # No part of the crop fell outside the window, so nothing was filled
+        assert (roi.render_img == 255).all(axis=2).sum() == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
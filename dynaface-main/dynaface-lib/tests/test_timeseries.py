@@ -0,0 +1,244 @@
+import os
+import sys
+import multiprocessing
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dynaface.facial import AnalyzeFace
+from dynaface.measures import MeasureBase, MeasureItem, filter_measurements
+from dynaface.timeseries import (
+    ARGMIN,
+    MeasureTable,
+    Reduction,
+    nanargmax,
+    nanargmin,
+    merge_scans,
+    scan_chunk,
+    scan_frames,
+)
+
+
+class CountingMeasure(MeasureBase):
+    def __init__(self) -> None:
+        super().__init__()
+        self.items = [MeasureItem("x"), MeasureItem("y")]
+        self.is_frontal = True
+        self.sync_items()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def abbrev(self) -> str:
+        return "Counting"
+
+    def calc(self, face, render=True):
+        with self._lock:
+            self.calls += 1
+        x, y = face.landmarks[0]
+        return filter_measurements({"x": float(x), "y": float(y)}, self.items)
+
+
+class PlainMeasure(MeasureBase):
+    """Like CountingMeasure, without the lock so it can be pickled."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.items = [MeasureItem("x"), MeasureItem("y")]
+        self.is_frontal = True
+        self.sync_items()
+
+    def abbrev(self) -> str:
+        return "Plain"
+
+    def calc(self, face, render=True):
+        x, y = face.landmarks[0]
+        return filter_measurements({"x": float(x), "y": float(y)}, self.items)
+
+
+def make_frame(x, y):
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    landmarks = [(x, y)] * 98 if x is not None else []
+    return [img, [0, 0, 0], landmarks, 0.0, 1.0, None]
+
+
+class TestMeasureTable(unittest.TestCase):
+
+    def setUp(self):
+        self.measure = CountingMeasure()
+        self.table = MeasureTable([self.measure])
+
+    def test_columns(self):
+        frames = [make_frame(i, 2 * i) for i in range(5)]
+        self.assertEqual(self.table.sync(frames), 5)
+        np.testing.assert_array_equal(self.table.column("x"), [0, 1, 2, 3, 4])
+        np.testing.assert_array_equal(self.table.column("y", 1, 3), [2, 4])
+        cols = self.table.columns(["x", "unknown"], 3)
+        self.assertEqual(list(cols.keys()), ["x"])
+        np.testing.assert_array_equal(cols["x"], [3, 4])
+
+    def test_single_pass(self):
+        frames = [make_frame(i, i) for i in range(4)]
+        self.table.sync(frames)
+        self.table.sync(frames)
+        self.assertEqual(self.measure.calls, 4)
+
+    def test_incremental(self):
+        frames = [make_frame(i, i) for i in range(300)]
+        self.table.sync(frames)
+        frames.append(make_frame(7, 7))
+        self.assertEqual(self.table.sync(frames), 301)
+        self.assertEqual(self.measure.calls, 301)
+        self.assertEqual(self.table.column("x")[-1], 7)
+
+    def test_no_face_is_nan(self):
+        frames = [make_frame(1, 1), make_frame(None, None), make_frame(3, 3)]
+        self.table.sync(frames)
+        x = self.table.column("x")
+        self.assertTrue(np.isnan(x[1]))
+        self.assertEqual(nanargmax(x), 2)
+
+    def test_invalidate_on_config_change(self):
+        frames = [make_frame(i, i) for i in range(3)]
+        self.table.sync(frames)
+        self.measure.set_item_enabled("y", False)
+        self.table.sync(frames)
+        self.assertEqual(self.measure.calls, 6)
+
+        old_pd = AnalyzeFace.pd
+        try:
+            AnalyzeFace.pd = old_pd + 1
+            self.table.sync(frames)
+            self.assertEqual(self.measure.calls, 9)
+        finally:
+            AnalyzeFace.pd = old_pd
+
+    def test_new_frame_list(self):
+        self.table.sync([make_frame(i, i) for i in range(3)])
+        self.assertEqual(self.table.sync([make_frame(9, 9)]), 1)
+        np.testing.assert_array_equal(self.table.column("x"), [9])
+
+    def test_unknown_column(self):
+        self.table.sync([make_frame(1, 1)])
+        with self.assertRaises(KeyError):
+            self.table.column("nope")
+
+    def test_nanargmax_empty(self):
+        self.assertEqual(nanargmax(np.array([])), -1)
+        self.assertEqual(nanargmax(np.array([np.nan, np.nan])), -1)
+        self.assertEqual(nanargmin(np.array([np.nan, np.nan])), -1)
+        self.assertEqual(nanargmin(np.array([3.0, np.nan, 1.0])), 2)
+
+    def test_find(self):
+        frames = [make_frame(x, y) for x, y in [(1, 9), (5, 2), (3, 3), (4, 8)]]
+        frames.insert(2, make_frame(None, None))
+        searches = {
+            "max_x": Reduction(("x",)),
+            "min_y": Reduction(("y",), ARGMIN),
+            "max_sum": Reduction(("x", "y")),
+            "unknown": Reduction(("nope",)),
+        }
+        expected = {"max_x": 1, "min_y": 1, "max_sum": 4, "unknown": -1}
+        # Scanned while the table is empty, from the cache once synced
+        self.assertEqual(self.table.find(frames, searches), expected)
+        self.assertEqual(len(self.table), 0)
+        self.table.sync(frames)
+        calls = self.measure.calls
+        self.assertEqual(self.table.find(frames, searches), expected)
+        self.assertEqual(self.measure.calls, calls)
+        # Indexes count from the first frame, not from the range
+        y = {"m": Reduction(("y",))}
+        self.assertEqual(self.table.find(frames, y, 3), {"m": 4})
+        self.assertEqual(self.table.find(frames, y, 2, 3), {"m": -1})
+        self.assertEqual(self.table.values(frames, 3, ["x", "z"])["x"], 3)
+
+    def test_scan_matches_cached(self):
+        rng = np.random.default_rng(0)
+        frames = [
+            make_frame(*rng.uniform(0, 100, 2)) if i % 7 else make_frame(None, None)
+            for i in range(1000)
+        ]
+        searches = {
+            "max_x": Reduction(("x",)),
+            "min_x": Reduction(("x",), ARGMIN),
+            "max_sum": Reduction(("x", "y")),
+        }
+        serial = scan_frames(frames, searches, 10, 990, [self.measure], workers=1)
+        threaded = scan_frames(
+            frames, searches, 10, 990, [self.measure], workers=4, chunk=64
+        )
+        self.assertEqual(threaded, serial)
+        self.table.sync(frames)
+        self.assertEqual(serial, self.table.find(frames, searches, 10, 990))
+
+    def test_scan_process_pool(self):
+        rng = np.random.default_rng(1)
+        frames = [make_frame(*rng.uniform(0, 100, 2)) for _ in range(300)]
+        searches = {
+            "max_x": Reduction(("x",)),
+            "min_sum": Reduction(("x", "y"), ARGMIN),
+        }
+        serial = scan_frames(frames, searches, measures=[PlainMeasure()], workers=1)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            parallel = scan_frames(
+                frames, searches, measures=[PlainMeasure()], chunk=50, executor=pool
+            )
+        self.assertEqual(parallel, serial)
+
+    def test_chunk_and_merge(self):
+        frames = [make_frame(x, 0) for x in [1, 5, 2, 5, 0]]
+        searches = {"max": Reduction(("x",)), "min": Reduction(("x",), ARGMIN)}
+        parts = [
+            scan_chunk(frames[0:2], searches, [self.measure]),
+            scan_chunk(frames[2:5], searches, [self.measure], offset=2),
+        ]
+        self.assertEqual(parts[1]["max"], (5.0, 3))
+        # Ties go to the earliest frame
+        self.assertEqual(merge_scans(parts, searches), {"max": 1, "min": 4})
+
+    def test_find_caches_scan(self):
+        frames = [make_frame(i, i) for i in range(10)]
+        searches = {"m": Reduction(("x",))}
+        self.assertEqual(self.table.find(frames, searches), {"m": 9})
+        calls = self.measure.calls
+        self.assertEqual(self.table.find(frames, searches), {"m": 9})
+        self.assertEqual(self.measure.calls, calls)
+        self.assertEqual(len(self.table), 0)
+        # New frames or a configuration change scan again
+        frames.append(make_frame(20, 20))
+        self.assertEqual(self.table.find(frames, searches), {"m": 10})
+        self.assertGreater(self.measure.calls, calls)
+        calls = self.measure.calls
+        self.measure.items[1].enabled = False
+        self.table.find(frames, searches)
+        self.assertGreater(self.measure.calls, calls)
+
+    def test_scan_only_needed_measures(self):
+        other = CountingMeasure()
+        other.items = [MeasureItem("z")]
+        frames = [make_frame(i, i) for i in range(10)]
+        result = scan_frames(
+            frames, {"m": Reduction(("x",))}, measures=[self.measure, other]
+        )
+        self.assertEqual(result, {"m": 9})
+        self.assertEqual(self.measure.calls, 10)
+        self.assertEqual(other.calls, 0)
+
+    def test_rejects_empty_reduction(self):
+        frames = [make_frame(i, i) for i in range(3)]
+        with self.assertRaises(ValueError):
+            scan_frames(frames, {"m": Reduction(())}, measures=[self.measure])
+        self.table.sync(frames)
+        with self.assertRaises(ValueError):
+            self.table.find(frames, {"m": Reduction(())})
+        with self.assertRaises(ValueError):
+            self.table.find(frames, {"m": Reduction(("x",), "median")})
+        self.assertEqual(self.measure.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import sys
 import unittest
 from unittest.mock import MagicMock, patch
 
+import cv2
 import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -14,6 +15,7 @@ from dynaface.util import (
     calculate_average_rgb,
     calculate_face_rotation,
     compute_intersection,
+    crop_transform,
     line_intersection,
     line_to_edge,
     normalize_angle,
@@ -23,6 +25,11 @@ from dynaface.util import (
     split_polygon,
     straighten,
     symmetry_ratio,
+    to_landmarks,
+    transform_points,
+    rotate_points,
+    unrotate_points,
+    unrotate_window,
 )
 
 
@@ -80,6 +87,22 @@ class TestFunctions(unittest.TestCase):
         self.assertAlmostEqual(rotated[1][0], 0, places=5)
         self.assertAlmostEqual(rotated[1][1], -10, places=5)
 
+    def test_crop_transform(self):
+        # Same result as rotate_crop_points followed by scale_crop_points
+        points = np.array([(30.0, 40.0), (70.0, 45.0), (12.5, 97.25)])
+        center = (50, 50)
+        for angle in (30, -60, 135):
+            matrix = crop_transform(center, angle, 2.0, 10, 20)
+            fused = transform_points(points, matrix)
+            rotated = rotate_crop_points(points, center, angle)
+            expected = rotated * 2.0 - (10, 20)
+            np.testing.assert_allclose(fused, expected, atol=1e-3)
+
+    def test_transform_points_identity(self):
+        matrix = crop_transform((0, 0), 0, 1.0, 0, 0)
+        points = np.array([[1.5, 2.5], [3.0, 4.0]])
+        np.testing.assert_allclose(transform_points(points, matrix), points)
+
     #    @patch.object(facial.AnalyzeFace, "pd", 60.0)
     #    def test_calc_pd(self):
     #        # Pupils 10 px apart
@@ -124,6 +147,15 @@ class TestFunctions(unittest.TestCase):
         avg = calculate_average_rgb(img)
         self.assertEqual(avg, (127, 0, 127))
 
+    def test_straighten_fills_average(self):
+        img = np.zeros((40, 40, 3), dtype=np.uint8)
+        img[:20] = (200, 100, 50)
+        avg = calculate_average_rgb(img)
+        rotated = straighten(img, math.radians(30))
+        # The corners uncovered by the rotation take the average color
+        self.assertEqual(tuple(rotated[0, 0]), avg)
+        self.assertEqual(tuple(rotated[39, 39]), avg)
+
     def test_straighten(self):
         # Create a 2x2 image, rotate a small angle, then straighten it
         img = np.zeros((2, 2, 3), dtype=np.uint8)
@@ -181,6 +213,55 @@ class TestFunctions(unittest.TestCase):
         self.assertEqual(line_start, (5, 0))
         self.assertEqual(line_end, (5, 10))
 
+    def test_scale_crop_points_batch(self):
+        frames = np.array(
+            [[[10, 20], [30, 40]], [[11, 21], [31, 41]], [[12, 22], [32, 42]]],
+            dtype=np.float32,
+        )
+        result = scale_crop_points(frames, 5, 5, 2.0)
+        self.assertEqual(result.shape, (3, 2, 2))
+        self.assertEqual(result.dtype, np.float32)
+        for frame, scaled in zip(frames, result):
+            expected = scale_crop_points([tuple(p) for p in frame.astype(int)], 5, 5, 2.0)
+            np.testing.assert_array_equal(scaled.astype(int), np.array(expected))
+
+    def test_rotate_crop_points_batch(self):
+        frames = np.array([[[10, 20], [30, 40]], [[12, 22], [32, 42]]], dtype=np.float32)
+        result = rotate_crop_points(frames, (50, 50), 15)
+        self.assertEqual(result.shape, (2, 2, 2))
+        for frame, rotated in zip(frames, result):
+            expected = rotate_crop_points([tuple(p) for p in frame.astype(int)], (50, 50), 15)
+            # list input truncates to int, array input keeps the fraction
+            np.testing.assert_allclose(rotated, np.array(expected), atol=1)
+
+    def test_to_landmarks(self):
+        landmarks = to_landmarks([[(1, 2), (3, 4)], [(5, 6), (7, 8)]])
+        self.assertEqual(landmarks.shape, (2, 2, 2))
+        self.assertEqual(landmarks.dtype, np.float32)
+
+    def test_bisecting_line_coordinates_batch(self):
+        pupils = np.array([[[3, 3], [7, 3]], [[3, 3], [7, 3]]], dtype=np.float32)
+        lines = bisecting_line_coordinates(10, pupils)
+        self.assertEqual(lines.shape, (2, 2, 2))
+        np.testing.assert_allclose(lines[0], [[5, 0], [5, 10]])
+
+    def test_list_of_frames(self):
+        frames = [[(1, 2), (3, 4)], [(5, 6), (7, 8)]]
+        self.assertEqual(
+            scale_crop_points(frames, 0, 0, 2.0),
+            [[(2, 4), (6, 8)], [(10, 12), (14, 16)]],
+        )
+        self.assertEqual(
+            rotate_crop_points(frames, (0, 0), 0),
+            [[(1, 2), (3, 4)], [(5, 6), (7, 8)]],
+        )
+        pupils = [[(3, 3), (7, 3)], [(2, 2), (2, 8)]]
+        lines = bisecting_line_coordinates(10, pupils)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0], bisecting_line_coordinates(10, pupils[0]))
+        self.assertEqual(lines[1], bisecting_line_coordinates(10, pupils[1]))
+        self.assertEqual(lines[0], ((5, 0), (5, 10)))
+
     def test_line_to_edge(self):
         # Start at (5,5), angle=0 => horizontal line to the right edge
         endpoint = line_to_edge(10, (5, 5), 0)
@@ -198,3 +279,37 @@ class TestFunctions(unittest.TestCase):
         # 2*pi + 0.5 => 0.5
         val = normalize_angle(2 * math.pi + 0.5)
         self.assertAlmostEqual(val, 0.5, places=5)
+
+    def test_unrotate_window(self):
+        img = np.random.default_rng(0).integers(0, 255, (40, 60, 3), dtype=np.uint8)
+        window = (5, 7, 25, 31)
+        for rotation in (
+            None,
+            cv2.ROTATE_90_CLOCKWISE,
+            cv2.ROTATE_90_COUNTERCLOCKWISE,
+            cv2.ROTATE_180,
+        ):
+            rotated = img if rotation is None else cv2.rotate(img, rotation)
+            x0, y0, x1, y1 = unrotate_window(window, img.shape, rotation)
+            part = img[y0:y1, x0:x1]
+            if rotation is not None:
+                part = cv2.rotate(part, rotation)
+            np.testing.assert_array_equal(part, rotated[7:31, 5:25])
+
+    def test_rotate_points(self):
+        img = np.zeros((40, 60), dtype=np.uint8)
+        img[7, 5] = 255  # x=5, y=7
+        points = np.array([[5, 7], [0.5, 39.25]], dtype=np.float32)
+        for rotation in (
+            None,
+            cv2.ROTATE_90_CLOCKWISE,
+            cv2.ROTATE_90_COUNTERCLOCKWISE,
+            cv2.ROTATE_180,
+        ):
+            rotated = img if rotation is None else cv2.rotate(img, rotation)
+            moved = rotate_points(points, img.shape, rotation)
+            x, y = moved[0].astype(int)
+            self.assertEqual(rotated[y, x], 255)
+            np.testing.assert_allclose(
+                unrotate_points(moved, img.shape, rotation), points
+            )